@@ -0,0 +1,244 @@
+# analysis_cache.py
+import hashlib
+import json
+import os
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from log_handler import write_log
+from support_icons import Icons
+
+
+class AnalysisCache:
+    """
+    Local disk cache for analysis results (payloads returned by core.analyze_corda_log); each result is addressed by
+    the content of the log file, the configuration used to analyse it, what was collected and the source code of the
+    application (so a changed parser doesn't serve results saved by a previous one). Cache size is kept under a given
+    limit removing least recently used results.
+    """
+
+    # Change it if payload layout changes, to discard results saved by previous versions
+    VERSION = 1
+    # Hash of application source code, calculated once (see code_fingerprint)
+    code_hash = None
+    EXTENSION = '.pkl'
+    FINGERPRINTS = 'fingerprints.json'
+    # Size of each segment hashed by a separate thread
+    SEGMENT_SIZE = 64 * 1024 * 1024
+    # Max number of file fingerprints kept, oldest ones are discarded first
+    MAX_FINGERPRINTS = 1000
+
+    lock = threading.Lock()
+
+    def __init__(self, cache_dir, max_size_mb=1024):
+        """
+        Cache initialization
+        :param cache_dir: directory where results are stored
+        :param max_size_mb: max size of all results stored
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_fingerprint(filename, memo=None):
+        """
+        Return a hash of file content; file is split into segments hashed in parallel, final fingerprint is the hash
+        of all segment hashes.
+        :param filename: file to hash
+        :param memo: dictionary with fingerprints already calculated, they will be reused if file size, mtime and
+        inode are the same; new fingerprint will be added into it (at the end, so memo is kept from oldest to newest).
+        :return: hexadecimal fingerprint
+        """
+        stat = os.stat(filename)
+        file_key = os.path.abspath(filename)
+        file_stat = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+        if memo is not None and file_key in memo and memo[file_key][:3] == file_stat:
+            return memo[file_key][3]
+
+        def hash_segment(start):
+            segment_hash = hashlib.blake2b(digest_size=32)
+            with open(filename, 'rb') as file:
+                file.seek(start)
+                remaining = min(AnalysisCache.SEGMENT_SIZE, stat.st_size - start)
+                while remaining > 0:
+                    data = file.read(min(remaining, 4 * 1024 * 1024))
+                    if not data:
+                        break
+                    segment_hash.update(data)
+                    remaining -= len(data)
+            return segment_hash.digest()
+
+        segments = range(0, stat.st_size, AnalysisCache.SEGMENT_SIZE)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(segments), os.cpu_count() or 1))) as pool:
+            segment_hashes = list(pool.map(hash_segment, segments))
+
+        fingerprint = hashlib.blake2b(digest_size=32)
+        fingerprint.update(str(stat.st_size).encode())
+        for each_hash in segment_hashes:
+            fingerprint.update(each_hash)
+        fingerprint = fingerprint.hexdigest()
+
+        if memo is not None:
+            memo.pop(file_key, None)
+            memo[file_key] = file_stat + [fingerprint]
+
+        return fingerprint
+
+    @staticmethod
+    def code_fingerprint():
+        """
+        Return a hash of application source code (python modules living on application directory)
+        :return: hexadecimal fingerprint
+        """
+        if AnalysisCache.code_hash is None:
+            app_dir = os.path.dirname(os.path.abspath(__file__))
+            code_hash = hashlib.blake2b(digest_size=16)
+            for each_module in sorted(os.listdir(app_dir)):
+                if not each_module.endswith('.py'):
+                    continue
+                code_hash.update(each_module.encode())
+                with open(os.path.join(app_dir, each_module), 'rb') as fmodule:
+                    code_hash.update(fmodule.read())
+            AnalysisCache.code_hash = code_hash.hexdigest()
+
+        return AnalysisCache.code_hash
+
+    def _load_fingerprints(self):
+        """
+        :return: fingerprints already calculated (see file_fingerprint)
+        """
+        try:
+            with open(os.path.join(self.cache_dir, AnalysisCache.FINGERPRINTS), 'r') as fmemo:
+                return json.load(fmemo)
+        except (IOError, ValueError):
+            return {}
+
+    def _save_fingerprints(self, memo):
+        """
+        Save fingerprints calculated so far
+        :param memo: fingerprints
+        :return: None
+        """
+        memo_file = os.path.join(self.cache_dir, AnalysisCache.FINGERPRINTS)
+        try:
+            with open(f'{memo_file}.tmp', 'w') as fmemo:
+                json.dump(memo, fmemo)
+            os.replace(f'{memo_file}.tmp', memo_file)
+        except IOError as io:
+            write_log(f'Unable to save file fingerprints due to: {io}', level='WARN')
+
+    def get_key(self, filename, what_to_collect=None, config_hashes=None):
+        """
+        Build the key for an analysis
+        :param filename: log file analysed
+        :param what_to_collect: list of CordaObject.Type collected, None for all of them
+        :param config_hashes: dictionary with hashes of configuration files used
+        :return: key (hexadecimal string)
+        """
+        with AnalysisCache.lock:
+            memo = self._load_fingerprints()
+            previous = memo.get(os.path.abspath(filename))
+            fingerprint = AnalysisCache.file_fingerprint(filename, memo)
+            # Fingerprints are only saved again when a new one was calculated
+            if memo.get(os.path.abspath(filename)) != previous:
+                while len(memo) > AnalysisCache.MAX_FINGERPRINTS:
+                    memo.pop(next(iter(memo)))
+                self._save_fingerprints(memo)
+
+        if what_to_collect:
+            collected = sorted(getattr(each_type, 'value', each_type) for each_type in what_to_collect)
+        else:
+            collected = ['ALL']
+
+        key = {
+            'version': AnalysisCache.VERSION,
+            'code': AnalysisCache.code_fingerprint(),
+            'file': fingerprint,
+            'config': config_hashes or {},
+            'collect': collected
+        }
+
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _get_filename(self, key):
+        """
+        :param key: analysis key
+        :return: file where result for given key is stored
+        """
+        return os.path.join(self.cache_dir, f'{key}{AnalysisCache.EXTENSION}')
+
+    def load(self, key):
+        """
+        Return result stored for given key
+        :param key: analysis key
+        :return: payload stored, None if there's no result for this key
+        """
+        cache_file = self._get_filename(key)
+        if not os.path.exists(cache_file):
+            return None
+
+        try:
+            with open(cache_file, 'rb') as fcache:
+                payload = pickle.load(fcache)
+            # Update access time, to keep most recently used results on eviction
+            os.utime(cache_file)
+        except (IOError, pickle.UnpicklingError, EOFError) as error:
+            write_log(f'{Icons.WARNING} Unable to read cached result {cache_file} due to: {error}', level='WARN')
+            return None
+
+        return payload
+
+    def save(self, key, payload):
+        """
+        Store result for given key, and evict old results if cache is over its size limit
+        :param key: analysis key
+        :param payload: result to store
+        :return: None
+        """
+        cache_file = self._get_filename(key)
+        try:
+            with open(f'{cache_file}.tmp', 'wb') as fcache:
+                pickle.dump(payload, fcache, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{cache_file}.tmp', cache_file)
+        except (IOError, pickle.PicklingError) as error:
+            write_log(f'{Icons.WARNING} Unable to save result into cache due to: {error}', level='WARN')
+            return
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used results until cache size is under its limit, and fingerprints of files that
+        don't exist anymore
+        :return: None
+        """
+        with AnalysisCache.lock:
+            memo = self._load_fingerprints()
+            existing = {file_key: memo_entry for file_key, memo_entry in memo.items() if os.path.isfile(file_key)}
+            if len(existing) < len(memo):
+                self._save_fingerprints(existing)
+
+            entries = []
+            for each_file in os.listdir(self.cache_dir):
+                if not each_file.endswith(AnalysisCache.EXTENSION):
+                    continue
+                path = os.path.join(self.cache_dir, each_file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                    total_size -= size
+                    write_log(f'Cached result {os.path.basename(path)} removed from cache')
+                except OSError:
+                    continue
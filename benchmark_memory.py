@@ -0,0 +1,128 @@
+# benchmark_memory.py
+"""
+Memory used by model objects: a number of CordaObject, Party, Error, BlockItems and UMLStep objects are created
+(with their usual fields set) and memory allocated for them is measured with tracemalloc, per object bytes are shown
+for each class.
+Results can be saved, and compared against a saved run (like one taken on a previous version) to see before and after
+for each class.
+
+usage: python benchmark_memory.py [--objects N] [--save results.json] [--baseline results.json]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from object_class import BlockItems, Configs, CordaObject, Error, Party
+from uml import UMLStep
+
+
+def new_corda_object(index):
+    cobject = CordaObject()
+    cobject.set_reference_id(f'{index:08x}-8c4b-4f4a-9b1d-5f7c1e2d3a4b')
+    cobject.set_type('FLOW')
+    cobject.set_line_number(index)
+    cobject.set_timestamp('2024-01-01T00:00:00,000Z')
+
+    return cobject
+
+
+def new_party(index):
+    return Party(f'O=Bank {index}, L=London, C=GB')
+
+
+def new_error(index):
+    error = Error()
+    error.reference_id = f'error {index}'
+    error.timestamp = '2024-01-01T00:00:00,000Z'
+    error.log_line = 'Flow failed'
+    error.line_number = index
+    error.type = 'ERROR'
+    error.category = 'flow'
+    error.level = 'ERROR'
+
+    return error
+
+
+def new_block_item(index):
+    block = BlockItems()
+    block.timestamp = '2024-01-01T00:00:00,000Z'
+    block.line_number = index
+    block.reference = f'block {index}'
+    block.type = 'stack trace'
+
+    return block
+
+
+def new_uml_step(index):
+    step = UMLStep()
+    step.reference_id = f'step {index}'
+
+    return step
+
+
+MODELS = {
+    'CordaObject': new_corda_object,
+    'Party': new_party,
+    'Error': new_error,
+    'BlockItems': new_block_item,
+    'UMLStep': new_uml_step,
+}
+
+
+def measure(factory, objects):
+    """
+    Measure memory allocated by a number of objects
+    :param factory: function creating an object from its index
+    :param objects: number of objects to create
+    :return: bytes per object
+    """
+    # Warm up: anything cached on first use (like compiled regex or configs) is not accounted to objects
+    factory(0)
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    kept = [factory(index) for index in range(objects)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Memory of the list holding them is not part of the objects
+    per_object = (end - start - 8 * len(kept)) / objects
+    del kept
+
+    return per_object
+
+
+def main():
+    parserargs = argparse.ArgumentParser(description='Memory used by model objects')
+    parserargs.add_argument('--objects', type=int, default=100000, help='Objects created for each class')
+    parserargs.add_argument('--save', help='Save results into given file')
+    parserargs.add_argument('--baseline', help='Results saved by a previous run, to compare with')
+    args = parserargs.parse_args()
+
+    Configs.load_config()
+
+    results = {name: measure(factory, args.objects) for name, factory in MODELS.items()}
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fbaseline:
+            baseline = json.load(fbaseline)
+
+    print(f'{args.objects} objects of each class, bytes per object:')
+    if baseline:
+        print(f'{"class":<12} {"before":>9} {"after":>9} {"saved":>7}')
+    else:
+        print(f'{"class":<12} {"bytes":>9}')
+    for name, per_object in results.items():
+        if name in baseline:
+            saved = 1 - per_object / baseline[name] if baseline[name] else 0
+            print(f'{name:<12} {baseline[name]:>9.0f} {per_object:>9.0f} {saved:>7.0%}')
+        else:
+            print(f'{name:<12} {per_object:>9.0f}')
+
+    if args.save:
+        with open(args.save, 'w') as fsave:
+            json.dump(results, fsave, indent=2)
+
+
+if __name__ == '__main__':
+    main()
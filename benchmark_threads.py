@@ -0,0 +1,82 @@
+# benchmark_threads.py
+"""
+Thread scaling of block processing: same log file is analysed (parties, flows & transactions and errors) with an
+increasing number of worker threads, with 'regex' concurrent mode enabled and disabled (see
+FILE_SETUP.SCAN_SETUP.CONCURRENT_REGEX), and elapsed time plus speed up against a single thread is shown for each
+one of them.
+
+usage: python benchmark_threads.py <log file> [--max-workers N] [--block-size MB] [--repeat N]
+"""
+import argparse
+import os
+import time
+
+from error_log_analysis import ErrorAnalysis
+from get_parties import GetParties
+from get_refIds import GetRefIds
+from object_class import Configs, CordaObject, FileManagement, KnownErrors, RegexLib
+
+
+def run_analysis(log_file, workers, block_size):
+    """
+    Run a full block processing of given file
+    :param log_file: log file to analyse
+    :param workers: number of threads to use
+    :param block_size: block size in Mbytes
+    :return: elapsed time (seconds) of block processing
+    """
+    CordaObject.reset()
+    FileManagement.clear()
+
+    file_to_analyse = FileManagement(log_file, block_size_in_mb=block_size)
+    file_to_analyse.discover_file_format()
+
+    for collector, element_type in ((GetParties(Configs), CordaObject.Type.PARTY),
+                                     (GetRefIds(Configs), CordaObject.Type.FLOW_AND_TRANSACTIONS),
+                                     (ErrorAnalysis(Configs.config), CordaObject.Type.ERROR_ANALYSIS)):
+        collector.set_file(file_to_analyse)
+        collector.set_element_type(element_type)
+        file_to_analyse.add_process_to_execute(collector)
+
+    file_to_analyse.pre_analysis()
+
+    start = time.perf_counter()
+    file_to_analyse.parallel_processing(maxworkers=workers)
+
+    return time.perf_counter() - start
+
+
+def main():
+    parserargs = argparse.ArgumentParser(description='Thread scaling benchmark of block processing')
+    parserargs.add_argument('log_file', help='Log file to analyse')
+    parserargs.add_argument('--max-workers', type=int, default=os.cpu_count() or 4,
+                            help='Max number of threads to test (1, 2, 4... up to this number)')
+    parserargs.add_argument('--block-size', type=int, default=1,
+                            help='Block size in Mbytes, file must have several blocks to be processed in parallel')
+    parserargs.add_argument('--repeat', type=int, default=3, help='Runs for each case, best time is taken')
+    args = parserargs.parse_args()
+
+    Configs.load_config()
+    KnownErrors.configs = Configs
+    KnownErrors.initialize()
+
+    workers_to_test = []
+    workers = 1
+    while workers < args.max_workers:
+        workers_to_test.append(workers)
+        workers *= 2
+    workers_to_test.append(args.max_workers)
+
+    print(f'{"concurrent":>10} {"threads":>8} {"seconds":>9} {"speed up":>9}')
+    for concurrent_mode in (True, None):
+        RegexLib.concurrent = concurrent_mode
+        single_thread = None
+        for workers in workers_to_test:
+            elapsed = min(run_analysis(args.log_file, workers, args.block_size) for _ in range(args.repeat))
+            if single_thread is None:
+                single_thread = elapsed
+            print(f'{str(bool(concurrent_mode)):>10} {workers:>8} {elapsed:>9.3f} {single_thread / elapsed:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
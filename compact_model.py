@@ -0,0 +1,41 @@
+# compact_model.py
+
+
+class CompactModel:
+    """
+    Base for model classes created in large numbers (CordaObject, Party, Error, BlockItems, UMLStep): attributes are
+    kept on __slots__, so objects have no __dict__ of their own. As vars() can't be used on them, public attributes
+    are listed on FIELDS, and given by get_fields (see get_fields function for any object).
+    """
+
+    __slots__ = ()
+
+    # Public attributes, in order; these are the ones serialized
+    FIELDS = ()
+
+    def get_fields(self):
+        """
+        :return: dictionary {attribute: value} with public attributes (see FIELDS), attributes not set are left out
+        """
+        fields = {}
+        for each_field in self.FIELDS:
+            try:
+                fields[each_field] = getattr(self, each_field)
+            except AttributeError:
+                continue
+
+        return fields
+
+
+def get_fields(obj):
+    """
+    Attributes of an object, like vars() but also for compact models
+    :param obj: object
+    :return: dictionary {attribute: value}, None if object has no attributes
+    """
+    if isinstance(obj, CompactModel):
+        return obj.get_fields()
+    if hasattr(obj, '__dict__'):
+        return vars(obj)
+
+    return None
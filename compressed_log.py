@@ -0,0 +1,402 @@
+# compressed_log.py
+import bz2
+import gzip
+import io
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+from log_handler import write_log
+from support_icons import Icons
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class CompressedLog:
+    """
+    Compressed log file (gzip, bzip2 or zstd); it is decompressed once into a temporary file that is mapped in
+    memory, so it can be used exactly as a mapped plain file. Decompressed data is written as it is produced, so
+    memory used doesn't grow with the size of the log. When format allows it, file is split into independent
+    members/frames that are decompressed in parallel:
+    - gzip: multiple members (BGZF block sizes are used when available)
+    - bzip2: multiple streams (pbzip2)
+    - zstd: seekable format (seek table)
+    Otherwise file is decompressed in a single streaming pass.
+    """
+
+    class Format(Enum):
+        """
+        Supported compression formats
+        """
+        GZIP = 'gzip'
+        BZIP2 = 'bz2'
+        ZSTD = 'zstd'
+
+    MAGIC = {
+        Format.GZIP: b'\x1f\x8b\x08',
+        Format.BZIP2: b'BZh',
+        Format.ZSTD: b'\x28\xb5\x2f\xfd'
+    }
+    # bzip2 stream header: 'BZh' + block size (1-9) + block magic (pi)
+    BZIP2_BLOCK_MAGIC = b'1AY&SY'
+    # zstd seekable format
+    ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+    ZSTD_SKIPPABLE_SEEK_TABLE = 0x184D2A5E
+    # gzip member header: FLG reserved bits, and known values for XFL and OS
+    GZIP_FLG_RESERVED = 0xE0
+    GZIP_XFL = (0, 2, 4)
+    GZIP_OS = tuple(range(14)) + (255,)
+    # Size of data decompressed on each step when streaming
+    STREAM_CHUNK = 4 * 1024 * 1024
+
+    def __init__(self, filename, max_workers=None, temp_dir=None):
+        """
+        :param filename: compressed file
+        :param max_workers: number of threads used to decompress members in parallel
+        :param temp_dir: directory for the temporary file holding decompressed content, by default system one
+        """
+        self.filename = filename
+        self.format = CompressedLog.detect(filename)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.temp_dir = temp_dir
+        self.buffer = None
+        # Size of decompressed content (buffer can't be empty, so it may be bigger)
+        self.size = 0
+
+    @staticmethod
+    def detect(filename):
+        """
+        Detect compression format of given file using its magic number
+        :param filename: file to check
+        :return: CompressedLog.Format, None if file is not compressed (or format is not supported)
+        """
+        try:
+            with open(filename, 'rb') as file:
+                header = file.read(10)
+        except IOError:
+            return None
+
+        for each_format, magic in CompressedLog.MAGIC.items():
+            if header.startswith(magic):
+                if each_format == CompressedLog.Format.BZIP2 and header[4:10] != CompressedLog.BZIP2_BLOCK_MAGIC:
+                    continue
+                return each_format
+
+        return None
+
+    def get_buffer(self):
+        """
+        Return decompressed content, decompressing file if it was not done before
+        :return: mmap with decompressed content
+        """
+        if self.buffer is None:
+            self.buffer = self.decompress()
+
+        return self.buffer
+
+    def close(self):
+        """
+        Release decompressed content
+        :return: None
+        """
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+    def decompress(self):
+        """
+        Decompress file into a temporary file (removed as soon as it is closed), pieces are written as they are
+        decompressed
+        :return: mmap with decompressed content
+        """
+        if self.format == CompressedLog.Format.ZSTD and not zstandard:
+            raise IOError('zstandard module is required to read zstd compressed files (pip install zstandard)')
+
+        write_log(f'{Icons.INFO} Decompressing {self.filename} ({self.format.value})...')
+        with tempfile.TemporaryFile(prefix='logtracer-', dir=self.temp_dir) as output:
+            with open(self.filename, 'rb') as file:
+                with mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ) as data:
+                    total_size = self._decompress_parallel(data, output)
+            if total_size is None:
+                output.seek(0)
+                output.truncate()
+                total_size = self._decompress_stream(output)
+            output.flush()
+            # mmap can't have size 0; mapping is still valid once temporary file is closed
+            buffer = mmap.mmap(output.fileno(), total_size, access=mmap.ACCESS_READ) if total_size else \
+                mmap.mmap(-1, 1)
+
+        write_log(f'{Icons.INFO} {self.filename} decompressed, {total_size / 1024 / 1024:.2f} Mbytes')
+        self.size = total_size
+        return buffer
+
+    def _decompress_parallel(self, data, output):
+        """
+        Split file into independent members and decompress them in parallel, members are written in order; only a
+        few of them (two for each thread) are decompressed ahead of the one being written
+        :param data: compressed file mapped in memory
+        :param output: file where decompressed data is written
+        :return: size of decompressed data, None if file can't be split (output must be discarded)
+        """
+        if self.format == CompressedLog.Format.GZIP:
+            members = CompressedLog.bgzf_members(data) or self._find_members(data)
+            decompress = CompressedLog._gzip_member
+        elif self.format == CompressedLog.Format.BZIP2:
+            members = self._find_members(data)
+            decompress = CompressedLog._bzip2_member
+        else:
+            members = CompressedLog.zstd_seekable_frames(data)
+            decompress = CompressedLog._zstd_frame
+
+        if not members or len(members) < 2:
+            return None
+
+        total_size = 0
+        members = iter(members)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque(pool.submit(CompressedLog._decompress_member, decompress, data, member)
+                            for member in itertools.islice(members, self.max_workers * 2))
+            while pending:
+                piece = pending.popleft().result()
+                if piece is None:
+                    # Some member is not complete (a false member header found inside compressed data, or trailing
+                    # garbage)
+                    for each_future in pending:
+                        each_future.cancel()
+                    return None
+                output.write(piece)
+                total_size += len(piece)
+                del piece
+                member = next(members, None)
+                if member is not None:
+                    pending.append(pool.submit(CompressedLog._decompress_member, decompress, data, member))
+
+        return total_size
+
+    @staticmethod
+    def _decompress_member(decompress, data, member):
+        """
+        Decompress a member, without copying its compressed data
+        :param decompress: function to decompress a member
+        :param data: compressed file mapped in memory
+        :param member: (start, end) of the member
+        :return: decompressed data, None if member is not complete
+        """
+        with memoryview(data) as view:
+            with view[member[0]:member[1]] as compressed:
+                return decompress(compressed)
+
+    def _decompress_stream(self, output):
+        """
+        Decompress file in a single pass
+        :param output: file where decompressed data is written
+        :return: size of decompressed data
+        """
+        if self.format == CompressedLog.Format.ZSTD:
+            reader = zstandard.ZstdDecompressor().stream_reader(open(self.filename, 'rb'), read_across_frames=True,
+                                                                closefd=True)
+        elif self.format == CompressedLog.Format.GZIP:
+            reader = gzip.open(self.filename, 'rb')
+        else:
+            reader = bz2.open(self.filename, 'rb')
+
+        total_size = 0
+        with reader:
+            while True:
+                piece = reader.read(CompressedLog.STREAM_CHUNK)
+                if not piece:
+                    break
+                output.write(piece)
+                total_size += len(piece)
+
+        return total_size
+
+    def _find_members(self, data):
+        """
+        Find candidate members of a multi-member (gzip) or multi-stream (bzip2) file searching for member headers;
+        a header could also appear inside compressed data, so members are only confirmed when each one of them is
+        decompressed completely (see _decompress_parallel).
+        :param data: compressed file mapped in memory
+        :return: list of (start, end) members, None if file has a single member
+        """
+        magic = CompressedLog.MAGIC[self.format]
+        is_header = CompressedLog.is_gzip_header if self.format == CompressedLog.Format.GZIP else \
+            CompressedLog.is_bzip2_header
+        candidates = []
+        position = data.find(magic, 1)
+        while position != -1:
+            if is_header(data, position):
+                candidates.append(position)
+            position = data.find(magic, position + 1)
+
+        if not candidates:
+            return None
+
+        return list(zip([0] + candidates, candidates + [len(data)]))
+
+    @staticmethod
+    def is_gzip_header(data, position):
+        """
+        Check if a gzip magic number found on a file is likely a member header: reserved flags are not set and extra
+        flags (XFL) and OS are known values; a bare magic number shows up every few Mbytes of compressed data
+        :param data: compressed file mapped in memory
+        :param position: position of magic number
+        :return: True if it looks like a member header
+        """
+        header = data[position:position + 10]
+
+        return len(header) == 10 and not header[3] & CompressedLog.GZIP_FLG_RESERVED and \
+            header[8] in CompressedLog.GZIP_XFL and header[9] in CompressedLog.GZIP_OS
+
+    @staticmethod
+    def is_bzip2_header(data, position):
+        """
+        Check if a bzip2 magic number found on a file is likely a stream header: block size and first block magic
+        :param data: compressed file mapped in memory
+        :param position: position of magic number
+        :return: True if it looks like a stream header
+        """
+        return data[position + 3:position + 4] in (b'1', b'2', b'3', b'4', b'5', b'6', b'7', b'8', b'9') and \
+            data[position + 4:position + 10] == CompressedLog.BZIP2_BLOCK_MAGIC
+
+    @staticmethod
+    def bgzf_members(data):
+        """
+        Return members of a BGZF file (blocked gzip), where each member header holds its own size
+        :param data: compressed file mapped in memory
+        :return: list of (start, end) members, None if it is not a BGZF file
+        """
+        members = []
+        position = 0
+        while position < len(data):
+            # FLG.FEXTRA, XLEN and subfield 'BC' with BSIZE
+            if data[position:position + 4] != b'\x1f\x8b\x08\x04' or data[position + 12:position + 14] != b'BC':
+                return None
+            bsize = struct.unpack('<H', data[position + 16:position + 18])[0] + 1
+            members.append((position, position + bsize))
+            position += bsize
+
+        return members
+
+    @staticmethod
+    def zstd_seekable_frames(data):
+        """
+        Return frames of a zstd file in seekable format, using its seek table
+        :param data: compressed file mapped in memory
+        :return: list of (start, end) frames, None if file has not a seek table
+        """
+        if len(data) < 9:
+            return None
+
+        number_of_frames, descriptor, magic = struct.unpack('<IBI', data[-9:])
+        if magic != CompressedLog.ZSTD_SEEKABLE_MAGIC:
+            return None
+
+        entry_size = 12 if descriptor & 0x80 else 8
+        table_size = number_of_frames * entry_size + 9
+        # Seek table is a skippable frame: magic number and frame size
+        table_start = len(data) - table_size - 8
+        if table_start < 0 or struct.unpack('<I', data[table_start:table_start + 4])[0] != \
+                CompressedLog.ZSTD_SKIPPABLE_SEEK_TABLE:
+            return None
+
+        frames = []
+        position = 0
+        for entry in range(number_of_frames):
+            entry_start = table_start + 8 + entry * entry_size
+            compressed_size = struct.unpack('<I', data[entry_start:entry_start + 4])[0]
+            frames.append((position, position + compressed_size))
+            position += compressed_size
+
+        return frames
+
+    @staticmethod
+    def _gzip_member(member):
+        """
+        Decompress a single gzip member
+        :param member: compressed member
+        :return: decompressed data, None if data is not a single complete member
+        """
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        try:
+            piece = decompressor.decompress(member)
+        except zlib.error:
+            return None
+        if not decompressor.eof or decompressor.unused_data:
+            return None
+
+        return piece
+
+    @staticmethod
+    def _bzip2_member(member):
+        """
+        Decompress a single bzip2 stream
+        :param member: compressed stream
+        :return: decompressed data, None if data is not a single complete stream
+        """
+        decompressor = bz2.BZ2Decompressor()
+        try:
+            piece = decompressor.decompress(member)
+        except OSError:
+            return None
+        if not decompressor.eof or decompressor.unused_data:
+            return None
+
+        return piece
+
+    @staticmethod
+    def _zstd_frame(frame):
+        """
+        Decompress a single zstd frame
+        :param frame: compressed frame
+        :return: decompressed data, None if frame can't be decompressed
+        """
+        try:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(frame)
+        except zstandard.ZstdError:
+            return None
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Raw reader over a buffer (like decompressed content of a CompressedLog), so it can be read as a regular file
+    (io.TextIOWrapper) without copying it
+    """
+
+    def __init__(self, buffer, start=0, size=None):
+        self.buffer = buffer
+        self.position = start
+        self.size = len(buffer) if size is None else size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer):
+        size = max(0, min(len(buffer), self.size - self.position))
+        buffer[:size] = self.buffer[self.position:self.position + size]
+        self.position += size
+        return size
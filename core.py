@@ -1,5 +1,6 @@
 # logtracer/core.py
 import threading
+from collections.abc import Mapping
 from enum import Enum
 from object_class import FileManagement
 from object_class import BlockExtractor
@@ -8,43 +9,103 @@ from get_refIds import GetRefIds
 from object_class import CordaObject
 from object_class import Configs  # o pásalo como parámetro
 from object_class import KnownErrors
+from object_class import Party
+from object_class import RegexLib
+from object_class import X500NameParser
+from regex_budget import RegexBudget
+from regex_profiler import RegexProfiler
 from error_log_analysis import ErrorAnalysis
 import os
 
+from analysis_cache import AnalysisCache
+from compact_model import get_fields
+from log_handler import write_log
+from log_set import LogSet
+from reference_registry import ReferenceRegistry
 from uml import CreateUML, UMLStepSetup
 
 
 def deep_to_dict(obj):
     if isinstance(obj, (int, float, str, bool, type(None))):
         return obj
-    if isinstance(obj, dict):
+    if isinstance(obj, Mapping):
+        # Mappings like ReferenceHits read their values at once
         return {k: deep_to_dict(v) for k, v in obj.items()}
     if isinstance(obj, (list, tuple)):
         return [deep_to_dict(x) for x in obj]
 
     # Aquí aplicamos tu filtro para objetos personalizados
-    if hasattr(obj, "__dict__"):
+    fields = get_fields(obj)
+    if fields is not None:
         return {
             k: deep_to_dict(v)
-            for k, v in vars(obj).items()
+            for k, v in fields.items()
             if not callable(v) and not k.startswith('_')
         }
     return str(obj) # Último recurso
 
-def analyze_corda_log(log_file_path: str, what_to_collect:CordaObject.Type=None, datainfo=None) -> dict:
+# Logs being followed (follow mode), by absolute path; it keeps file, collectors and results state (see
+# _get_results_state) used on previous analysis
+followed_logs = {}
+
+
+def _get_results_state():
+    """
+    Return class level state holding results of an analysis: objects found (CordaObject registry), results collected
+    (FileManagement.unique_results) and parties. Objects are not copied, state keeps changing while it is in use.
+    :return: dictionary with state
+    """
+    return {
+        'unique_results': FileManagement.unique_results,
+        'registry': CordaObject.registry,
+        'party_list': Party.party_list,
+        'party_names': Party.party_names
+    }
+
+
+def _set_results_state(state=None):
+    """
+    Set class level state holding results of an analysis (see _get_results_state)
+    :param state: state to set, a new empty one if not given
+    :return: None
+    """
+    if state is None:
+        state = {
+            'unique_results': {},
+            'registry': ReferenceRegistry(),
+            'party_list': [],
+            'party_names': {}
+        }
+
+    FileManagement.unique_results = state['unique_results']
+    CordaObject.registry = state['registry']
+    CordaObject.list = CordaObject.registry.by_type
+    Party.party_list = state['party_list']
+    Party.party_names = state['party_names']
+
+
+def analyze_corda_log(log_file_path: str, what_to_collect:CordaObject.Type=None, datainfo=None,
+                      engine:FileManagement.Engine=None, follow=False, payload_only=False) -> dict:
     """
     Analiza un archivo de log de Corda y devuelve un diccionario con:
     - parties
     - flows
     - transaction
     - estadísticas (tiempo, conteos, etc.)
+
+    :param engine: FileManagement.Engine used to process blocks; by default threads, Engine.PROCESS will use one
+    worker process per cpu
+    :param follow: follow mode, for logs that keep growing; first call will analyse whole file, next calls for same
+    file will only analyse data appended since previous call, merging it with results already collected.
+    :param payload_only: caller will only use returned payload; only then results can be taken from cache (see
+    FILE_SETUP.RESULT_CACHE), as a cached result doesn't load objects found (CordaObject, Party...) nor file
+    analysed, which are needed for any later step like a trace or UML generation.
     """
     
     # Always convert it into a proper list
     if isinstance(what_to_collect, CordaObject.Type):
         what_to_collect = [what_to_collect]
-        
-    Configs.load_config()
+
     payload = {
         "summary":{
             "log_file": log_file_path
@@ -54,12 +115,65 @@ def analyze_corda_log(log_file_path: str, what_to_collect:CordaObject.Type=None,
     if datainfo:
         payload["summary"]["file_info"] = datainfo.get_all()
 
-    KnownErrors.configs = Configs
-    KnownErrors.initialize()
+    if follow and LogSet.is_log_set(log_file_path):
+        write_log("Follow mode is not available for log sets, full analysis will be done", level="WARN")
+        follow = False
+
+    followed = followed_logs.get(os.path.abspath(log_file_path)) if follow else None
+    if followed and followed['what_to_collect'] == what_to_collect and \
+            followed['file'].is_same_file(os.path.getsize(log_file_path)):
+        # Any other analysis done since previous call has its own results, this log results are set back
+        _set_results_state(followed['state'])
+        file_to_analyse = followed['file']
+        special_blocks = followed['special_blocks']
+        collect_parties = followed['parties']
+        collect_refIds = followed['refIds']
+        collect_errors = followed['errors']
+
+        start_offset = file_to_analyse.analysed_offset
+        start_line = file_to_analyse.analysed_lines + 1
+        file_to_analyse.pre_analysis(follow=True)
+        if file_to_analyse.analysed_offset > start_offset:
+            if special_blocks:
+                special_blocks.extract(start_offset, start_line, file_to_analyse.analysed_lines)
+            _run_parallel_processing(file_to_analyse, engine)
+
+        payload["summary"]["file-version-used"] = file_to_analyse.logfile_format
+        payload["summary"]["follow"] = file_to_analyse.get_follow_state()
+
+        return _build_payload(payload, file_to_analyse, special_blocks, collect_parties, collect_refIds, collect_errors)
+
+    Configs.load_config()
     data_dir = Configs.get_config_for('FILE_SETUP.CONFIG.data_dir')
 
     app_path =f"{os.path.dirname(os.path.abspath(__file__))}/{data_dir}"
 
+    # Results are cached by file content, configuration, what is collected and code version, only for callers using
+    # just the payload; follow mode is not cached because its results depend on previous calls, neither log sets
+    # (their content depends on which files are found)
+    result_cache = None
+    cache_key = None
+    cache_setup = Configs.get_config_for('FILE_SETUP.RESULT_CACHE')
+    if payload_only and not follow and cache_setup and cache_setup.get('ENABLED', False) and os.path.isfile(log_file_path):
+        result_cache = AnalysisCache(f"{app_path}/{cache_setup.get('DIR', 'cache')}",
+                                     cache_setup.get('MAX_SIZE_MB', 1024))
+        cache_key = result_cache.get_key(log_file_path, what_to_collect, Configs.config_hashes)
+        cached_payload = result_cache.load(cache_key)
+        if cached_payload:
+            write_log(f"Analysis for {log_file_path} taken from cache")
+            cached_payload["summary"]["log_file"] = log_file_path
+            cached_payload["summary"].pop("file_info", None)
+            if datainfo:
+                cached_payload["summary"]["file_info"] = datainfo.get_all()
+            return cached_payload
+
+    # Results of a followed log are kept for its next call, this analysis must start from new ones
+    if any(each_followed['state']['registry'] is CordaObject.registry for each_followed in followed_logs.values()):
+        _set_results_state()
+
+    KnownErrors.configs = Configs
+    KnownErrors.initialize()
+
     # 1. Configurar archivo
     file_to_analyse = FileManagement(log_file_path, block_size_in_mb=15)
 
@@ -73,10 +187,17 @@ def analyze_corda_log(log_file_path: str, what_to_collect:CordaObject.Type=None,
     collect_refIds = None
     collect_errors = None
 
+    if follow:
+        # Blocks must be extracted up to the same line analysed by pre_analysis
+        file_to_analyse.pre_analysis(follow=True)
+
     if not what_to_collect or CordaObject.Type.SPECIAL_BLOCKS in  what_to_collect:
         # 2. Extraer bloques especiales (opcional, si los necesitas en la API)
         special_blocks = BlockExtractor(file_to_analyse, Configs.config)
-        special_blocks.extract()
+        if follow:
+            special_blocks.extract(end_line=file_to_analyse.analysed_lines)
+        else:
+            special_blocks.extract()
 
     if not what_to_collect or CordaObject.Type.PARTY in what_to_collect:
         # 3. Configurar recolectores
@@ -104,8 +225,68 @@ def analyze_corda_log(log_file_path: str, what_to_collect:CordaObject.Type=None,
         file_to_analyse.add_process_to_execute(collect_errors)
 
     # 4. Ejecutar procesamiento
-    file_to_analyse.pre_analysis()
-    file_to_analyse.parallel_processing()
+    if not follow:
+        file_to_analyse.pre_analysis()
+    _run_parallel_processing(file_to_analyse, engine)
+
+    if file_to_analyse.log_set:
+        # Files analysed, and global lines each one of them holds
+        payload["summary"]["log_set"] = file_to_analyse.log_set.get_all()
+
+    if follow:
+        followed_logs[os.path.abspath(log_file_path)] = {
+            'what_to_collect': what_to_collect,
+            'file': file_to_analyse,
+            'special_blocks': special_blocks,
+            'parties': collect_parties,
+            'refIds': collect_refIds,
+            'errors': collect_errors,
+            'state': _get_results_state()
+        }
+        payload["summary"]["follow"] = file_to_analyse.get_follow_state()
+
+    payload = _build_payload(payload, file_to_analyse, special_blocks, collect_parties, collect_refIds, collect_errors)
+
+    if result_cache:
+        result_cache.save(cache_key, payload)
+
+    return payload
+
+
+def _run_parallel_processing(file_to_analyse, engine=None):
+    """
+    Run parallel processing of file blocks with given engine
+    :param file_to_analyse: FileManagement already pre-analysed
+    :param engine: FileManagement.Engine to use
+    :return: None
+    """
+    if isinstance(engine, str):
+        engine = FileManagement.Engine(engine)
+    if engine == FileManagement.Engine.PROCESS:
+        file_to_analyse.parallel_processing(maxworkers=os.cpu_count() or 5, engine=engine)
+    else:
+        file_to_analyse.parallel_processing()
+
+    if Configs.get_config_for('FILE_SETUP.REGEX_CACHE.LOG_REPORT'):
+        for each_line in RegexLib.regex_report():
+            write_log(each_line)
+    if Configs.get_config_for('FILE_SETUP.X500_MEMO.LOG_REPORT'):
+        for each_line in X500NameParser.memo_report():
+            write_log(each_line)
+    for each_line in RegexBudget.format_report():
+        write_log(each_line, level="WARN")
+    RegexBudget.clear()
+    if Configs.get_config_for('FILE_SETUP.REGEX_CACHE.PROFILE'):
+        for each_line in RegexProfiler(Configs.config).format_report(
+                Configs.get_config_for('FILE_SETUP.REGEX_CACHE.REPORT_TOP') or 20):
+            write_log(each_line)
+
+
+def _build_payload(payload, file_to_analyse, special_blocks, collect_parties, collect_refIds, collect_errors):
+    """
+    Fill payload with all results collected so far
+    :return: payload
+    """
 
     # Si quieres soportar múltiples roles por party:
     if collect_parties:
@@ -155,6 +336,8 @@ def analyze_corda_log(log_file_path: str, what_to_collect:CordaObject.Type=None,
 
     if collect_errors:
         collect_errors.collected_errors = file_to_analyse.get_all_unique_results(CordaObject.Type.ERROR_ANALYSIS)
+        # Errors are classified again, in case new ones were collected (follow mode)
+        collect_errors.category_list = {}
         # payload["Error-log"] = collect_errors.get_error_category()
         payload["results"][CordaObject.Type.ERROR_ANALYSIS.value] = collect_errors.get_all_content()
         payload['summary'][CordaObject.Type.ERROR_ANALYSIS.value] = collect_errors.get_error_summary()
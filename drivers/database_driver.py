@@ -360,7 +360,7 @@ class DatabaseDataDriver(DataDriver):
             'timestamp': obj.timestamp,
             'error_level': obj.error_level,
             'data': obj.data,
-            'references_data': dict(obj.references),
+            'references_data': dict(obj.references.items()),
             'uml_steps': self._serialize_uml_steps(obj.uml_steps),
         }
 
@@ -411,7 +411,7 @@ class DatabaseDataDriver(DataDriver):
         return uml_steps
 
     def _serialize_uml_step(self, step):
-        return step.__dict__
+        return step.get_fields()
 
     def _deserialize_uml_step(self, data):
         from uml import UMLStep
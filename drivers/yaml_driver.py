@@ -243,7 +243,7 @@ class YamlDataDriver(DataDriver):
             'timestamp': obj.timestamp,
             'error_level': obj.error_level,
             'data': obj.data,
-            'references': dict(obj.references),  # Convertir OrderedDict a dict
+            'references': dict(obj.references.items()),  # Convertir OrderedDict a dict
             'uml_steps': self._serialize_uml_steps(obj.uml_steps),
         }
 
@@ -342,7 +342,7 @@ class YamlDataDriver(DataDriver):
     def _serialize_uml_step(self, step):
         """Serializa un UMLStep individual"""
         # Implementar según tu clase UMLStep
-        return step.__dict__  # O usa un método específico de UMLStep
+        return step.get_fields()
 
     def _deserialize_uml_step(self, data):
         """Deserializa un UMLStep individual"""
@@ -1,4 +1,4 @@
-from object_class import LogAnalysis, CordaObject
+from object_class import LogAnalysis, CordaObject, Error
 
 
 class ErrorAnalysis:
@@ -44,14 +44,65 @@ class ErrorAnalysis:
         self.type = element_type
 
 
-    def execute(self, each_line, current_line=None):
+    def execute(self, each_line, current_line=None, context=None):
         """
         Process that need to be executed in parallel
         :param each_line: line from log file
+        :param context: LineContext shared with other collectors
         :return: a list x500 name found
         """
 
-        return  self.log_analysis.parse(each_line, current_line)
+        return  self.log_analysis.parse(each_line, current_line, context)
+
+    def prepare_batch(self, contexts):
+        """
+        Match known errors against a whole batch of lines, before each line is processed
+        :param contexts: list of LineContext, consecutive lines
+        :return: None
+        """
+        self.log_analysis.prepare_batch(contexts)
+
+    def scan(self, each_line, current_line=None, context=None):
+        """
+        Search part of `execute`, used by process engine; errors are returned as compact tuples so they can be sent
+        back to parent process
+        :param each_line: line from log file
+        :param current_line: line number from log file
+        :param context: LineContext shared with other collectors
+        :return: a record (line number, line, [(category, type, timestamp, level), ...]) or None if no error found
+        """
+
+        found_errors = self.log_analysis.parse(each_line, current_line, context)
+
+        if not found_errors:
+            return None
+
+        return current_line, each_line, [(error.category, error.type, error.timestamp, error.level)
+                                         for error in found_errors]
+
+    def merge(self, record):
+        """
+        Rebuild errors from a record given by `scan`
+        :param record: a record (line number, line, [(category, type, timestamp, level), ...])
+        :return: a list of Error found
+        """
+
+        current_line, each_line, errors = record
+        found_errors = []
+
+        for category, error_type, timestamp, level in errors:
+            error = Error()
+            error.category = category
+            error.type = error_type
+            error.log_line = each_line
+            error.reference_id = current_line
+            error.line_number = current_line
+            error.timestamp = timestamp
+            error.level = level
+            self.log_analysis.category_list[category] = 1
+            found_errors.append(error)
+
+        return found_errors
 
 
     def get_all_content(self):
@@ -0,0 +1,206 @@
+# format_detector.py
+import bisect
+from collections import Counter
+
+
+class FormatDetector:
+    """
+    Log format detection for a log file (see VERSION.IDENTITY_FORMAT): instead of locking the first format found
+    at file start for the whole file, several regions spread over the file are sampled (each region can be sampled
+    on its own thread, see FileManagement.discover_file_format) and format runs are recorded in line offset space
+    (byte offset where each run starts, always the start of a line). Files mixing formats (like container stdout
+    with interleaved application logs) get, for each block, the header parsers that apply to it; a block within a
+    single run is parsed with its own parser, without any per line detection.
+    """
+
+    # Default settings (FILE_SETUP.SCAN_SETUP.FORMAT_DETECTION)
+    REGIONS = 8
+    REGION_LINES = 500
+    # A region switching format more times than this is taken as interleaved formats: a single run holding all of
+    # them
+    MAX_SWITCHES = 4
+
+    class Run:
+        """
+        A range of the file where same log formats apply
+        """
+
+        def __init__(self, start, formats):
+            """
+            :param start: byte offset where run starts
+            :param formats: tuple of log formats found on it, most frequent first
+            """
+            self.start = start
+            self.formats = formats
+            # Byte offset where sampling of its region stopped
+            self.sampled_end = None
+
+        def to_dict(self):
+            return {'start': self.start, 'formats': list(self.formats)}
+
+    def __init__(self, log_file, parsers, regions=None, region_lines=None, first_region_lines=None,
+                 max_switches=None, **kwargs):
+        """
+        :param log_file: LogFile to check
+        :param parsers: {log format: HeaderParser}, in order of definition (first one wins when several formats
+        match same line)
+        :param regions: number of regions sampled
+        :param region_lines: max number of lines sampled on each region
+        :param first_region_lines: max number of lines sampled at file start, by default region_lines
+        :param max_switches: see MAX_SWITCHES
+        :param kwargs: other arguments for regex search (like concurrent)
+        """
+        self.log_file = log_file
+        self.parsers = parsers
+        self.regions = regions or FormatDetector.REGIONS
+        self.region_lines = region_lines or FormatDetector.REGION_LINES
+        self.first_region_lines = first_region_lines or self.region_lines
+        self.max_switches = FormatDetector.MAX_SWITCHES if max_switches is None else max_switches
+        self.kwargs = kwargs
+        self.runs = []
+        self.run_starts = []
+        # Log format of first line recognized on the file
+        self.first_format = None
+        # Lines recognized for each log format
+        self.line_count = Counter()
+
+    def get_regions(self):
+        """
+        :return: list of regions (start, end) to sample, byte offsets; each region starts at the start of a line and
+        ends where next one starts
+        """
+        size = self.log_file.get_data_size()
+        if not size:
+            return []
+
+        starts = [0]
+        with self.log_file.open_buffer() as buffer:
+            for each_region in range(1, self.regions):
+                newline = buffer.find(b'\n', size * each_region // self.regions, size)
+                if newline == -1:
+                    break
+                if newline + 1 > starts[-1] and newline + 1 < size:
+                    starts.append(newline + 1)
+
+        return list(zip(starts, starts[1:] + [size]))
+
+    def detect_line(self, line, previous=None):
+        """
+        :param line: log line
+        :param previous: log format of previous line recognized, it is tried first (formats come in runs)
+        :return: log format of given line, None if no log format matches it
+        """
+        if previous and self.parsers[previous].parse(line, **self.kwargs):
+            return previous
+
+        for each_format, header_parser in self.parsers.items():
+            if each_format != previous and header_parser.parse(line, **self.kwargs):
+                return each_format
+
+        return None
+
+    def sample_region(self, region):
+        """
+        Detect log format of first lines of a region; at file start, sampling goes on (up to first_region_lines)
+        while no line is recognized
+        :param region: (start, end) byte offsets
+        :return: tuple (list of (byte offset, log format) of lines recognized, byte offset where sampling stopped)
+        """
+        start, end = region
+        max_lines = self.first_region_lines if start == 0 else self.region_lines
+        samples = []
+        position = start
+        previous = None
+        with self.log_file.open_buffer() as buffer:
+            for line_count in range(max(max_lines, self.region_lines)):
+                if position >= end or (line_count >= self.region_lines and samples):
+                    break
+                newline = buffer.find(b'\n', position, end)
+                line_end = end if newline == -1 else newline
+                line = str(buffer[position:line_end], 'utf-8', 'ignore').rstrip('\r')
+                line_format = self.detect_line(line, previous)
+                if line_format:
+                    samples.append((position, line_format))
+                    previous = line_format
+                position = line_end + 1
+
+        return samples, min(position, end)
+
+    def build_runs(self, regions, sampled):
+        """
+        Build format runs from sampled regions: within a region a run starts on first line of each format found
+        (a region switching too many times is a single run with all its formats); between two regions, the part not
+        sampled belongs to previous run when next region starts with same formats, otherwise it is a run with
+        formats of both sides, as its boundary is unknown.
+        :param regions: list of regions (see get_regions)
+        :param sampled: result of sample_region for each region
+        :return: None
+        """
+        runs = []
+        for (region_start, _), (samples, sampled_end) in zip(regions, sampled):
+            if not samples:
+                # Lines not recognized (like stack traces) belong to the run around them
+                continue
+            self.line_count.update(each_format for _, each_format in samples)
+            if self.first_format is None:
+                self.first_format = samples[0][1]
+
+            region_runs = []
+            for offset, each_format in samples:
+                if not region_runs or region_runs[-1].formats != (each_format,):
+                    region_runs.append(FormatDetector.Run(offset, (each_format,)))
+            if len(region_runs) - 1 > self.max_switches:
+                region_formats = Counter(each_format for _, each_format in samples)
+                region_runs = [FormatDetector.Run(region_start, tuple(each_format for each_format, _ in
+                                                                      region_formats.most_common()))]
+            region_runs[0].start = region_start
+
+            if runs and runs[-1].formats != region_runs[0].formats:
+                # Boundary is somewhere between end of previous sampling and this region first recognized line
+                gap = FormatDetector.Run(runs[-1].sampled_end, tuple(dict.fromkeys(runs[-1].formats +
+                                                                                  region_runs[0].formats)))
+                region_runs[0].start = samples[0][0]
+                runs.append(gap)
+            region_runs[-1].sampled_end = sampled_end
+            runs.extend(region_runs)
+
+        # Consecutive runs with same formats are a single run
+        self.runs = []
+        for each_run in runs:
+            if self.runs and self.runs[-1].formats == each_run.formats:
+                continue
+            self.runs.append(each_run)
+        if self.runs:
+            self.runs[0].start = 0
+        self.run_starts = [each_run.start for each_run in self.runs]
+
+    def get_formats(self, start=0, size=None):
+        """
+        Return log formats found on a range of the file
+        :param start: byte offset
+        :param size: number of bytes, by default up to the end of the file
+        :return: list of log formats, formats of first run first; empty if no format was recognized
+        """
+        if not self.runs:
+            return []
+
+        first = max(bisect.bisect_right(self.run_starts, start) - 1, 0)
+        last = len(self.runs) - 1 if size is None else max(bisect.bisect_left(self.run_starts, start + size) - 1,
+                                                               first)
+        formats = {}
+        for each_run in self.runs[first:last + 1]:
+            formats.update(dict.fromkeys(each_run.formats))
+
+        return list(formats)
+
+    def is_mixed(self):
+        """
+        :return: True if more than one log format was found on the file
+        """
+        return len(self.line_count) > 1
+
+    def get_runs(self):
+        """
+        :return: list of runs as dictionaries (start, formats)
+        """
+        return [each_run.to_dict() for each_run in self.runs]
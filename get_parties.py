@@ -1,10 +1,12 @@
-from object_class import CordaObject
+from object_class import CordaObject, X500NameParser
+from party_registry import PartyRegistry
 
 class GetParties:
     def __init__(self, get_configs):
         self.Configs = get_configs
         self.file = None
-        self.x500list = []
+        # All parties found so far, indexed by x500 name fingerprint
+        self.x500list = PartyRegistry()
         self.type = None
 
     def clear(self):
@@ -12,7 +14,7 @@ class GetParties:
         Delete all collected party information
         :return:
         """
-        self.x500list = []
+        self.x500list = PartyRegistry()
 
     def get_element_type(self):
         """
@@ -39,15 +41,51 @@ class GetParties:
         """
         self.file = file
 
-    def execute(self, each_line, current_line=None):
+    def execute(self, each_line, current_line=None, context=None):
         """
         Process that need to be executed in parallel
         :param each_line: line from log file
-        :return: a list x500 name found
+        :param context: LineContext shared with other collectors (not used)
+        :return: a list of parties (x500 names) found on this line
         """
 
         # self.get_ref_ids(each_line)
 
-        parsed_names = self.file.parser.parse_line(each_line, self.x500list)
+        parsed_names = X500NameParser.register_x500_names(self.file.parser.extract_x500_names(each_line),
+                                                          self.x500list)
 
         return parsed_names
+
+    def prepare_batch(self, contexts):
+        """
+        Match party roles against a whole batch of lines, before each line is processed (see
+        FileManagement.prepare_party_roles)
+        :param contexts: list of LineContext, consecutive lines
+        :return: None
+        """
+        self.file.prepare_party_roles(contexts)
+
+    def scan(self, each_line, current_line=None, context=None):
+        """
+        Search part of `execute`, used by process engine; it doesn't modify any state
+        :param each_line: line from log file
+        :param current_line: line number from log file
+        :param context: LineContext shared with other collectors (not used)
+        :return: a list of x500 names (as text) found on this line, or None
+        """
+
+        names = self.file.parser.extract_x500_names(each_line)
+
+        if not names:
+            return None
+
+        return names
+
+    def merge(self, record):
+        """
+        Register x500 names given by `scan`, results are the same as given by `execute` on same line
+        :param record: a list of x500 names found on a line
+        :return: a list of parties (x500 names) found on that line
+        """
+
+        return X500NameParser.register_x500_names(record, self.x500list)
@@ -1,8 +1,8 @@
+from literal_prefilter import LiteralPrefilter
 from log_handler import write_log
-from object_class import CordaObject, get_fields_from_log, FileManagement
-from object_class import RegexLib,get_not_null
+from object_class import CordaObject, get_fields_from_log, FileManagement, LineContext
+from ref_id_scanner import RefIdScanner
 
-import re
 
 class GetRefIds:
 
@@ -12,6 +12,8 @@ class GetRefIds:
         self.file = None
         # self.x500list = []
         self.type = None
+        # Reference id scanner, built from CORDA_OBJECTS definitions the first time it is needed
+        self.scanner = None
 
     def get_element_type(self):
         """
@@ -39,7 +41,7 @@ class GetRefIds:
         """
         self.file = file
 
-    def get_ref_ids(self,each_line, current_line):
+    def get_ref_ids(self,each_line, current_line, context=None):
         """
         Search for all identifiable ids on a log, it also will keep a record of current line number
         where this id was found.
@@ -47,105 +49,115 @@ class GetRefIds:
         :return:
         """
 
-        corda_objects = self.Configs.get_config(section='CORDA_OBJECTS')
-        corda_object_detection = None
-        # Complete list of corda object regex definition
-        all_regex = []
-        # A helper list to give the type and avoid to do a second search on the config to gather object type
-        all_regex_type = []
-        if not corda_objects:
+        hits = self.scan_ref_ids(each_line, context)
+
+        if hits is None:
+            return None
+
+        return self.register_ref_ids(each_line, current_line, hits, context,
+                                     context.offset if context is not None else None)
+
+    def scan_ref_ids(self, each_line, context=None):
+        """
+        Search for all identifiable ids on given line; this is the searching part of `get_ref_ids`, it doesn't
+        modify any state so it can be executed on a separate process.
+        :param each_line: line from log file
+        :param context: LineContext shared with other collectors for this line
+        :return: a list of tuples (id, type) in the order they were found on the line, None if there's no
+        CORDA_OBJECTS definition
+        """
+
+        scanner = self.get_scanner()
+        if not scanner:
             write_log("No definition for corda objects found, please setup CORDA_OBJECT section on config", level='ERROR')
             return None
-        else:
-            # Collect from "CORDA_OBJECTS" all object definitions:
-            corda_objects = self.Configs.get_config(section="CORDA_OBJECTS")
 
-            for each_type in corda_objects:
-                if "EXPECT" in self.Configs.get_config(sub_param=each_type, section="CORDA_OBJECTS")[each_type]:
-                    regex_list = self.Configs.get_config(sub_param=each_type, section="CORDA_OBJECTS")[each_type]["EXPECT"]
-                    for each_rgx in regex_list:
-                        # Before adding it into list, will replace any macrovariable within (like __txid__ or __participant__ etc...)
-                        all_regex.append(RegexLib.build_regex(each_rgx, nogroup_name=True))
-                        all_regex_type.append(each_type)
+        if context is not None and context.ref_ids is not None:
+            # Already found when line batch was scanned (see prepare_batch)
+            return context.ref_ids
 
-            # Prepare full regex for quick detection (combine all "forms" of references ID's defined)
-            corda_object_detection = "|".join(all_regex)
+        if context is None:
+            context = LineContext(self.file, each_line)
+        if not context.applies(LiteralPrefilter.Family.CORDA_OBJECTS):
+            # No reference id can be found on this line
+            return []
 
+        # This will try to match given line with all possible patterns for required ID's these patterns came
+        # from definition file at CORDA_OBJECT in there you will see all definitions program is looking for to
+        # identify a CORDA_OBJECT
         try:
-            co = None
-            # This will try to match given line with all possible patterns for required ID's these patterns came
-            # from definition file at CORDA_OBJECT in there you will see all definitions program is looking for to
-            # identify a CORDA_OBJECT
+            return scanner.scan(each_line)
+        except BaseException as be:
+            return []
+
+    def get_scanner(self):
+        """
+        Return reference id scanner (see RefIdScanner), it is built from CORDA_OBJECTS definitions the first time
+        :return: RefIdScanner, None if there's no CORDA_OBJECTS definition
+        """
+        if self.scanner is None:
+            corda_objects = self.Configs.get_config(section='CORDA_OBJECTS')
+            if not corda_objects:
+                return None
             try:
-                cordaobject_id_match = re.finditer(corda_object_detection, each_line)
+                self.scanner = RefIdScanner(corda_objects)
             except BaseException as be:
-                pass
-            if cordaobject_id_match:
-                group_count = 0
-                co = None
-                for matchNum, match in enumerate(cordaobject_id_match, start=1):
-                    # for groupNum in range(0, len(match.groups())):
-                    # groupNum = groupNum + 1
-                    groupNum_list = get_not_null(match.groups(), start=1)
-                    for groupNum in groupNum_list:
-                        each_group = match.group(groupNum)
-
-                        if each_group:
-                            if each_group in CordaObject.id_ref and CordaObject.get_object(each_group) :
-                                # Store this  line involving current reference
-                                cob = CordaObject.get_object(each_group)
-                                cob.add_data('references', current_line)
-                                # Add current line where this id was also found so I can check this line later
-                                cob.references[current_line] = each_line
-                                self.file.add_element(self.get_element_type(),cob)
-                                continue
-                            else:
-                                # print("id {group} identified as {type}".format(
-                                #     group=match.group(groupNum),
-                                #     type=all_regex_type[groupNum-1]
-                                # ))
-
-                                # Add a new reference found into the list
-                                CordaObject.id_ref.append(each_group)
-                                #
-                                # Also create this object to be identified later:
-                                # first extract line features (timestamp, severity, etc)
-                                log_line_fields = get_fields_from_log(each_line, self.file.logfile_format, self.file)
-                                # Create object:
-                                co = CordaObject()
-                                # TODO: Hay un bug que ocurre cuando el programa detecta un corda_object que esta
-                                #  en una linea que esta fuera (tiene retorno de carro) de la linea principal del
-                                #  log lo que provoca que el objeto no sea creado... por los momentos voy a
-                                #  ignorar estas referencias...
-                                if log_line_fields:
-                                    if not 'error_level' in log_line_fields:
-                                        log_line_fields['error_level'] = 'INFO'
-                                    # Create object
-                                    co.add_data("id_ref", each_group)
-                                    co.add_data("Original line", each_line)
-                                    co.add_data("error_level", log_line_fields["error_level"])
-                                    co.add_data("timestamp", log_line_fields["timestamp"])
-                                    co.add_data("type", all_regex_type[groupNum-1])
-                                    co.add_data("line_number", current_line)
-                                    co.set_type(all_regex_type[groupNum-1])
-                                    co.set_timestamp(log_line_fields["timestamp"])
-                                    co.set_error_level(log_line_fields["error_level"])
-                                    co.set_reference_id(each_group)
-                                    co.set_line_number(current_line)
-                                    co.add_object()
-                                else:
-                                    # This is in case read line is not recognized and this could be because
-                                    # line is broken, ie it is part of previous line, which means it won't be recognized
-                                    # properly to pull metadata like timestamp etc...
-                                    co.add_data("id_ref", each_group)
-                                    co.add_data("Original line", each_line)
-                                    co.add_data("error_level", "INFO")
-                                    co.add_data("timestamp", "UNKNOWN")
-                                    co.add_data("type", all_regex_type[groupNum-1])
-                                    co.add_data("line_number", current_line)
-                                    co.set_type(all_regex_type[groupNum-1])
-                                    co.add_object()
+                write_log(f"Unable to prepare reference id detection: {be}", level='ERROR')
+                return None
+
+        return self.scanner
+
+    def prepare_batch(self, contexts):
+        """
+        Scan a whole batch of lines at once, before each line is processed; reference ids found are kept on each
+        line context, to be used by `scan_ref_ids`
+        :param contexts: list of LineContext, consecutive lines
+        :return: None
+        """
+        scanner = self.get_scanner()
+        if not scanner or not contexts:
+            return
+
+        try:
+            hits = scanner.scan_batch([context.line for context in contexts], contexts[0].line_no)
+        except BaseException as be:
+            return
+
+        for context in contexts:
+            context.ref_ids = []
+        for line_no, object_type, ref_id in hits:
+            contexts[line_no - contexts[0].line_no].ref_ids.append((ref_id, object_type))
+
+    def register_ref_ids(self, each_line, current_line, hits, context=None, offset=None):
+        """
+        Register ids found by `scan_ref_ids`; a known id will get current line as a new reference, a new id will
+        be created as a new CordaObject.
+        :param each_line: line from log file
+        :param current_line: line number from log file
+        :param hits: list of tuples (id, type) found on this line
+        :param context: LineContext for this line, to reuse its header if it was already parsed
+        :param offset: byte offset of this line on the log
+        :return: last CordaObject created from this line, None if no new object was created
+        """
 
+        try:
+            co = None
+            for each_group, each_type in hits:
+                # Object is looked up and, if reference is new, created and registered at once; threads scanning
+                # other blocks could find same reference at same time
+                cob, created = CordaObject.get_or_add_object(
+                    each_group, each_type,
+                    lambda: self.new_object(each_line, current_line, each_group, each_type, context))
+                if created:
+                    co = cob
+                    continue
+
+                # Store this  line involving current reference
+                cob.add_data('references', current_line)
+                # Add current line where this id was also found so I can check this line later (only its offset is
+                # kept when it is known, line is read back from the log when needed)
+                cob.references.add(current_line, each_line, offset, self.file)
+                self.file.add_element(self.get_element_type(),cob)
 
             if not self.file.logfile_format:
                 write_log("Sorry I can't find a proper log template to parse this log terminating program", level='WARN')
@@ -158,24 +170,98 @@ class GetRefIds:
         except IOError as io:
             write_log('Sorry unable to open %s due to %s' % (self.file.logfile_format, io), level='ERROR')
             return None
-        # except BaseException as be:
-        #     write_log(f'Unknown error, stopping processing {be}', level='ERROR')
-        #     return None
 
 
-    def execute(self, each_line, current_line):
+    def new_object(self, each_line, current_line, each_group, each_type, context=None):
+        """
+        Create a CordaObject for a reference id found for first time
+        :param each_line: line from log file
+        :param current_line: line number from log file
+        :param each_group: reference id
+        :param each_type: type of reference
+        :param context: LineContext for this line, to reuse its header if it was already parsed
+        :return: CordaObject
+        """
+        #
+        # Create this object to be identified later:
+        # first extract line features (timestamp, severity, etc)
+        log_line_fields = get_fields_from_log(each_line, self.file.logfile_format, self.file, context)
+        # Create object:
+        co = CordaObject()
+        # TODO: Hay un bug que ocurre cuando el programa detecta un corda_object que esta
+        #  en una linea que esta fuera (tiene retorno de carro) de la linea principal del
+        #  log lo que provoca que el objeto no sea creado... por los momentos voy a
+        #  ignorar estas referencias...
+        if log_line_fields:
+            if not 'error_level' in log_line_fields:
+                log_line_fields['error_level'] = 'INFO'
+            # Create object
+            co.add_data("id_ref", each_group)
+            co.add_data("Original line", each_line)
+            co.add_data("error_level", log_line_fields["error_level"])
+            co.add_data("timestamp", log_line_fields["timestamp"])
+            co.add_data("type", each_type)
+            co.add_data("line_number", current_line)
+            co.set_type(each_type)
+            co.set_timestamp(log_line_fields["timestamp"])
+            co.set_error_level(log_line_fields["error_level"])
+            co.set_reference_id(each_group)
+            co.set_line_number(current_line)
+        else:
+            # This is in case read line is not recognized and this could be because
+            # line is broken, ie it is part of previous line, which means it won't be recognized
+            # properly to pull metadata like timestamp etc...
+            co.add_data("id_ref", each_group)
+            co.add_data("Original line", each_line)
+            co.add_data("error_level", "INFO")
+            co.add_data("timestamp", "UNKNOWN")
+            co.add_data("type", each_type)
+            co.add_data("line_number", current_line)
+            co.set_type(each_type)
+
+        return co
+
+    def execute(self, each_line, current_line, context=None):
         """
         Process that need to be executed in parallel
         :param each_line: line from log file
         :param current_line: line number from log file
+        :param context: LineContext shared with other collectors for this line
         :return: a list x500 name found
         """
 
         # self.get_ref_ids(each_line)
-        parsed_objects = self.get_ref_ids(each_line, current_line)
+        parsed_objects = self.get_ref_ids(each_line, current_line, context)
 
         return parsed_objects
 
+    def scan(self, each_line, current_line, context=None):
+        """
+        Search part of `execute`, used by process engine; it doesn't modify any state
+        :param each_line: line from log file
+        :param current_line: line number from log file
+        :param context: LineContext shared with other collectors for this line
+        :return: a record (line number, line, [(id, type), ...], line offset) or None if no id was found
+        """
+
+        hits = self.scan_ref_ids(each_line, context)
+
+        if not hits:
+            return None
+
+        return current_line, each_line, hits, context.offset if context is not None else None
+
+    def merge(self, record):
+        """
+        Register a record given by `scan`, results are the same as given by `execute` on same line
+        :param record: a record (line number, line, [(id, type), ...], line offset)
+        :return: last CordaObject created, or None
+        """
+
+        current_line, each_line, hits, offset = record
+
+        return self.register_ref_ids(each_line, current_line, hits, offset=offset)
+
     @staticmethod
     def classify_results(results):
         """
@@ -0,0 +1,148 @@
+# header_parser.py
+import re as sre
+
+import numpy as np
+import regex as re
+
+
+class HeaderParser:
+    """
+    Compiled parser for log line header of a log format (VERSION.IDENTITY_FORMAT.<format>): a line is parsed into
+    the span (start, end) of each header field on the raw line, so fields are only sliced out of the line when they
+    are requested, and no dictionary is built for each line. Headers of a whole block of lines can be parsed at
+    once (see parse_block).
+    A parsed header is a tuple (offset, spans): spans of each field as given by the regex and offset where the line
+    starts on the text that was matched (0 when a single line is parsed, its position on joined lines when parsed as
+    a block); so block spans are used as they are, without rebasing them.
+    """
+
+    # Field holding log message
+    MESSAGE = 'message'
+    # Syntax that could look at text of other lines when lines are parsed as a block: look arounds and string anchors
+    LINE_ONLY_SYNTAX = sre.compile(r'\(\?<?[=!]|\\[AZzG]')
+
+    def __init__(self, log_format, definition, compiler=re.compile):
+        """
+        :param log_format: log format name
+        :param definition: log format definition, with its header regex (EXPECT) and FIELDS
+        :param compiler: function used to compile regex (pattern, flags)
+        """
+        self.log_format = log_format
+        self.pattern = definition['EXPECT']
+        self.fields = list(definition.get('FIELDS') or [])
+        self.regex = compiler(self.pattern, 0)
+        # Fields are taken by position, only when regex gives one group for each field
+        self.valid = self.regex.groups == len(self.fields)
+        self.field_group = {}
+        for index, field in enumerate(self.fields if self.valid else []):
+            self.field_group.setdefault(field, index)
+        self.compiler = compiler
+        # Multiline regex used by parse_block, compiled the first time it is needed (see get_block_regex)
+        self.block_regex = None
+        self.block_checked = False
+
+    def parse(self, line, **kwargs):
+        """
+        Parse header of a line
+        :param line: log line
+        :param kwargs: other arguments for regex search (like concurrent)
+        :return: parsed header (0, span (start, end) of each field, (-1, -1) for a field not found), None if line
+        has no header
+        """
+        match = self.regex.search(line, **kwargs)
+
+        return (0, match.regs[1:]) if match else None
+
+    def get_block_regex(self):
+        """
+        :return: header regex compiled for multiline matching, None if it can't be used over a block of lines
+        """
+        if not self.block_checked:
+            if not HeaderParser.LINE_ONLY_SYNTAX.search(self.pattern):
+                try:
+                    self.block_regex = self.compiler(self.pattern, re.MULTILINE)
+                except re.error:
+                    self.block_regex = None
+            self.block_checked = True
+
+        return self.block_regex
+
+    def parse_block(self, lines, **kwargs):
+        """
+        Parse headers of a block of lines at once: lines are joined and header regex runs a single (multiline)
+        finditer over the block, match offsets are mapped back to their lines with a binary search (numpy
+        searchsorted). Lines touched by a match that goes beyond its line are parsed again on their own, so result
+        is the same as parsing line by line.
+        :param lines: list of lines (lines holding a line terminator are not parsed as a block)
+        :param kwargs: other arguments for regex search (like concurrent)
+        :return: list with result of parse for each line
+        """
+        if len(lines) < 2 or self.get_block_regex() is None or any('\n' in each_line for each_line in lines):
+            return [self.parse(each_line, **kwargs) for each_line in lines]
+
+        headers = [None] * len(lines)
+        line_lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+        line_starts = np.zeros(len(lines), dtype=np.int64)
+        np.cumsum(line_lengths[:-1] + 1, out=line_starts[1:])
+        matches = list(self.block_regex.finditer('\n'.join(lines), **kwargs))
+        if not matches:
+            return headers
+
+        spans = np.array([match.span() for match in matches], dtype=np.int64)
+        match_lines = np.searchsorted(line_starts, spans[:, 0], side='right') - 1
+        last_lines = np.searchsorted(line_starts, np.maximum(spans[:, 1] - 1, spans[:, 0]), side='right') - 1
+        # Matches going beyond end of their line (they took the new line)
+        crossing = (last_lines != match_lines) | (spans[:, 1] > line_starts[match_lines] + line_lengths[match_lines])
+        line_by_line = set()
+        for match, line_index, last_line, crossed in zip(matches, match_lines.tolist(), last_lines.tolist(),
+                                                         crossing.tolist()):
+            if crossed:
+                # Match taken from several lines, all of them are parsed again on their own
+                line_by_line.update(range(line_index, last_line + 1))
+            elif headers[line_index] is None:
+                # First match of a line is the one a search on that line gives
+                headers[line_index] = (int(line_starts[line_index]), match.regs[1:])
+
+        for line_index in line_by_line:
+            headers[line_index] = self.parse(lines[line_index], **kwargs)
+
+        return headers
+
+    def get(self, line, header, field):
+        """
+        Return a field from a parsed header
+        :param line: log line
+        :param header: parsed header (see parse)
+        :param field: field name (like timestamp)
+        :return: field value, None if line has no header or field is not defined
+        """
+        group = self.field_group.get(field)
+        if header is None or group is None:
+            return None
+        offset, spans = header
+        start, end = spans[group]
+
+        return line[start - offset:end - offset] if start >= 0 else None
+
+    def get_groups(self, line, header):
+        """
+        :param line: log line
+        :param header: parsed header (see parse)
+        :return: value of each field (like match.groups()), None if line has no header
+        """
+        if header is None:
+            return None
+        offset, spans = header
+
+        return tuple(line[start - offset:end - offset] if start >= 0 else None for start, end in spans)
+
+    def get_message_offset(self, header):
+        """
+        :param header: parsed header (see parse)
+        :return: offset of log message on its line, None if it is unknown
+        """
+        group = self.field_group.get(HeaderParser.MESSAGE)
+        if header is None or group is None or header[1][group][0] < 0:
+            return None
+
+        return header[1][group][0] - header[0]
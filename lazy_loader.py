@@ -1,7 +1,7 @@
 # lazy_loader.py
-import os
 import threading
 from queue import Queue
+from line_index import LineIndex
 from log_handler import write_log
 from support_icons import Icons
 
@@ -24,63 +24,16 @@ class LazyTextLoader:
         self._start_loader_thread()
 
     def _find_chunk_boundaries(self):
-        """Encuentra los límites de chunks basados en líneas completas (CONTEO PRECISO)"""
+        """Encuentra los límites de chunks basados en líneas completas, usando el índice de líneas del archivo"""
         try:
-            with open(self.filepath, 'rb') as f:
-                chunk_size = 65536 if os.path.getsize(self.filepath) > 100_000_000 else 8192
-                position = 0
-                lines_counted = 0
-                self.chunk_boundaries = []  # Reiniciar
-
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
+            line_index = LineIndex.get(self.filepath)
+            self.chunk_boundaries = line_index.get_chunk_boundaries(self.lines_per_chunk)
+            self.total_lines = line_index.total_lines
 
-                    # Contar líneas individualmente (no solo contar \n)
-                    chunk_pos = 0
-                    chunk_len = len(chunk)
-
-                    while chunk_pos < chunk_len:
-                        # Buscar el próximo \n
-                        nl_pos = chunk.find(b'\n', chunk_pos)
-
-                        if nl_pos == -1:
-                            # No hay más \n en este chunk
-                            lines_counted += 1  # Última línea sin \n
-                            break
-
-                        # Contar esta línea
-                        lines_counted += 1
-                        chunk_pos = nl_pos + 1
-
-                        # Si hemos alcanzado el límite de líneas
-                        if lines_counted >= self.lines_per_chunk:
-                            # Calcular posición absoluta del final de esta línea
-                            boundary = position + nl_pos + 1
-                            self.chunk_boundaries.append(boundary)
-                            lines_counted = 0
-
-                    # Actualizar posición absoluta
-                    position += chunk_len
-
-                # Asegurar que haya al menos un chunk
-                file_size = os.path.getsize(self.filepath)
-                if not self.chunk_boundaries:
-                    self.chunk_boundaries = [file_size]
-                elif self.chunk_boundaries[-1] < file_size:
-                    self.chunk_boundaries.append(file_size)
-
-                # Contar líneas totales
-                self.total_lines = sum(1 for _ in open(self.filepath, 'r'))
-
-                # Depuración
-                for i, boundary in enumerate(self.chunk_boundaries):
-                    start = self.chunk_boundaries[i-1] if i > 0 else 0
-                    # Calcular exceso de líneas
-                    lines_in_chunk = self._count_lines_in_range(start, boundary)
-                    excess = lines_in_chunk - self.lines_per_chunk if i > 0 else lines_in_chunk
-                    write_log(f"Chunk {i}: from {start} until {boundary} line excess {max(0, excess)}")
+            # Depuración
+            for i, boundary in enumerate(self.chunk_boundaries):
+                start = self.chunk_boundaries[i-1] if i > 0 else 0
+                write_log(f"Chunk {i}: from {start} until {boundary}")
 
         except Exception as e:
             write_log(f"{Icons.ERROR} Error analysing file {self.filepath}: {str(e)}", level="ERROR")
@@ -89,13 +42,11 @@ class LazyTextLoader:
 
     def _count_lines_in_range(self, start, end):
         """Cuenta líneas en un rango específico del archivo"""
-        count = 0
         with open(self.filepath, 'rb') as f:
             f.seek(start)
-            while f.tell() < end:
-                if f.readline():
-                    count += 1
-        return count
+            data = f.read(end - start)
+
+        return LineIndex.count_newlines(data) + (1 if data and not data.endswith(b'\n') else 0)
 
     def get_chunk(self, chunk_index):
         """Obtiene un chunk específico del archivo"""
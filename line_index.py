@@ -0,0 +1,455 @@
+# line_index.py
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from log_handler import write_log
+from support_icons import Icons
+
+
+class LineIndex:
+    """
+    Sparse index of line positions for a log file; it keeps byte offset of every Nth line (step), so any line can be
+    reached reading at most `step` lines. Index is saved next to the log file (sidecar) and is only reused if file
+    size and modification time are still the same. An index for a smaller version of the file is only extended when
+    it is still the same file (same inode, and same first and last indexed bytes, see get_fingerprint), so a rotated
+    or truncated log never reuses offsets of its previous content.
+    """
+
+    # Sidecar layout: magic, version, step, file size, file mtime (ns), total lines, number of offsets, inode,
+    # fingerprint
+    HEADER = struct.Struct('<4sHIQQQQQ8s')
+    MAGIC = b'LTLI'
+    VERSION = 2
+    # Bytes taken from start and end of indexed data for its fingerprint
+    FINGERPRINT_BYTES = 4096
+    EXTENSION = '.lidx'
+    DEFAULT_STEP = 1000
+    # Size of each segment scanned by a separate thread when index is built
+    SEGMENT_SIZE = 64 * 1024 * 1024
+
+    # Index already loaded, by absolute path of log file
+    indexes = {}
+    lock = threading.Lock()
+
+    def __init__(self, filename, step=None):
+        """
+        Index initialization
+        :param filename: log file to index
+        :param step: number of lines between each offset saved
+        """
+        self.filename = filename
+        self.step = step or LineIndex.DEFAULT_STEP
+        self.file_size = 0
+        self.mtime = 0
+        self.total_lines = 0
+        self.offsets = np.zeros(0, dtype=np.uint64)
+        self.inode = 0
+        self.fingerprint = b''
+
+    @classmethod
+    def get(cls, filename, step=None, buffer=None, save=True, append=False):
+        """
+        Return index for given file; it will be taken from memory or from its sidecar file if it is still valid,
+        otherwise it will be built (and saved)
+        :param filename: log file
+        :param step: number of lines between each offset saved
+        :param buffer: file already mapped in memory (optional) to avoid mapping it again
+        :param save: save index into its sidecar file if it was built
+        :param append: file is known to only grow (a log being followed); an outdated index for a smaller file
+        will be extended scanning only new data instead of being rebuilt
+        :return: a LineIndex
+        """
+        key = os.path.abspath(filename)
+        step = step or LineIndex.DEFAULT_STEP
+
+        with cls.lock:
+            index = cls.indexes.get(key)
+            if index and index.step == step and index.is_valid():
+                return index
+
+            if not index or index.step != step:
+                index = LineIndex(filename, step)
+                loaded = index.load(append, buffer)
+            else:
+                loaded = append and index.file_size <= index._file_stat()[0] and index.is_same_file(buffer)
+
+            if loaded and not index.is_valid():
+                index.extend(buffer)
+                if save:
+                    index.save()
+            elif not loaded:
+                index.build(buffer)
+                if save:
+                    index.save()
+
+            cls.indexes[key] = index
+
+        return index
+
+    @staticmethod
+    def count_newlines(buffer, start=0, size=None, window=16 * 1024 * 1024):
+        """
+        Count new lines on given buffer range; counting is done by numpy over the buffer (no copy, no decoding)
+        :param buffer: any object supporting buffer protocol (mmap, bytes, memoryview)
+        :param start: offset where to start counting
+        :param size: number of bytes to check, by default up to the end of the buffer
+        :param window: max number of bytes to check at once, to keep memory bounded
+        :return: number of new lines found
+        """
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        if size is None:
+            size = len(data) - start
+
+        newlines = 0
+        for offset in range(start, start + size, window):
+            newlines += int(np.count_nonzero(data[offset:min(offset + window, start + size)] == 10))
+
+        return newlines
+
+    def get_sidecar_name(self):
+        """
+        :return: name of the file used to save this index
+        """
+        return f'{self.filename}{LineIndex.EXTENSION}'
+
+    def _file_stat(self):
+        """
+        :return: (size, mtime in ns) of log file
+        """
+        stat = os.stat(self.filename)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _indexed_size(self, buffer, stat_size):
+        """
+        Size of data to index: file may have grown after it was mapped, only data on the buffer can be indexed
+        :param buffer: file mapped in memory (None if file is mapped by the index itself)
+        :param stat_size: file size given by os.stat
+        :return: size
+        """
+        return stat_size if buffer is None else min(len(buffer), stat_size)
+
+    def get_fingerprint(self, buffer=None, size=None):
+        """
+        Fingerprint of indexed data: hash of its first and last bytes (see FINGERPRINT_BYTES)
+        :param buffer: file mapped in memory (optional), otherwise file is read
+        :param size: size of indexed data, by default self.file_size
+        :return: 8 bytes
+        """
+        size = self.file_size if size is None else size
+        head_end = min(size, LineIndex.FINGERPRINT_BYTES)
+        tail_start = max(head_end, size - LineIndex.FINGERPRINT_BYTES)
+        if buffer is not None:
+            head, tail = buffer[:head_end], buffer[tail_start:size]
+        else:
+            with open(self.filename, 'rb') as file:
+                head = file.read(head_end)
+                file.seek(tail_start)
+                tail = file.read(size - tail_start)
+
+        return hashlib.blake2b(head + tail, digest_size=8).digest()
+
+    def is_same_file(self, buffer=None):
+        """
+        Check if log file is still the one this index was built for (it may have grown), and not a rotated or
+        truncated one
+        :param buffer: file mapped in memory (optional)
+        :return: True if inode and fingerprint of indexed data are the same
+        """
+        try:
+            if os.stat(self.filename).st_ino != self.inode:
+                return False
+            if buffer is not None and len(buffer) < self.file_size:
+                return False
+            return self.get_fingerprint(buffer) == self.fingerprint
+        except OSError:
+            return False
+
+    def is_valid(self):
+        """
+        Check if index still represents log file
+        :return: True if file size and modification time are the same than the ones used to build this index
+        """
+        try:
+            return self._file_stat() == (self.file_size, self.mtime)
+        except OSError:
+            return False
+
+    def load(self, append=False, buffer=None):
+        """
+        Load index from its sidecar file
+        :param append: accept an index built for a smaller version of the file (it will need to be extended), as
+        long as it is still same file (see is_same_file)
+        :param buffer: file mapped in memory (optional)
+        :return: True if index was loaded and it is valid for actual log file, False otherwise
+        """
+        sidecar = self.get_sidecar_name()
+        if not os.path.exists(sidecar):
+            return False
+
+        try:
+            with open(sidecar, 'rb') as findex:
+                header = findex.read(LineIndex.HEADER.size)
+                if len(header) != LineIndex.HEADER.size:
+                    return False
+                magic, version, step, file_size, mtime, total_lines, count, inode, fingerprint = \
+                    LineIndex.HEADER.unpack(header)
+                if magic != LineIndex.MAGIC or version != LineIndex.VERSION or step != self.step:
+                    return False
+                offsets = np.fromfile(findex, dtype='<u8', count=count)
+                if len(offsets) != count:
+                    return False
+        except (OSError, ValueError, struct.error) as io:
+            write_log(f'Unable to read line index {sidecar} due to {io}', level='WARN')
+            return False
+
+        self.file_size = file_size
+        self.mtime = mtime
+        self.total_lines = total_lines
+        self.offsets = offsets.astype(np.uint64)
+        self.inode = inode
+        self.fingerprint = fingerprint
+
+        try:
+            actual_size, actual_mtime = self._file_stat()
+        except OSError:
+            return False
+        if (file_size, mtime) != (actual_size, actual_mtime) and \
+                not (append and file_size <= actual_size and self.is_same_file(buffer)):
+            write_log(f'{Icons.INFO} Line index for {self.filename} is outdated, rebuilding it...')
+            return False
+
+        return True
+
+    def save(self):
+        """
+        Save index into its sidecar file
+        :return: True if index was saved
+        """
+        sidecar = self.get_sidecar_name()
+        try:
+            with open(sidecar, 'wb') as findex:
+                findex.write(LineIndex.HEADER.pack(LineIndex.MAGIC, LineIndex.VERSION, self.step, self.file_size,
+                                                   self.mtime, self.total_lines, len(self.offsets), self.inode,
+                                                   self.fingerprint))
+                self.offsets.astype('<u8').tofile(findex)
+        except OSError as io:
+            write_log(f'Unable to save line index {sidecar} due to {io}, index will be kept in memory', level='WARN')
+            return False
+
+        return True
+
+    def build(self, buffer=None, max_workers=None):
+        """
+        Build index scanning file; file is split into segments that are scanned in parallel, first pass will count
+        new lines of each segment, second one will pick offsets of every `step` lines.
+        :param buffer: file already mapped in memory (optional)
+        :param max_workers: number of threads to use
+        :return: None
+        """
+        stat_size, self.mtime = self._file_stat()
+        self.inode = os.stat(self.filename).st_ino
+        self.file_size = self._indexed_size(buffer, stat_size)
+        self.total_lines = 0
+        self.offsets = np.zeros(0, dtype=np.uint64)
+        self.fingerprint = b''
+
+        if not self.file_size:
+            return
+
+        if buffer is None:
+            with open(self.filename, 'rb') as file:
+                with mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ) as mmapped_file:
+                    # File may have grown after it was checked
+                    self.file_size = min(self.file_size, len(mmapped_file))
+                    self._build(mmapped_file, max_workers)
+                    self.fingerprint = self.get_fingerprint(mmapped_file)
+        else:
+            self._build(buffer, max_workers)
+            self.fingerprint = self.get_fingerprint(buffer)
+
+    def _build(self, buffer, max_workers=None):
+        """
+        Actual index build over given buffer
+        :param buffer: file mapped in memory
+        :param max_workers: number of threads to use
+        :return: None
+        """
+        data = np.frombuffer(buffer, dtype=np.uint8)[:self.file_size]
+        segments = [(start, min(start + LineIndex.SEGMENT_SIZE, self.file_size))
+                    for start in range(0, self.file_size, LineIndex.SEGMENT_SIZE)]
+        max_workers = max_workers or min(len(segments), os.cpu_count() or 1)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            newlines = list(pool.map(lambda segment: LineIndex.count_newlines(data, segment[0],
+                                                                              segment[1] - segment[0]), segments))
+
+            # Number of new lines found before each segment
+            newlines_before = np.concatenate(([0], np.cumsum(newlines)[:-1])).astype(np.int64)
+
+            def pick_offsets(segment_no):
+                start, end = segments[segment_no]
+                positions = np.flatnonzero(data[start:end] == 10) + start
+                # k-th new line of the file starts line k + 2; keep lines where (line - 1) % step == 0
+                first = int(-(newlines_before[segment_no] + 1) % self.step)
+                return positions[first::self.step] + 1
+
+            picked = list(pool.map(pick_offsets, range(len(segments))))
+
+        offsets = np.concatenate([np.zeros(1, dtype=np.int64)] + [each.astype(np.int64) for each in picked])
+        # A new line at the very end of the file doesn't start a new line
+        offsets = offsets[offsets < self.file_size]
+
+        self.offsets = offsets.astype(np.uint64)
+        self.total_lines = int(sum(newlines))
+        if data[self.file_size - 1] != 10:
+            self.total_lines += 1
+
+        del data
+
+    def extend(self, buffer=None):
+        """
+        Update index for a file that has grown; only data after last indexed line is scanned
+        :param buffer: file already mapped in memory (optional)
+        :return: None
+        """
+        if not len(self.offsets):
+            return self.build(buffer)
+
+        stat_size, mtime = self._file_stat()
+        file_size = self._indexed_size(buffer, stat_size)
+        if buffer is None:
+            with open(self.filename, 'rb') as file:
+                with mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ) as mmapped_file:
+                    # File may have grown after it was checked
+                    file_size = min(file_size, len(mmapped_file))
+                    self._extend(mmapped_file, file_size)
+                    self.fingerprint = self.get_fingerprint(mmapped_file, file_size)
+        else:
+            self._extend(buffer, file_size)
+            self.fingerprint = self.get_fingerprint(buffer, file_size)
+
+        self.file_size = file_size
+        self.mtime = mtime
+
+    def _extend(self, buffer, file_size):
+        """
+        Actual index update over given buffer
+        :param buffer: file mapped in memory
+        :param file_size: new size of the file
+        :return: None
+        """
+        data = np.frombuffer(buffer, dtype=np.uint8)[:file_size]
+        last_checkpoint = len(self.offsets) - 1
+        checkpoint_offset = int(self.offsets[last_checkpoint])
+        checkpoint_line = 1 + last_checkpoint * self.step
+
+        positions = np.flatnonzero(data[checkpoint_offset:file_size] == 10) + checkpoint_offset
+        # k-th new line after last checkpoint starts line checkpoint_line + k + 1
+        picked = positions[self.step - 1::self.step] + 1
+        picked = picked[picked < file_size]
+
+        self.offsets = np.concatenate((self.offsets, picked.astype(np.uint64)))
+        self.total_lines = checkpoint_line - 1 + len(positions)
+        if data[file_size - 1] != 10:
+            self.total_lines += 1
+
+        del data
+
+    def line_of(self, offset, buffer):
+        """
+        Return line number for given byte offset
+        :param offset: byte offset on the file
+        :param buffer: file mapped in memory
+        :return: line number (starting at 1) of line that contains given offset
+        """
+        if not len(self.offsets):
+            return 1
+
+        checkpoint = bisect.bisect_right(self.offsets, offset) - 1
+        checkpoint_offset = int(self.offsets[checkpoint])
+
+        return 1 + checkpoint * self.step + LineIndex.count_newlines(buffer, checkpoint_offset,
+                                                                     offset - checkpoint_offset)
+
+    def offset_of(self, line_no, buffer=None):
+        """
+        Return byte offset where given line starts
+        :param line_no: line number (starting at 1)
+        :param buffer: file mapped in memory (optional), if it is not given file will be read
+        :return: byte offset, file size if line number is beyond end of file
+        """
+        if line_no < 1:
+            line_no = 1
+        if line_no > self.total_lines or not len(self.offsets):
+            return self.file_size
+
+        checkpoint = (line_no - 1) // self.step
+        offset = int(self.offsets[checkpoint])
+        lines_to_skip = (line_no - 1) - checkpoint * self.step
+
+        if not lines_to_skip:
+            return offset
+
+        if buffer is not None:
+            for _ in range(lines_to_skip):
+                offset = buffer.find(b'\n', offset) + 1
+            return offset
+
+        with open(self.filename, 'rb') as file:
+            file.seek(offset)
+            for _ in range(lines_to_skip):
+                file.readline()
+            return file.tell()
+
+    def read_lines(self, line_no, count=1, buffer=None):
+        """
+        Read given lines from file
+        :param line_no: first line to read (starting at 1)
+        :param count: number of lines to read
+        :param buffer: file mapped in memory (optional)
+        :return: list of lines (without new line character)
+        """
+        offset = self.offset_of(line_no, buffer)
+        lines = []
+
+        if buffer is not None:
+            for _ in range(count):
+                if offset >= self.file_size:
+                    break
+                end = buffer.find(b'\n', offset, self.file_size)
+                end = self.file_size if end == -1 else end
+                lines.append(buffer[offset:end].decode('utf-8', errors='ignore').rstrip('\r'))
+                offset = end + 1
+            return lines
+
+        with open(self.filename, 'rb') as file:
+            file.seek(offset)
+            for _ in range(count):
+                line = file.readline()
+                if not line:
+                    break
+                lines.append(line.decode('utf-8', errors='ignore').rstrip('\r\n'))
+
+        return lines
+
+    def get_chunk_boundaries(self, lines_per_chunk, buffer=None):
+        """
+        Return end offset of each chunk of `lines_per_chunk` lines
+        :param lines_per_chunk: number of lines on each chunk
+        :param buffer: file mapped in memory (optional)
+        :return: list of offsets, last one is always file size
+        """
+        boundaries = [self.offset_of(line_no, buffer)
+                      for line_no in range(lines_per_chunk + 1, self.total_lines + 1, lines_per_chunk)]
+
+        if not boundaries or boundaries[-1] < self.file_size:
+            boundaries.append(self.file_size)
+
+        return boundaries
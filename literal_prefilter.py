@@ -0,0 +1,324 @@
+# literal_prefilter.py
+import bisect
+import re
+import threading
+from enum import Enum
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class LiteralPrefilter:
+    """
+    Cheap test to know which rules could match a line before trying their regex. For each rule, a set of literal
+    strings is extracted from its patterns, such that any line matching the rule must contain at least one of them;
+    a single multi-literal scan per line (Aho-Corasick when pyahocorasick is installed, a combined regex otherwise)
+    tells which rules are candidates. Rules without usable literals are always candidates.
+    """
+
+    class Family(Enum):
+        """
+        Rule families, named after the configuration section holding their patterns
+        """
+        CORDA_OBJECTS = 'CORDA_OBJECTS'
+        WATCH_FOR = 'WATCH_FOR'
+        UML_DEFINITIONS = 'UML_DEFINITIONS'
+        UML_ENTITY = 'UML_ENTITY'
+
+    # Shorter literals match almost every line, they are useless to discard lines
+    MIN_LITERAL_LENGTH = 3
+
+    def __init__(self, min_literal_length=None):
+        """
+        :param min_literal_length: minimum length of a literal to be used
+        """
+        self.min_literal_length = min_literal_length or LiteralPrefilter.MIN_LITERAL_LENGTH
+        # Rules that can't be filtered: {family: {key, ...}}
+        self.always = {}
+        # Rules that need a literal: {literal: {(family, key), ...}}
+        self.literal_rules = {}
+        self.scanner = None
+        self.automaton = None
+        self.last_line = threading.local()
+
+    def add(self, family, key, patterns):
+        """
+        Add a rule; rule will be a candidate for a line if any of its patterns could match it
+        :param family: LiteralPrefilter.Family
+        :param key: rule identifier within its family
+        :param patterns: list of patterns (macro variables already expanded)
+        :return: None
+        """
+        literals = set()
+        for each_pattern in patterns:
+            pattern_literals = LiteralPrefilter.required_literals(each_pattern, self.min_literal_length)
+            if not pattern_literals:
+                self.always.setdefault(family, set()).add(key)
+                return
+            literals.update(pattern_literals)
+
+        if not literals:
+            # No patterns, rule will never match
+            return
+
+        for each_literal in literals:
+            self.literal_rules.setdefault(each_literal, set()).add((family, key))
+
+    def compile(self):
+        """
+        Build literal scanner, it must be called after all rules were added
+        :return: None
+        """
+        literals = sorted(self.literal_rules, key=len, reverse=True)
+        # A literal found implies all literals it contains
+        implied = {}
+        for each_literal in literals:
+            implied[each_literal] = set()
+            for other_literal in literals:
+                if other_literal in each_literal:
+                    implied[each_literal].update(self.literal_rules[other_literal])
+        self.literal_rules = implied
+
+        self.always = {family: frozenset(keys) for family, keys in self.always.items()}
+
+        if not literals:
+            return
+
+        if ahocorasick:
+            self.automaton = ahocorasick.Automaton()
+            for each_literal in literals:
+                self.automaton.add_word(each_literal, each_literal)
+            self.automaton.make_automaton()
+        else:
+            # Longest literals first, so each match is the longest literal starting at that position
+            self.scanner = re.compile('|'.join(re.escape(each_literal) for each_literal in literals))
+
+    def find_literals(self, line):
+        """
+        :param line: log line
+        :return: set of literals found on given line
+        """
+        if self.automaton:
+            return {literal for _, literal in self.automaton.iter(line)}
+
+        found = set()
+        if not self.scanner:
+            return found
+
+        # Search again from next position after each match, to find overlapping literals
+        match = self.scanner.search(line)
+        while match:
+            found.add(match.group())
+            match = self.scanner.search(line, match.start() + 1)
+
+        return found
+
+    def candidates(self, line):
+        """
+        Return rules that could match given line; result for last line checked by each thread is kept, so several
+        collectors checking same line will scan it once.
+        :param line: log line
+        :return: dictionary {family: set of rule keys}, families without candidates are not included. It must not
+        be modified.
+        """
+        last_line = self.last_line
+        if getattr(last_line, 'line', None) is line:
+            return last_line.candidates
+
+        line_candidates = self._candidates_for(self.find_literals(line))
+
+        last_line.line = line
+        last_line.candidates = line_candidates
+
+        return line_candidates
+
+    def candidates_batch(self, lines):
+        """
+        Return rules that could match each line of a batch; whole batch is scanned at once (lines joined), so the
+        literal scanner works over a large unit instead of being called once per line.
+        :param lines: list of log lines (without line terminator)
+        :return: list with candidates of each line, as returned by candidates()
+        """
+        found = [None] * len(lines)
+        if self.automaton or self.scanner:
+            text = '\n'.join(lines)
+            # Offset where each line starts within text
+            line_starts = []
+            offset = 0
+            for each_line in lines:
+                line_starts.append(offset)
+                offset += len(each_line) + 1
+
+            for start, literal in self._iter_literals(text):
+                index = bisect.bisect_right(line_starts, start) - 1
+                if found[index] is None:
+                    found[index] = set()
+                found[index].add(literal)
+
+        return [self._candidates_for(each_found) for each_found in found]
+
+    def _iter_literals(self, text):
+        """
+        :param text: text to scan
+        :return: generator of (start offset, literal) for all literals found, overlapping ones included
+        """
+        if self.automaton:
+            for end, literal in self.automaton.iter(text):
+                yield end - len(literal) + 1, literal
+            return
+
+        match = self.scanner.search(text)
+        while match:
+            yield match.start(), match.group()
+            match = self.scanner.search(text, match.start() + 1)
+
+    def _candidates_for(self, found):
+        """
+        :param found: literals found on a line
+        :return: candidates for that line (see candidates())
+        """
+        if not found:
+            return self.always
+
+        line_candidates = {family: set(keys) for family, keys in self.always.items()}
+        for each_literal in found:
+            for family, key in self.literal_rules[each_literal]:
+                line_candidates.setdefault(family, set()).add(key)
+
+        return line_candidates
+
+    def applies(self, line, family, key=None):
+        """
+        Check if a rule (or any rule of a family) could match given line
+        :param line: log line
+        :param family: LiteralPrefilter.Family
+        :param key: rule identifier, if not given any rule of the family will do
+        :return: False if no rule can match given line
+        """
+        family_candidates = self.candidates(line).get(family)
+        if not family_candidates:
+            return False
+
+        return key is None or key in family_candidates
+
+    @staticmethod
+    def required_literals(pattern, min_literal_length=MIN_LITERAL_LENGTH):
+        """
+        Extract from a regex a set of literals where, at least, one of them must be present on any string matched
+        :param pattern: regex pattern
+        :param min_literal_length: shortest literal accepted
+        :return: set of literals, None if pattern has no usable literal (or it can't be parsed)
+        """
+        try:
+            parsed = sre_parse.parse(pattern)
+        except (re.error, ValueError, TypeError, OverflowError, RecursionError):
+            # Probably a pattern using syntax only supported by 'regex' module
+            return None
+
+        if parsed.state.flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_VERBOSE):
+            return None
+
+        requirements, _ = LiteralPrefilter._scan(parsed)
+
+        return LiteralPrefilter._best_requirement(requirements, min_literal_length)
+
+    @staticmethod
+    def _best_requirement(requirements, min_literal_length):
+        """
+        :param requirements: list of literal sets, each one of them is required
+        :param min_literal_length: shortest literal accepted
+        :return: requirement with the longest shortest literal, None if there's none long enough
+        """
+        best = None
+        best_length = 0
+        for each_requirement in requirements:
+            shortest = min(len(each_literal) for each_literal in each_requirement)
+            if shortest > best_length:
+                best = each_requirement
+                best_length = shortest
+
+        if best_length < min_literal_length:
+            return None
+
+        return set(best)
+
+    @staticmethod
+    def _scan(items):
+        """
+        Walk a parsed regex sequence collecting required literals
+        :param items: parsed sequence (sre_parse)
+        :return: tuple (requirements, exact); requirements is a list of literal sets where each one of them is
+        required, exact is the literal matched by whole sequence if it has only literals, None otherwise
+        """
+        requirements = []
+        run = []
+        exact = True
+
+        def flush():
+            if run:
+                requirements.append({''.join(run)})
+                run.clear()
+
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                run.append(chr(av))
+            elif op is sre_constants.AT:
+                # Zero width, it doesn't break a literal
+                continue
+            elif op in (sre_constants.SUBPATTERN, sre_constants.ATOMIC_GROUP):
+                if op is sre_constants.SUBPATTERN:
+                    _, add_flags, _, sub_items = av
+                    if add_flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_VERBOSE):
+                        flush()
+                        exact = False
+                        continue
+                else:
+                    sub_items = av
+                sub_requirements, sub_exact = LiteralPrefilter._scan(sub_items)
+                if sub_exact is not None:
+                    run.append(sub_exact)
+                else:
+                    flush()
+                    exact = False
+                    requirements.extend(sub_requirements)
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT):
+                low, _, sub_items = av
+                flush()
+                exact = False
+                if low >= 1:
+                    sub_requirements, sub_exact = LiteralPrefilter._scan(sub_items)
+                    requirements.extend(sub_requirements)
+                    if sub_exact:
+                        requirements.append({sub_exact})
+            elif op is sre_constants.BRANCH:
+                flush()
+                exact = False
+                alternatives = set()
+                for each_branch in av[1]:
+                    branch_requirements, branch_exact = LiteralPrefilter._scan(each_branch)
+                    if branch_exact:
+                        branch_requirements.append({branch_exact})
+                    best = LiteralPrefilter._best_requirement(branch_requirements, 1)
+                    if not best:
+                        alternatives = None
+                        break
+                    alternatives.update(best)
+                if alternatives:
+                    requirements.append(alternatives)
+            else:
+                flush()
+                exact = False
+
+        literal = ''.join(run) if exact else None
+        flush()
+
+        return requirements, literal
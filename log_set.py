@@ -0,0 +1,351 @@
+# log_set.py
+import bisect
+import glob
+import io
+import mmap
+import os
+from contextlib import contextmanager, closing
+
+from compressed_log import CompressedLog, BufferReader
+
+
+class LogFile:
+    """
+    Access to content of a single log file, plain or compressed (see CompressedLog)
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: log file
+        """
+        self.filename = filename
+        self.compressed_log = None
+        if os.path.isfile(self.filename) and CompressedLog.detect(self.filename):
+            self.compressed_log = CompressedLog(self.filename)
+
+    @contextmanager
+    def open_buffer(self):
+        """
+        Give access to file content as a buffer (mmap); compressed files are decompressed into memory the first time
+        :return: file content mapped in memory
+        """
+        if self.compressed_log:
+            yield self.compressed_log.get_buffer()
+            return
+
+        with open(self.filename, 'rb') as file:
+            with mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ) as mmapped_file:
+                yield mmapped_file
+
+    def open_text(self, start_offset=0):
+        """
+        Open file as text (utf-8), compressed files are read from their decompressed content
+        :param start_offset: byte offset where to start reading, it must be the start of a line
+        :return: a text file object
+        """
+        if self.compressed_log:
+            reader = BufferReader(self.compressed_log.get_buffer(), start_offset, self.compressed_log.size)
+            return io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8')
+
+        text_file = open(self.filename, 'r', encoding='utf-8')
+        if start_offset:
+            # A byte offset is a valid position for a text file, when it is at the start of a line
+            text_file.seek(start_offset)
+
+        return text_file
+
+    def get_data_size(self):
+        """
+        :return: size of file content (decompressed size for compressed files)
+        """
+        if self.compressed_log:
+            self.compressed_log.get_buffer()
+            return self.compressed_log.size
+
+        if not os.path.exists(self.filename):
+            return 0
+
+        return os.path.getsize(self.filename)
+
+    def read_block(self, start, size):
+        """
+        Read a block of data
+        :param start: byte offset
+        :param size: number of bytes
+        :return: bytes read
+        """
+        with self.open_buffer() as mmapped_file:
+            return mmapped_file[start:start + size]
+
+    def iter_lines(self, start, size, with_offsets=False):
+        """
+        Iterate over lines of a block of data without copying it; new lines are searched directly over the mapped
+        file and each line is decoded (utf-8, invalid bytes are ignored) only when it is reached, so memory used
+        doesn't depend on block size.
+        :param start: byte offset, it must be the start of a line
+        :param size: number of bytes
+        :param with_offsets: give byte offset of each line too
+        :return: a generator of lines (str) without their line terminator (\n or \r\n); tuples (offset, line) when
+        with_offsets is set
+        """
+        end = start + size
+        with self.open_buffer() as mmapped_file:
+            view = memoryview(mmapped_file)
+            try:
+                position = start
+                while position < end:
+                    newline = mmapped_file.find(b'\n', position, end)
+                    line_end = end if newline == -1 else newline
+                    if line_end > position and view[line_end - 1] == 13:
+                        # \r\n
+                        line = str(view[position:line_end - 1], 'utf-8', 'ignore')
+                    else:
+                        line = str(view[position:line_end], 'utf-8', 'ignore')
+                    yield (position, line) if with_offsets else line
+                    position = line_end + 1
+            finally:
+                view.release()
+
+    @staticmethod
+    def decode_line(view, start, end):
+        """
+        :param view: memoryview of file content
+        :param start: byte offset of line start
+        :param end: byte offset of line end (its new line character, or end of data)
+        :return: line (str) without its line terminator (\n or \r\n)
+        """
+        if end > start and view[end - 1] == 13:
+            # \r\n
+            end -= 1
+
+        return str(view[start:end], 'utf-8', 'ignore')
+
+    def read_lines_at(self, offsets):
+        """
+        Read lines starting at given byte offsets (see iter_lines)
+        :param offsets: list of byte offsets, each one must be the start of a line
+        :return: list of lines
+        """
+        lines = []
+        with self.open_buffer() as mmapped_file:
+            view = memoryview(mmapped_file)
+            try:
+                for offset in offsets:
+                    newline = mmapped_file.find(b'\n', offset)
+                    lines.append(LogFile.decode_line(view, offset, len(mmapped_file) if newline == -1 else newline))
+            finally:
+                view.release()
+
+        return lines
+
+
+class LogSet:
+    """
+    A set of log files (like rotated logs of a node) analysed as a single log; files are placed one after the other,
+    so each line has a global line number (and byte offset) that can be translated back to its (file, line) address.
+    """
+
+    # Files that never are part of a log set (index sidecars)
+    IGNORE_EXTENSIONS = ('.lidx',)
+
+    class Member:
+        """
+        A file of a log set, and where it is placed on the set
+        """
+
+        def __init__(self, filename):
+            self.log_file = LogFile(filename)
+            self.filename = filename
+            self.first_timestamp = None
+            # Position of this file on the set: first global byte offset, and first global line number
+            self.base_offset = 0
+            self.start_line = 1
+            self.size = 0
+            self.line_count = 0
+
+        def to_dict(self):
+            return {
+                'file': self.filename,
+                'first_timestamp': str(self.first_timestamp) if self.first_timestamp else None,
+                'first_line': self.start_line,
+                'last_line': self.start_line + self.line_count - 1,
+                'size': self.size
+            }
+
+    def __init__(self, path):
+        """
+        :param path: a directory (all files within it) or a glob pattern
+        """
+        self.path = path
+        self.members = [LogSet.Member(each_file) for each_file in LogSet.find_files(path)]
+
+    @staticmethod
+    def is_log_set(path):
+        """
+        Check if given path represents a set of files
+        :param path: path given to analyse
+        :return: True if path is a directory or a glob pattern
+        """
+        if os.path.isdir(path):
+            return True
+
+        return not os.path.exists(path) and any(char in path for char in '*?[')
+
+    @staticmethod
+    def find_files(path):
+        """
+        Return all files from given directory or glob pattern
+        :param path: directory or glob pattern
+        :return: sorted list of files
+        """
+        if os.path.isdir(path):
+            candidates = [os.path.join(path, each_file) for each_file in os.listdir(path)
+                          if not each_file.startswith('.')]
+        else:
+            candidates = glob.glob(path)
+
+        return sorted(each_file for each_file in candidates
+                      if os.path.isfile(each_file) and not each_file.endswith(LogSet.IGNORE_EXTENSIONS))
+
+    def order_key(self, member, get_first_timestamp):
+        """
+        Read what is needed to place given file on the set: its size (compressed files are decompressed) and its
+        first timestamp
+        :param member: LogSet.Member
+        :param get_first_timestamp: function that receives a LogFile and returns first timestamp (datetime) found
+        :return: None
+        """
+        member.size = member.log_file.get_data_size()
+        member.first_timestamp = get_first_timestamp(member.log_file)
+
+    def order(self):
+        """
+        Order files by their first timestamp (see order_key); files without timestamp will be placed at the end
+        (by name)
+        :return: None
+        """
+        def sort_key(member):
+            if member.first_timestamp is None:
+                return 1, 0, member.filename
+            return 0, member.first_timestamp, member.filename
+
+        self.members.sort(key=sort_key)
+
+    def get_data_size(self):
+        """
+        :return: size of all files (decompressed size for compressed files)
+        """
+        return sum(member.size for member in self.members)
+
+    def place(self, member_chunks):
+        """
+        Place each file on the set, after its file planning (see FileManagement.plan_chunks)
+        :param member_chunks: list with chunks (start, size, start_line, end_line) of each member, line numbers and
+        offsets local to each file
+        :return: all chunks with global offsets and line numbers
+        """
+        chunk_info = []
+        base_offset = 0
+        line_counter = 1
+
+        for member, chunks in zip(self.members, member_chunks):
+            member.base_offset = base_offset
+            member.start_line = line_counter
+            member.line_count = chunks[-1][3] if chunks else 0
+
+            for start, size, start_line, end_line in chunks:
+                chunk_info.append((base_offset + start, size, start_line + line_counter - 1,
+                                   end_line + line_counter - 1))
+
+            base_offset += member.size
+            line_counter += member.line_count
+
+        return chunk_info
+
+    def get_member(self, offset=None, line_no=None):
+        """
+        Return member that holds given global offset or line number
+        :param offset: global byte offset
+        :param line_no: global line number
+        :return: LogSet.Member
+        """
+        if offset is not None:
+            position = bisect.bisect_right([member.base_offset for member in self.members], offset) - 1
+        else:
+            position = bisect.bisect_right([member.start_line for member in self.members], line_no) - 1
+
+        return self.members[max(position, 0)]
+
+    def get_address(self, line_no):
+        """
+        Translate global line number into its (file, line) address
+        :param line_no: global line number
+        :return: tuple (file, line number within that file)
+        """
+        member = self.get_member(line_no=line_no)
+
+        return member.filename, line_no - member.start_line + 1
+
+    def read_block(self, start, size):
+        """
+        Read a block of data using global offsets; a block never spans more than one file
+        :param start: global byte offset
+        :param size: number of bytes
+        :return: bytes read
+        """
+        member = self.get_member(offset=start)
+
+        return member.log_file.read_block(start - member.base_offset, size)
+
+    def iter_lines(self, start, size, with_offsets=False):
+        """
+        Iterate over lines of a block using global offsets (see LogFile.iter_lines)
+        :param start: global byte offset
+        :param size: number of bytes
+        :param with_offsets: give global byte offset of each line too
+        :return: a generator of lines
+        """
+        member = self.get_member(offset=start)
+        lines = member.log_file.iter_lines(start - member.base_offset, size, with_offsets)
+        if not with_offsets:
+            return lines
+
+        return ((member.base_offset + offset, line) for offset, line in lines)
+
+    def read_lines_at(self, offsets):
+        """
+        Read lines starting at given global byte offsets (see LogFile.read_lines_at)
+        :param offsets: list of global byte offsets
+        :return: list of lines
+        """
+        lines = [None] * len(offsets)
+        by_member = {}
+        for index, offset in enumerate(offsets):
+            member = self.get_member(offset=offset)
+            by_member.setdefault(id(member), (member, []))[1].append(index)
+
+        for member, indexes in by_member.values():
+            read = member.log_file.read_lines_at([offsets[index] - member.base_offset for index in indexes])
+            for index, line in zip(indexes, read):
+                lines[index] = line
+
+        return lines
+
+    def open_text(self):
+        """
+        Open all files as a single text file
+        :return: iterator of lines, to be used within a 'with' statement
+        """
+        def chained_lines():
+            for member in self.members:
+                with member.log_file.open_text() as text_file:
+                    for line in text_file:
+                        yield line
+
+        return closing(chained_lines())
+
+    def get_all(self):
+        """
+        :return: list of all files, and where they are placed on the set
+        """
+        return [member.to_dict() for member in self.members]
@@ -19,7 +19,9 @@ import TermTk as ttk
 from error_log_analysis import ErrorAnalysis
 from get_refIds import GetRefIds
 from object_class import Configs, FileManagement, BlockExtractor, KnownErrors, LogAnalysis
-from object_class import CordaObject
+from object_class import CordaObject, RegexLib
+from regex_budget import RegexBudget
+from regex_profiler import RegexProfiler
 from get_parties import GetParties
 from support_icons import Icons
 from ui_commands import schedule_ui_update, process_ui_commands, schedule_callback, process_callbacks
@@ -2191,7 +2193,7 @@ def main():
     # start a time watch
     file_to_analyse.start_stop_watch('Main-search', True)
     # Start all threads required
-    file_to_analyse.parallel_processing()
+    file_to_analyse.parallel_processing(engine=args.engine)
     # Prepare new execution
     # Clean up old processes:
     file_to_analyse.remove_process_to_execute(CordaObject.Type.PARTY)
@@ -2201,6 +2203,11 @@ def main():
     time_msg = file_to_analyse.start_stop_watch('Main-search', False)
     threading.Timer(0.5, InteractiveWindow.update_tui_from_queue).start()
 
+    if args.regex_report:
+        print('\n'.join(RegexLib.regex_report() + RegexBudget.format_report()))
+    if args.regex_profile:
+        print('\n'.join(RegexProfiler(Configs.config).format_report()))
+
     if not file_to_analyse:
         write_log(f"Sorry unable to analyse given file",level="Error")
         return
@@ -2307,7 +2314,8 @@ if __name__ == "__main__":
 
     parserargs = argparse.ArgumentParser()
     parserargs.add_argument('-l', '--log-file',
-                            help='Give actual log file to analyse')
+                            help='Give actual log file to analyse; a directory or a glob pattern (quoted) will '
+                                 'analyse all its files (rotated logs) as a single log')
     parserargs.add_argument('-r', '--reference',
                             help='Reference ID to trace flow-id or tx-id')
     parserargs.add_argument('-t', '--list-transactions',
@@ -2316,10 +2324,25 @@ if __name__ == "__main__":
                             help='list all flows found', action="store_true")
     parserargs.add_argument('-p', '--list-parties',
                             help='list all parties found', action="store_true")
+    parserargs.add_argument('-e', '--engine', choices=[engine.value for engine in FileManagement.Engine],
+                            default=FileManagement.Engine.THREAD.value,
+                            help='engine used to process file blocks in parallel (thread or process)')
+    parserargs.add_argument('-x', '--regex-report',
+                            help='show most expensive regex after analysis', action="store_true")
+    parserargs.add_argument('-P', '--regex-profile',
+                            help='profile regex by configuration rule, show match time histograms, timeouts and line '
+                                 'lengths after analysis', action="store_true")
 
     args = parserargs.parse_args()
-
-    if args.log_file and args.list_transactions or args.list_flows or args.list_parties:
+    if args.regex_profile or args.regex_report:
+        # Patterns compiled so far are not instrumented (see FILE_SETUP.REGEX_CACHE.INSTRUMENT), configuration is
+        # loaded again to compile them instrumented
+        RegexLib.cache.setup(instrument=True, profile=True if args.regex_profile else None)
+        RegexLib.cache.clear()
+        Configs.load_config()
+
+    if args.log_file and args.list_transactions or args.list_flows or args.list_parties or args.regex_report or \
+            args.regex_profile:
         main()
         shutdown_event.set()
 
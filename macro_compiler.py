@@ -0,0 +1,161 @@
+# macro_compiler.py
+import re
+
+from log_handler import write_log
+
+
+class MacroCompiler:
+    """
+    Compiler for macro variables used on regex (like __flow_id__): each variable is replaced by the EXPECT list of the
+    CORDA_OBJECT_DEFINITIONS object that applies to it (see APPLY_TO). All macros are resolved once, when configuration
+    is loaded: a dependency graph is built (an object EXPECT list can use other macros), nested macros are expanded
+    and cycles are detected; after that, expanding a regex is a lookup.
+    """
+
+    # Macro variable, like __flow_id__
+    MACRO_VARIABLE = re.compile(r"__([a-zA-Z0-9-_]+)__")
+    # Configuration keys holding regex that could use macro variables
+    PATTERN_KEYS = ('EXPECT', 'error_strings', 'ignore_messages_with', 'IGNORE', 'REFERENCE_ID')
+
+    def __init__(self, objects):
+        """
+        :param objects: CORDA_OBJECT_DEFINITIONS.OBJECTS definitions
+        """
+        self.objects = objects or {}
+        # Object that defines each macro variable; first object (in order of definition) applying to it
+        self.macros = {}
+        # Object for each regex that is part of an object definition (last one defining it)
+        self.definitions = {}
+        for each_object, definition in self.objects.items():
+            apply_to = definition.get('APPLY_TO')
+            if not apply_to:
+                write_log("Warning: %s has no 'APPLY_TO' parameter,"
+                          " so I'm not able to identify the match for this label..." % (each_object,))
+            elif isinstance(apply_to, str):
+                apply_to = [apply_to]
+            for each_variable in apply_to or []:
+                self.macros.setdefault(each_variable, each_object)
+            for each_regex in definition.get('EXPECT', []):
+                self.definitions[each_regex] = each_object
+
+        # Dependency graph: {macro variable: [macro variables used by its definition, ...]}
+        self.graph = {}
+        for each_variable, each_object in self.macros.items():
+            used = []
+            for each_regex in self.objects[each_object].get('EXPECT', []):
+                for each_used in MacroCompiler.MACRO_VARIABLE.findall(each_regex):
+                    if each_used in self.macros and each_used not in used:
+                        used.append(each_used)
+            self.graph[each_variable] = used
+
+        # Resolved body of each macro variable (nested macros already expanded), and cycles found
+        self.bodies = {}
+        self.cycles = []
+        for each_variable in self.macros:
+            self.resolve(each_variable)
+
+        # Expanded regex: {(regex, nogroup_name): expanded regex}
+        self.expanded = {}
+
+    def resolve(self, variable, path=()):
+        """
+        Return body of a macro variable: EXPECT list of its object joined, with its own macros expanded (as plain
+        groups, so group names never appear twice); macros taking part on a cycle are left as they are
+        :param variable: macro variable
+        :param path: variables being resolved (to detect cycles)
+        :return: regex
+        """
+        if variable in self.bodies:
+            return self.bodies[variable]
+
+        path = path + (variable,)
+        replacements = {}
+        for each_used in self.graph[variable]:
+            if each_used in path:
+                # Same cycle is found from each one of its variables, it is kept starting at its lowest one
+                members = path[path.index(each_used):]
+                lowest = members.index(min(members))
+                cycle = members[lowest:] + members[:lowest] + (members[lowest],)
+                if cycle not in self.cycles:
+                    self.cycles.append(cycle)
+                    write_log(f"Macro variables cycle detected: {' -> '.join(cycle)}, it will not be expanded",
+                              level="WARN")
+                continue
+            replacements[each_used] = f'({self.resolve(each_used, path)})'
+
+        body = '|'.join(self.objects[self.macros[variable]].get('EXPECT', []))
+        body = self.replace(body, replacements)
+        if not any(variable in each_cycle for each_cycle in self.cycles):
+            # Bodies depending on a cycle still being resolved are not kept, they'd be incomplete for other paths
+            self.bodies[variable] = body
+
+        return body
+
+    @staticmethod
+    def replace(regex, replacements):
+        """
+        Replace macro variables from given regex
+        :param regex: regex
+        :param replacements: {macro variable: text}
+        :return: regex with its macro variables replaced, variables without replacement are kept
+        """
+        if not replacements:
+            return regex
+
+        return MacroCompiler.MACRO_VARIABLE.sub(
+            lambda match: replacements.get(match.group(1), match.group()), regex)
+
+    def expand(self, regex, nogroup_name=False):
+        """
+        Expand macro variables of given regex; a regex without macros that is part of an object definition is
+        enclosed on a group named after its object
+        :param regex: regex to expand
+        :param nogroup_name: groups are not named
+        :return: expanded regex
+        """
+        key = (regex, nogroup_name)
+        expanded = self.expanded.get(key)
+        if expanded is not None:
+            return expanded
+
+        variables = MacroCompiler.MACRO_VARIABLE.findall(regex)
+        if variables:
+            replacements = {}
+            for each_variable in variables:
+                if each_variable in self.macros:
+                    body = self.resolve(each_variable)
+                    replacements[each_variable] = f'({body})' if nogroup_name else f'(?P<{each_variable}>{body})'
+            expanded = MacroCompiler.replace(regex, replacements)
+        elif regex in self.definitions:
+            expanded = f'({regex})' if nogroup_name else f'(?P<{self.definitions[regex]}>{regex})'
+        else:
+            expanded = regex
+
+        self.expanded[key] = expanded
+
+        return expanded
+
+    def compile_all(self, config):
+        """
+        Expand ahead of time all regex found on configuration, on both forms (named and plain groups)
+        :param config: configuration (dictionary)
+        :return: number of regex expanded
+        """
+        patterns = set()
+
+        def walk(section):
+            for key, value in section.items():
+                if isinstance(value, dict):
+                    walk(value)
+                elif key in MacroCompiler.PATTERN_KEYS:
+                    if isinstance(value, str):
+                        patterns.add(value)
+                    elif isinstance(value, list):
+                        patterns.update(item for item in value if isinstance(item, str))
+
+        walk(config)
+        for each_regex in patterns:
+            for nogroup_name in (False, True):
+                self.expand(each_regex, nogroup_name)
+
+        return len(patterns)
@@ -1,7 +1,11 @@
+import builtins
 import concurrent.futures
 import hashlib
+import io
+import itertools
 import json
 import mmap
+import multiprocessing
 import os,time
 import regex as re
 import threading
@@ -10,21 +14,39 @@ from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 import numpy as np
 from typing import List, Tuple, Dict, Optional
+from compact_model import CompactModel, get_fields
+from format_detector import FormatDetector
+from header_parser import HeaderParser
+from line_index import LineIndex
+from literal_prefilter import LiteralPrefilter
 from log_handler import write_log
+from macro_compiler import MacroCompiler
+from log_set import LogFile, LogSet
+from party_registry import PartyRegistry
+from reference_hits import ReferenceHits
+from reference_registry import ReferenceRegistry
+from regex_budget import RegexBudget
+from regex_cache import RegexCache
 from shutdown_event import shutdown_event
 from support_icons import Icons
 from ui_commands import schedule_ui_update
+from x500_memo import X500Memo
 import signal
 from contextlib import contextmanager
+from datetime import datetime, timezone
 
-class CordaObject:
+class CordaObject(CompactModel):
     """
     This class object will hold all transaction results and many other useful objects
     """
-    # This represents all ID's registered so far
-    id_ref = []
-    # This keep a list of all instances of this class
-    list = {}
+    __slots__ = ('data', 'reference_id', 'references', 'type', 'line_number', 'timestamp', 'error_level',
+                 '_uml_steps', '_uml_steps_lock')
+    FIELDS = ('data', 'reference_id', 'references', 'type', 'line_number', 'timestamp', 'error_level', 'uml_steps')
+
+    # This represents all ID's registered so far, with their type and object (see ReferenceRegistry)
+    registry = ReferenceRegistry()
+    # This keep a list of all instances of this class, by type (same dictionary kept by registry)
+    list = registry.by_type
     relations = {}
     # Default UML references
     # This represents entities endpoints (for source and destination)
@@ -47,20 +69,45 @@ class CordaObject:
     corda_object_regex = []
     corda_object_types = []
 
-    # Clear group names cache
-    #
-    clear_group_list = {}
+    # Kind of cached items for regex lists with their group names removed (see RegexLib.cache)
+    CLEAR_GROUP_LIST = 'clear_group_list'
+    # Guards creation of uml steps lock of each object, locks are only created when uml steps are added
+    uml_steps_lock_creation = threading.Lock()
 
     def __init__(self):
         self.data = {}
         self.reference_id = None
-        self.references = OrderedDict()
+        # Lines where this reference was found {line number: line}, lines are read back from the log on demand
+        self.references = ReferenceHits()
         self.type = None
         self.line_number = None
         self.timestamp = None
         self.error_level = None
-        self.uml_steps = OrderedDict()
-        self._uml_steps_lock = threading.RLock()  # ✅ Lock para acceso seguro
+        # UML steps {line number: list of UMLStep} and lock to add them, both created on first use
+        self._uml_steps = None
+        self._uml_steps_lock = None
+
+    @property
+    def uml_steps(self):
+        if self._uml_steps is None:
+            self._uml_steps = OrderedDict()
+
+        return self._uml_steps
+
+    @uml_steps.setter
+    def uml_steps(self, uml_steps):
+        self._uml_steps = uml_steps
+
+    def get_uml_steps_lock(self):
+        """
+        :return: lock protecting uml steps of this object, created on first use
+        """
+        if self._uml_steps_lock is None:
+            with CordaObject.uml_steps_lock_creation:
+                if self._uml_steps_lock is None:
+                    self._uml_steps_lock = threading.RLock()
+
+        return self._uml_steps_lock
 
     def to_dict(self):
         """Convierte el objeto a diccionario serializable"""
@@ -71,7 +118,7 @@ class CordaObject:
             'timestamp': self.timestamp,
             'error_level': self.error_level,
             'data': self.data,
-            'references': dict(self.references),
+            'references': dict(self.references.items()),
             'uml_steps': self._serialize_uml_steps(),
         }
 
@@ -91,7 +138,7 @@ class CordaObject:
         """Serializa OrderedDict de UMLSteps"""
         serialized = {}
         for line_num, steps in self.uml_steps.items():
-            serialized[str(line_num)] = [step.__dict__ for step in steps]
+            serialized[str(line_num)] = [step.get_fields() for step in steps]
         return serialized
 
     def _deserialize_uml_steps(self, serialized):
@@ -117,9 +164,9 @@ class CordaObject:
         """
 
         # This represents all ID's registered so far
-        cls.id_ref = []
+        cls.registry.clear()
         # This keep a list of all instances of this class
-        cls.list = {}
+        cls.list = cls.registry.by_type
         cls.relations = {}
         # Default UML references
         # This represents entities endpoints (for source and destination)
@@ -144,7 +191,7 @@ class CordaObject:
 
         # Clear group names cache
         #
-        cls.clear_group_list = {}
+        RegexLib.cache.clear(CordaObject.CLEAR_GROUP_LIST)
 
     @staticmethod
     def get_clear_group_list(raw_list):
@@ -156,13 +203,29 @@ class CordaObject:
         :return:
         """
 
-        signature = generate_hash("$$".join(raw_list))
-
-        if signature in CordaObject.clear_group_list:
-            return CordaObject.clear_group_list[signature]
+        no_group_list = RegexLib.cache.lookup(CordaObject.CLEAR_GROUP_LIST, tuple(raw_list))
+        if no_group_list is not None:
+            return no_group_list
 
         return CordaObject.add_clear_group_list(raw_list)
 
+    @staticmethod
+    def remove_group_names(expand_macro):
+        """
+        Remove group names from given regex, groups are kept as plain groups
+        :param expand_macro: regex (with its macro variables already expanded)
+        :return: regex without group names
+        """
+        # Check how many "group names" are within the given string
+        #
+        clear_groups = expand_macro
+        for each_group in range(expand_macro.count('?P<')):
+            start = clear_groups.find('?P<')
+            end = clear_groups.find('>')+1
+            clear_groups = clear_groups.replace(clear_groups[start:end], "")
+
+        return clear_groups
+
     @staticmethod
     def add_clear_group_list(raw_list):
         """
@@ -171,22 +234,13 @@ class CordaObject:
         :return: initial group given; with no groups names.
         """
 
-        signature = generate_hash("$$".join(raw_list))
         no_group_list = []
         for each_item in raw_list:
             # Expand all macro variables from their pseudo form
             expand_macro = RegexLib.build_regex(each_item, nogroup_name=True)
-            # Check how many "group names" are within the given string
-            #
-            clear_groups = expand_macro
-            for each_group in range(expand_macro.count('?P<')):
-                start = clear_groups.find('?P<')
-                end = clear_groups.find('>')+1
-                clear_groups = clear_groups.replace(clear_groups[start:end], "")
-
-            no_group_list.append(clear_groups)
+            no_group_list.append(CordaObject.remove_group_names(expand_macro))
 
-        CordaObject.clear_group_list[signature] = no_group_list
+        RegexLib.cache.store(CordaObject.CLEAR_GROUP_LIST, tuple(raw_list), no_group_list)
 
         return no_group_list
 
@@ -228,13 +282,13 @@ class CordaObject:
         Clears up actual object class and deletes all info
         :return:
         """
-        CordaObject.list = {}
+        CordaObject.registry.clear()
+        CordaObject.list = CordaObject.registry.by_type
         CordaObject.uml_init = []
         CordaObject.log_owner = None
         CordaObject.uml_participants = {}
         CordaObject.uml_active_participants = []
         CordaObject.additional_table_fields = []
-        CordaObject.id_ref = []
         CordaObject.relations = {}
 
 
@@ -327,8 +381,8 @@ class CordaObject:
         if not line_number:
             return self.uml_steps
 
-        if line_number in self.uml_steps:
-            return self.uml_steps[line_number]
+        if self._uml_steps and line_number in self._uml_steps:
+            return self._uml_steps[line_number]
 
         return None
 
@@ -376,18 +430,24 @@ class CordaObject:
     def add_object(self):
         """
         Add given object into internal class list of objects
-        :return:
+        :return: object registered for its reference id (a previous one if reference was already known)
         """
 
-        if self.type not in CordaObject.list:
-            CordaObject.list[self.type] = OrderedDict()
+        return CordaObject.registry.add(self.data["id_ref"], self.type, self)
 
-        if self.data["id_ref"] not in CordaObject.id_ref:
-            # Add a new reference found into the list
-            CordaObject.id_ref.append(self.data["id_ref"])
+    @staticmethod
+    def get_or_add_object(ref_id, ref_type, create):
+        """
+        Return object registered for a reference id, creating it and adding it into internal class list of objects
+        if reference is not known yet; both steps are done at once, so only one object is kept for each reference
+        even when several threads find it at same time
+        :param ref_id: reference id
+        :param ref_type: type of reference
+        :param create: function returning a new CordaObject for this reference, only called if it is not known
+        :return: tuple (CordaObject registered for this reference, True if it was created by this call)
+        """
 
-        if self.data["id_ref"] not in CordaObject.list[self.type]:
-            CordaObject.list[self.type][self.data["id_ref"]] = self
+        return CordaObject.registry.get_or_add(ref_id, ref_type, create)
 
     def add_relation(self):
         """
@@ -407,7 +467,7 @@ class CordaObject:
         :param umlstep: UMLStep object associated to this line
         :return:
         """
-        with self._uml_steps_lock:  # ✅ Proteger escritura
+        with self.get_uml_steps_lock():  # ✅ Proteger escritura
             self.uml_steps[line] = umlstep
 
     # def load_from_database(self):
@@ -1000,11 +1060,7 @@ class CordaObject:
         :return: A string representing type of reference object, if is not found will return None
         """
 
-        for each_type in CordaObject.list:
-            if id_ref in CordaObject.list[each_type]:
-                return each_type
-
-        return None
+        return CordaObject.registry.get_type(id_ref)
 
     def add_reference(self, line, creference, line_no=None):
         """
@@ -1073,16 +1129,11 @@ class CordaObject:
     def get_object(ref_id):
         """
         Will return a corda object identified by ref_id
-        :param ref_found:
-        :return:
+        :param ref_id: reference id
+        :return: CordaObject, None if reference is not known
         """
 
-        otype = CordaObject.get_type_for(ref_id)
-
-        if not otype:
-            return None
-
-        return CordaObject.list[otype][ref_id]
+        return CordaObject.registry.get_object(ref_id)
 
     @staticmethod
     def add_uml_object(incoming_uml_object, uml_role):
@@ -1192,6 +1243,13 @@ class FileManagement:
     A class to help to read big files...
     """
 
+    class Engine(Enum):
+        """
+        Engine used to process blocks in parallel
+        """
+        THREAD = 'thread'
+        PROCESS = 'process'
+
     unique_results = {}
 
     def __init__(self, filename, block_size_in_mb=1, debug=False,scan_lines=7000,min_percent_merge=15):
@@ -1207,7 +1265,7 @@ class FileManagement:
         small to be left as a single block, this correct issues like launching a single thread to check a single line)
         """
         self.filename = filename
-        self.block_size = block_size_in_mb * 1024 * 1024
+        self.block_size = int(block_size_in_mb * 1024 * 1024)
         self.logfile_format = None
         self.scan_lines = scan_lines
         self.parallel_process = {}
@@ -1223,10 +1281,38 @@ class FileManagement:
         self.special_blocks: BlockExtractor # Collect all blocks that are not collectable by multithread process
         self.log_line_regex = None
         self.log_line_fields = None
+        # Compiled log line header parser, by log format (see get_header_parser)
+        self.header_parsers = {}
+        # Log format runs of each file (a single one, or each file of a log set), see discover_file_format
+        self.format_detectors = {}
+        # Header parsers for whole file (see get_header_parsers)
+        self.file_header_parsers = None
         self.state = None
         self.state_message = None
-
-        if not os.path.exists(self.filename):
+        self.line_index = None
+        self.requested_block_size = self.block_size
+        # Follow mode: how far this file has been analysed
+        self.analysed_offset = 0
+        self.analysed_lines = 0
+        self.analysed_inode = None
+        self.analysed_tail = b''
+
+        # Compressed logs (gzip, bzip2, zstd) are read directly, see open_buffer()
+        self.compressed_log = None
+        # A directory or a glob pattern, all files will be analysed as a single log (see LogSet)
+        self.log_set = None
+
+        if LogSet.is_log_set(self.filename):
+            self.log_set = LogSet(self.filename)
+            if not self.log_set.members:
+                write_log(f"Unable to find any log file at {self.filename}", level="ERROR")
+                self.state_message = f"Unable to find any log file at {self.filename}"
+                self.state = False
+            else:
+                self.state = True
+                # Files must be ordered before reading them (see discover_file_format, BlockExtractor)
+                self.order_log_set()
+        elif not os.path.exists(self.filename):
             write_log("Unable to open given filename, it doesn't exist", level="ERROR")
             # self.state = "File not found"
             self.state_message = "Unable to open given filename, it doesn't exist"
@@ -1234,6 +1320,9 @@ class FileManagement:
         else:
             self.state =True
 
+        self.log_file = LogFile(self.filename)
+        self.compressed_log = self.log_file.compressed_log
+
         if not self.rules:
             self.rules = Configs.get_config_for('CORDA_OBJECT_DEFINITIONS.OBJECTS.participant')
         if not self.parser:
@@ -1373,16 +1462,37 @@ class FileManagement:
                 for each_alternate_name in each_id.get_alternate_names():
                     write_log(f"              `-->  {each_alternate_name}")
 
-    def identify_party_role(self, line, line_no=None):
+    def identify_party_role(self, line, line_no=None, context=None):
         """
         This method will try to identify a specific party like a Notary or log producer (low_owner)
         :return:
         """
 
+        for party, role in self.find_party_roles(line, line_no, context):
+            self.add_party_role(party, role)
+
+    def find_party_roles(self, line, line_no=None, context=None):
+        """
+        Search given line for any party role definition (UML_ENTITY), this will not register anything
+        :param line: log line to check
+        :param line_no: line number
+        :param context: LineContext shared with collectors for this line
+        :return: a list of tuples (x500 name, role) found on this line
+        """
+
+        roles_found = []
+        if context is None:
+            context = LineContext(self, line, line_no)
         get_role_definitions = Configs.get_config_for("UML_ENTITY.OBJECTS")
+        if not context.applies(LiteralPrefilter.Family.UML_ENTITY):
+            return roles_found
+
+        # Roles already matched for whole batch (see prepare_party_roles)
+        batch_hits = context.batch_hits.get(LiteralPrefilter.Family.UML_ENTITY)
+
         for each_role in get_role_definitions:
             expect = Configs.get_config_for(f"UML_ENTITY.OBJECTS.{each_role}.EXPECT")
-            if not expect:
+            if not expect or not context.applies(LiteralPrefilter.Family.UML_ENTITY, each_role):
                 continue
 
             # list of patterns from configuration *may* have macrovariables used to replace parties and
@@ -1393,20 +1503,47 @@ class FileManagement:
             # for each_expect in expect:
             # real_regex = RegexLib.build_regex(each_expect)
 
-            check_pattern = RegexLib.regex_to_use(expect, line, line_no=line_no)
+            if batch_hits is not None:
+                check_pattern = batch_hits.get(each_role)
+            else:
+                check_pattern = RegexLib.regex_to_use(expect, line, line_no=line_no)
 
             if  check_pattern is None:
                 # No role found for this entity
                 continue
-            real_regex = RegexLib.build_regex(expect[check_pattern])
-            validate = re.search(real_regex, line)
+            validate = RuleSet.get(expect).get_compiled(check_pattern).search(line)
 
             # TODO: actual regext to pull x500 still buggy and it doesn't collect x500 names correctly
             #
             if validate:
                 x = X500NameParser(rules=self.rules['RULES'])
                 x500 = x.parse_line(validate.group(1), [])
-                self.add_party_role(x500[0].string(), each_role)
+                roles_found.append((x500[0].string(), each_role))
+
+        return roles_found
+
+    def prepare_party_roles(self, contexts):
+        """
+        Match party role definitions (UML_ENTITY) against a whole batch of lines (see RuleSet.match_lines), each
+        role only against lines the literal prefilter allows; regex found for each role is kept on each line context,
+        to be used by find_party_roles
+        :param contexts: list of LineContext
+        :return: None
+        """
+        for context in contexts:
+            context.batch_hits[LiteralPrefilter.Family.UML_ENTITY] = {}
+
+        for each_role in Configs.get_config_for("UML_ENTITY.OBJECTS") or {}:
+            expect = Configs.get_config_for(f"UML_ENTITY.OBJECTS.{each_role}.EXPECT")
+            selected = [context for context in contexts
+                        if context.applies(LiteralPrefilter.Family.UML_ENTITY, each_role)]
+            if not expect or not selected:
+                continue
+
+            for context, rule_index in zip(selected, RuleSet.get(expect).match_lines(
+                    [context.line for context in selected], [context.line_no for context in selected])):
+                if rule_index is not None:
+                    context.batch_hits[LiteralPrefilter.Family.UML_ENTITY][each_role] = rule_index
 
     def add_party_role(self, party, role):
         """
@@ -1488,68 +1625,61 @@ class FileManagement:
 
         return None
 
-    def pre_analysis(self):
+    def pre_analysis(self, follow=False):
+        """
+        Split file into blocks to be processed in parallel (see plan_chunks)
+        :param follow: follow mode; only data appended since last analysis will be split into blocks, so results
+        can be merged with the ones already collected. Only complete lines are taken, a last line still being
+        written will be analysed on next call.
+        :return: None
+        """
         try:
-            file_size = os.path.getsize(self.filename)
-            fsize = file_size / 1024 / 1024
+            file_size = self.get_data_size()
+            start_pos = 0
+            start_line = 1
+            self.block_size = self.requested_block_size
+
+            if follow and (self.compressed_log or self.log_set):
+                write_log(f'{Icons.WARNING} Follow mode is not available for compressed files or log sets',
+                          level='WARN')
+                follow = False
+
+            if follow and self.analysed_offset:
+                if self.is_same_file(file_size):
+                    start_pos = self.analysed_offset
+                    start_line = self.analysed_lines + 1
+                else:
+                    write_log(f'{Icons.WARNING} {self.filename} was truncated or rotated, analysing it from the beginning',
+                              level='WARN')
+                    self.reset_analysed_state()
+
+            data_size = file_size - start_pos
+            fsize = data_size / 1024 / 1024
             bsize = self.block_size / 1024 / 1024
             write_log(f'Block size for reading: {bsize:.2f} Mbytes')
             write_log(f'Pre-analysing file size {fsize:.2f} Mbytes calculating block sizes')
 
-            if self.block_size > file_size:
+            if self.block_size > data_size:
                 write_log(f'Adjusting blocksize to {fsize:.2f}Mb because blocksize given({bsize:.2f}Mb) is too big')
-                self.block_size = file_size
+                self.block_size = data_size
 
-            line_counter = 1
             self.chunk_info = []
-            with open(self.filename, 'r') as file:
-                while file.tell() < file_size:
-                    start_pos = file.tell()
-                    start_line = line_counter
-
-                    remaining = file_size - start_pos
-
-                    # Si estamos cerca del final y el resto es menor al porcentaje mínimo, fusionamos
-                    if remaining < (self.block_size * self.min_percent_merge / 100):
-                        chunk = file.read(remaining)
-                        last_newline = chunk.rfind('\n')
-                        if last_newline != -1:
-                            end_pos = start_pos + last_newline + 1
-                            lines_in_chunk = chunk[:last_newline + 1].count('\n')
-                        else:
-                            end_pos = file_size
-                            lines_in_chunk = chunk.count('\n') + (1 if chunk else 0)
-
-                        if self.chunk_info:
-                            prev_start, prev_size, prev_start_line, prev_end_line = self.chunk_info[-1]
-                            self.chunk_info[-1] = (
-                                prev_start,
-                                end_pos - prev_start,
-                                prev_start_line,
-                                prev_end_line + lines_in_chunk
-                            )
-                        else:
-                            end_line = start_line + lines_in_chunk - 1
-                            self.chunk_info.append((start_pos, end_pos - start_pos, start_line, end_line))
-                        break  # Salimos del bucle, ya procesamos todo
-
-                    else:
-                        # Leer bloque normal
-                        chunk = file.read(self.block_size)
-                        last_newline = chunk.rfind('\n')
-                        if last_newline != -1:
-                            end_pos = start_pos + last_newline + 1
-                        else:
-                            end_pos = start_pos + len(chunk)
-
-                        lines_in_chunk = chunk[:last_newline + 1].count('\n') if last_newline != -1 else 0
-                        end_line = start_line + lines_in_chunk - 1
-
-                        self.chunk_info.append((start_pos, end_pos - start_pos, start_line, end_line))
-                        line_counter += lines_in_chunk
-                        file.seek(end_pos)
-
-                        write_log(f"Processed block: start_pos={start_pos}, lines={start_line}-{end_line}")
+            if self.log_set:
+                self.chunk_info = self.plan_log_set()
+            elif data_size:
+                with self.open_buffer() as mmapped_file:
+                    end_pos = file_size
+                    if follow:
+                        # Only complete lines
+                        end_pos = mmapped_file.rfind(b'\n', start_pos, file_size) + 1 or start_pos
+
+                    self.line_index = self.get_line_index(mmapped_file, append=follow)
+                    if end_pos > start_pos:
+                        self.chunk_info = self.plan_chunks(mmapped_file, end_pos, start_pos, start_line)
+                        self.save_analysed_state(mmapped_file)
+
+            for start_pos, size, start_line, end_line in self.chunk_info:
+                write_log(f"Processed block: start_pos={start_pos}, lines={start_line}-{end_line}")
             write_log(f'Will launch {len(self.chunk_info)} threads to read full file...')
             self.state = True
 
@@ -1561,6 +1691,348 @@ class FileManagement:
             write_log(f'Unable to read file due to {ue}', level='ERROR')
 
 
+    def order_log_set(self):
+        """
+        Order all files of a log set by their first timestamp; files are read in parallel (see LogSet.order_key)
+        :return: None
+        """
+        with ThreadPoolExecutor(max_workers=min(len(self.log_set.members), os.cpu_count() or 1) or 1) as pool:
+            list(pool.map(lambda member: self.log_set.order_key(member, self.get_first_timestamp),
+                          self.log_set.members))
+        self.log_set.order()
+
+    def plan_log_set(self):
+        """
+        Split all files of a log set into blocks; files are planned in parallel, then placed one after the other
+        (following order given by order_log_set) so blocks get global offsets and line numbers (see LogSet). A
+        block never spans two files.
+        :return: a list of tuples (start, size, start_line, end_line) one per block
+        """
+        def plan_member(member):
+            if not member.size:
+                return []
+            with member.log_file.open_buffer() as mmapped_file:
+                return self.plan_chunks(mmapped_file, member.size)
+
+        with ThreadPoolExecutor(max_workers=min(len(self.log_set.members), os.cpu_count() or 1) or 1) as pool:
+            member_chunks = list(pool.map(plan_member, self.log_set.members))
+
+        chunk_info = self.log_set.place(member_chunks)
+        for member in self.log_set.members:
+            write_log(f'{Icons.INFO} {member.filename}: first timestamp {member.first_timestamp}, '
+                      f'lines {member.start_line}-{member.start_line + member.line_count - 1}')
+
+        return chunk_info
+
+    def get_first_timestamp(self, log_file):
+        """
+        Search first timestamp on given file, using log formats defined at VERSION.IDENTITY_FORMAT; only first
+        self.scan_lines lines are checked
+        :param log_file: LogFile to check
+        :return: first timestamp found (datetime), None if there's no timestamp
+        """
+        formats = Configs.get_config_for('VERSION.IDENTITY_FORMAT') or {}
+        try:
+            with log_file.open_text() as text_file:
+                for line_count, line in enumerate(text_file):
+                    if line_count >= self.scan_lines:
+                        break
+                    for each_format in formats.values():
+                        fields = each_format.get('FIELDS', [])
+                        if 'timestamp' not in fields:
+                            continue
+                        match = re.search(each_format['EXPECT'], line)
+                        if not match:
+                            continue
+                        timestamp = FileManagement.parse_timestamp(match.group(fields.index('timestamp') + 1))
+                        if timestamp:
+                            return timestamp
+        except (IOError, UnicodeDecodeError) as error:
+            write_log(f'Unable to read {log_file.filename} due to {error}', level='WARN')
+
+        return None
+
+    @staticmethod
+    def parse_timestamp(timestamp):
+        """
+        Convert a timestamp from the log into a datetime, using ISO format or formats defined at
+        FILE_SETUP.FORMATS.TIMESTAMP
+        :param timestamp: timestamp string
+        :return: naive datetime (UTC if timestamp has a timezone), None if timestamp can't be parsed
+        """
+        timestamp = timestamp.strip()
+        candidates = [datetime.fromisoformat]
+        for each_format in Configs.get_config_for('FILE_SETUP.FORMATS.TIMESTAMP') or []:
+            candidates.append(lambda value, date_format=each_format: datetime.strptime(value, date_format))
+
+        for parse in candidates:
+            try:
+                parsed = parse(timestamp)
+            except (ValueError, TypeError):
+                continue
+            if parsed.tzinfo:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed
+
+        return None
+
+    @contextmanager
+    def open_buffer(self):
+        """
+        Give access to file content as a buffer (mmap); compressed files are decompressed into memory the first time
+        :return: file content mapped in memory
+        """
+        with self.log_file.open_buffer() as mmapped_file:
+            yield mmapped_file
+
+    def open_text(self, start_offset=0):
+        """
+        Open file as text (utf-8), compressed files are read from their decompressed content. For a log set all
+        files are read one after the other.
+        :param start_offset: byte offset where to start reading, it must be the start of a line
+        :return: a text file object
+        """
+        if self.log_set:
+            if start_offset:
+                raise IOError('A log set can only be read from its beginning')
+            return self.log_set.open_text()
+
+        return self.log_file.open_text(start_offset)
+
+    def get_data_size(self):
+        """
+        :return: size of file content (decompressed size for compressed files)
+        """
+        if self.log_set:
+            return self.log_set.get_data_size()
+
+        return self.log_file.get_data_size()
+
+    def read_block(self, start, size):
+        """
+        Read a block of data
+        :param start: byte offset (global offset for a log set)
+        :param size: number of bytes
+        :return: bytes read
+        """
+        if self.log_set:
+            return self.log_set.read_block(start, size)
+
+        return self.log_file.read_block(start, size)
+
+    def iter_lines(self, start, size, with_offsets=False):
+        """
+        Iterate over lines of a block, decoding one line at a time (see LogFile.iter_lines)
+        :param start: byte offset (global offset for a log set)
+        :param size: number of bytes
+        :param with_offsets: give byte offset of each line too, as tuples (offset, line)
+        :return: a generator of lines
+        """
+        if self.log_set:
+            return self.log_set.iter_lines(start, size, with_offsets)
+
+        return self.log_file.iter_lines(start, size, with_offsets)
+
+    def read_lines_at(self, offsets):
+        """
+        Read lines starting at given byte offsets, used to get back lines kept only by their offset (see
+        ReferenceHits)
+        :param offsets: list of byte offsets (global offsets for a log set)
+        :return: list of lines
+        """
+        if self.log_set:
+            return self.log_set.read_lines_at(offsets)
+
+        return self.log_file.read_lines_at(offsets)
+
+    def get_line_address(self, line_no):
+        """
+        Translate a line number into its (file, line) address; for a log set, line numbers are global across all
+        its files
+        :param line_no: line number
+        :return: tuple (file, line number within that file)
+        """
+        if self.log_set:
+            return self.log_set.get_address(line_no)
+
+        return self.filename, line_no
+
+    def is_same_file(self, file_size):
+        """
+        Check if file being followed is still the one analysed so far; it should not be smaller, it should be the
+        same file (inode) and data right before last offset analysed should not have changed
+        :param file_size: actual file size
+        :return: True if file has only grown since last analysis
+        """
+        if file_size < self.analysed_offset:
+            return False
+
+        stat = os.stat(self.filename)
+        if (stat.st_dev, stat.st_ino) != self.analysed_inode:
+            return False
+
+        with open(self.filename, 'rb') as file:
+            file.seek(self.analysed_offset - len(self.analysed_tail))
+            return file.read(len(self.analysed_tail)) == self.analysed_tail
+
+    def save_analysed_state(self, mmapped_file):
+        """
+        Keep track of how far this file has been analysed (using self.chunk_info), used by follow mode
+        :param mmapped_file: file mapped in memory
+        :return: None
+        """
+        start, size, start_line, end_line = self.chunk_info[-1]
+        stat = os.stat(self.filename)
+        self.analysed_offset = start + size
+        self.analysed_lines = end_line
+        self.analysed_inode = (stat.st_dev, stat.st_ino)
+        self.analysed_tail = mmapped_file[max(0, self.analysed_offset - 64):self.analysed_offset]
+
+    def reset_analysed_state(self):
+        """
+        Forget about any previous analysis, next analysis will start from the beginning of the file
+        :return: None
+        """
+        self.analysed_offset = 0
+        self.analysed_lines = 0
+        self.analysed_inode = None
+        self.analysed_tail = b''
+
+    def get_follow_state(self):
+        """
+        :return: a dictionary with last offset and line analysed on this file
+        """
+        return {
+            'offset': self.analysed_offset,
+            'line': self.analysed_lines
+        }
+
+    def plan_chunks(self, mmapped_file, file_size, start_pos=0, start_line=1):
+        """
+        Split file into blocks of self.block_size bytes; each block boundary is moved back to the last new line
+        found within the block, so lines are never split. Only a few bytes around each boundary are read here, line
+        numbers are calculated afterward counting new lines of each block in parallel (see `count_newlines`).
+        If last block is smaller than self.min_percent_merge percent of block size, it will be merged with previous
+        one.
+        :param mmapped_file: file mapped in memory (mmap, or any object with rfind/len and buffer protocol)
+        :param file_size: size of file in bytes (or offset where to stop)
+        :param start_pos: offset where to start
+        :param start_line: line number of the line starting at start_pos
+        :return: a list of tuples (start, size, start_line, end_line) one per block
+        """
+        boundaries = []
+
+        while start_pos < file_size:
+            remaining = file_size - start_pos
+
+            # Si estamos cerca del final y el resto es menor al porcentaje mínimo, fusionamos
+            if remaining < (self.block_size * self.min_percent_merge / 100):
+                if boundaries:
+                    boundaries[-1] = (boundaries[-1][0], file_size)
+                else:
+                    boundaries.append((start_pos, file_size))
+                break
+
+            block_end = min(start_pos + self.block_size, file_size)
+            if block_end == file_size:
+                end_pos = file_size
+            else:
+                last_newline = mmapped_file.rfind(b'\n', start_pos, block_end)
+                if last_newline != -1:
+                    end_pos = last_newline + 1
+                else:
+                    # A single line bigger than a block, it will continue on next block
+                    end_pos = block_end
+
+            boundaries.append((start_pos, end_pos))
+            start_pos = end_pos
+
+        if self.line_index and self.line_index.file_size == file_size:
+            # Line numbers are taken from line index, only lines between each block boundary and its closest
+            # indexed line need to be counted
+            block_start_lines = [self.line_index.line_of(start_pos, mmapped_file) for start_pos, _ in boundaries]
+            newlines = [next_line - start_line for start_line, next_line in
+                        zip(block_start_lines, block_start_lines[1:] + [self.line_index.line_of(file_size, mmapped_file)])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(boundaries), os.cpu_count() or 1) or 1) as pool:
+                newlines = list(pool.map(lambda boundary: FileManagement.count_newlines(mmapped_file,
+                                                                                        boundary[0],
+                                                                                        boundary[1] - boundary[0]),
+                                         boundaries))
+
+        chunk_info = []
+        line_counter = start_line
+        for (start_pos, end_pos), lines_in_chunk in zip(boundaries, newlines):
+            start_line = line_counter
+            end_line = start_line + lines_in_chunk - 1
+            if end_pos == file_size and mmapped_file[end_pos - 1:end_pos] != b'\n':
+                # Last line of the file doesn't have a new line at the end
+                end_line += 1
+
+            chunk_info.append((start_pos, end_pos - start_pos, start_line, end_line))
+            line_counter += lines_in_chunk
+
+        return chunk_info
+
+    @staticmethod
+    def count_newlines(buffer, start=0, size=None):
+        """
+        Count new lines on given buffer range (see LineIndex.count_newlines)
+        :param buffer: any object supporting buffer protocol (mmap, bytes, memoryview)
+        :param start: offset where to start counting
+        :param size: number of bytes to check, by default up to the end of the buffer
+        :return: number of new lines found
+        """
+        return LineIndex.count_newlines(buffer, start, size)
+
+    def get_line_index(self, mmapped_file=None, append=False):
+        """
+        Return line index of this file; index is loaded from its sidecar file, or built if it doesn't exist or if
+        it is outdated. Line index can be disabled at configuration (FILE_SETUP.SCAN_SETUP.LINE_INDEX.ENABLED)
+        :param mmapped_file: file already mapped in memory (optional)
+        :param append: file is being followed, an outdated index will be extended instead of rebuilt
+        :return: LineIndex object, None if it is disabled
+        """
+        if self.line_index and self.line_index.is_valid():
+            return self.line_index
+
+        if self.compressed_log or self.log_set:
+            # Offsets of a compressed file are only valid over its decompressed content; each file of a log set
+            # has its own index (see read_lines)
+            return None
+
+        index_setup = Configs.get_config_for('FILE_SETUP.SCAN_SETUP.LINE_INDEX')
+        if not index_setup or not index_setup.get('ENABLED', False):
+            return None
+
+        self.line_index = LineIndex.get(self.filename, step=index_setup.get('STEP'), buffer=mmapped_file,
+                                        save=index_setup.get('SAVE', True), append=append)
+
+        return self.line_index
+
+    def read_lines(self, line_no, count=1):
+        """
+        Read lines directly from file using line index
+        :param line_no: first line to read (starting at 1)
+        :param count: number of lines to read
+        :return: a list of lines
+        """
+        if self.log_set:
+            # Only lines from the file holding line_no
+            member = self.log_set.get_member(line_no=line_no)
+            index_setup = Configs.get_config_for('FILE_SETUP.SCAN_SETUP.LINE_INDEX')
+            if member.log_file.compressed_log or not index_setup or not index_setup.get('ENABLED', False):
+                return []
+            line_index = LineIndex.get(member.filename, step=index_setup.get('STEP'),
+                                       save=index_setup.get('SAVE', True))
+            return line_index.read_lines(line_no - member.start_line + 1, count)
+
+        line_index = self.get_line_index()
+        if not line_index:
+            return []
+
+        return line_index.read_lines(line_no, count)
+
     def add_process_to_execute(self, method):
         """
         This will add a method to be executed.
@@ -1615,6 +2087,45 @@ class FileManagement:
         else:
             return None
 
+    def iter_line_contexts(self, start, size, start_line, methods=None):
+        """
+        Iterate over lines of a block (see iter_lines) giving a LineContext for each one of them; lines are taken in
+        batches (FILE_SETUP.SCAN_SETUP.CONCURRENT_REGEX.BATCH_LINES) and the literal prefilter checks each batch at
+        once, instead of line by line. Methods able to work on a whole batch (with a `prepare_batch` method) are
+        given each batch before its lines are yielded.
+        :param start: byte offset, it must be the start of a line
+        :param size: number of bytes
+        :param start_line: line number of first line
+        :param methods: methods that will process these lines
+        :return: a generator of LineContext
+        """
+        batch_lines = Configs.get_config_for('FILE_SETUP.SCAN_SETUP.CONCURRENT_REGEX.BATCH_LINES') or 1
+        prefilter = Configs.prefilter
+        # Log formats are resolved once for whole block
+        header_parsers = self.get_header_parsers(start, size)
+        lines = self.iter_lines(start, size, with_offsets=True)
+        current_line = start_line
+
+        with RegexBudget.block_scope():
+            while True:
+                batch_offsets = list(itertools.islice(lines, batch_lines))
+                if not batch_offsets:
+                    break
+
+                offsets, batch = zip(*batch_offsets)
+                batch_candidates = prefilter.candidates_batch(batch) if prefilter else [None] * len(batch)
+                contexts = [LineContext(self, line, line_no, candidates, header_parsers, offset)
+                            for line_no, (line, candidates, offset) in enumerate(zip(batch, batch_candidates,
+                                                                                     offsets),
+                                                                                 start=current_line)]
+                current_line += len(batch)
+
+                for method in methods or []:
+                    if hasattr(method, 'prepare_batch'):
+                        method.prepare_batch(contexts)
+
+                yield from contexts
+
     def process_block(self, args):
         """
         Method in charge to do actual processing of data, searching for required information and
@@ -1634,34 +2145,32 @@ class FileManagement:
             # Verificar si ya se solicitó cierre antes de empezar
             if shutdown_event.is_set():
                 return None
-            with open(self.filename, "r") as file:
-                with mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ) as mmapped_file:
-                    chunk = mmapped_file[start:start+size].decode('utf-8', errors='ignore')
-                    lines = chunk.splitlines()
-
-                    for i, line in enumerate(lines):
-                        for each_method in self.get_methods_type():
-                            # Verificar cada 100 líneas si es hora de terminar
-                            if i % 100 == 0 and shutdown_event.is_set():
-                                write_log(f"Interrupting block processing {start_line}-{end_line} due to close request")
-                                return None
-
-                            result = self.get_method(each_method).execute(line, current_line)
-                            #write_log(f"{each_method} -- {result}")
-                            if each_method == 'Party':
-                                # if method running is related to parties, line below will run an extra
-                                # analysis on that line to see if this line is able to identify a role (like owner of log
-                                # or notary...
-                                self.identify_party_role(line,start_line+i)
-
-                            if result:
-                                if each_method not in local_results:
-                                    local_results[each_method] = []
-                                if isinstance(result, list):
-                                    local_results[each_method].extend(result)
-                                else:
-                                    local_results[each_method].append(result)
-                        current_line += 1
+            methods = [self.get_method(each_method) for each_method in self.get_methods_type()]
+            for i, context in enumerate(self.iter_line_contexts(start, size, start_line, methods)):
+                # Line header and prefilter results are shared by all methods
+                line = context.line
+                for each_method in self.get_methods_type():
+                    # Verificar cada 100 líneas si es hora de terminar
+                    if i % 100 == 0 and shutdown_event.is_set():
+                        write_log(f"Interrupting block processing {start_line}-{end_line} due to close request")
+                        return None
+
+                    result = self.get_method(each_method).execute(line, current_line, context)
+                    #write_log(f"{each_method} -- {result}")
+                    if each_method == 'Party':
+                        # if method running is related to parties, line below will run an extra
+                        # analysis on that line to see if this line is able to identify a role (like owner of log
+                        # or notary...
+                        self.identify_party_role(line,start_line+i, context)
+
+                    if result:
+                        if each_method not in local_results:
+                            local_results[each_method] = []
+                        if isinstance(result, list):
+                            local_results[each_method].extend(result)
+                        else:
+                            local_results[each_method].append(result)
+                current_line += 1
 
             if local_results:
                 with self.lock:
@@ -1678,9 +2187,76 @@ class FileManagement:
                 write_log(f"Error Processing block {start_line}-{end_line}: {str(e)}", level="ERROR")
             return None
 
-    def parallel_processing(self,maxworkers=5):
+    def scan_block(self, args):
+        """
+        Process engine counterpart of `process_block`; it will do all the searching (regex) work over given block,
+        but instead of storing results it will return them as compact records, so they can be sent back from a
+        worker process and merged by the parent with `merge_block`.
+        :param args: block definition (start, size, start_line, end_line) from self.chunk_info
+        :return: a dictionary with:
+            'records': {method type: [record, ...]} records are given by each method `scan`, in line order
+            'roles': [(x500 name, role), ...] roles found on this block (only if 'Party' is being collected)
+        """
+
+        start, size, start_line, end_line = args
+        block_records = {
+            'records': {},
+            'roles': []
+        }
+        methods = [(each_method, self.get_method(each_method)) for each_method in self.get_methods_type()]
+
+        for context in self.iter_line_contexts(start, size, start_line, [method for _, method in methods]):
+            line = context.line
+            current_line = context.line_no
+            for each_method, method in methods:
+                record = method.scan(line, current_line, context)
+                if each_method == 'Party':
+                    block_records['roles'].extend(self.find_party_roles(line, current_line, context))
+
+                if record:
+                    block_records['records'].setdefault(each_method, []).append(record)
+
+        return block_records
+
+    def merge_block(self, block_records):
+        """
+        Merge records produced by `scan_block` into FileManagement.unique_results and CordaObject.list; records are
+        replayed through each method `merge` exactly as `process_block` would do it on the same block.
+        :param block_records: dictionary returned by `scan_block`
+        :return: None
+        """
+
+        local_results = {}
+
+        for party, role in block_records['roles']:
+            self.add_party_role(party, role)
+
+        for each_method in self.get_methods_type():
+            method = self.get_method(each_method)
+            for record in block_records['records'].get(each_method, []):
+                result = method.merge(record)
+                if result:
+                    if each_method not in local_results:
+                        local_results[each_method] = []
+                    if isinstance(result, list):
+                        local_results[each_method].extend(result)
+                    else:
+                        local_results[each_method].append(result)
+
+        if local_results:
+            with self.lock:
+                for each_method in self.get_methods_type():
+                    write_log(f"Saving {each_method}...")
+                    if each_method in local_results:
+                        for each_result in local_results[each_method]:
+                            FileManagement.add_element(each_method, each_result)
+
+    def parallel_processing(self,maxworkers=5, engine=None):
         """
         Procesamiento paralelo CORREGIDO para mantener la UI responsive
+        :param maxworkers: number of workers (threads or processes) to use
+        :param engine: FileManagement.Engine to use, by default blocks are processed by threads; Engine.PROCESS
+        will scan each block on a separate process, and merge its results back here.
         """
         tasks = [(start, size, start_line, end_line) for start, size, start_line, end_line in self.chunk_info]
         write_log(f"{Icons.INFO} Block processing initiated with {len(tasks)} blocks")
@@ -1688,6 +2264,14 @@ class FileManagement:
             write_log(f'{Icons.ERROR} Unable to process this file, I can\'t determine its format')
             write_log(f'{Icons.MAGNIFYING_GLASS} Add proper format at configuration file under \'IDENTITY_FORMAT\' section...')
             return
+
+        if isinstance(engine, str):
+            engine = FileManagement.Engine(engine)
+
+        if engine == FileManagement.Engine.PROCESS:
+            if self._process_engine_available():
+                return self._parallel_processing_processes(tasks, maxworkers)
+
         # Variables para monitoreo
         futures = []
         active_tasks = tasks.copy()
@@ -1760,7 +2344,93 @@ class FileManagement:
                 write_log(f"{Icons.SUCCESS} Analysis complete. "
                           f"Total: {total_data:.2f} MB en {total_time:.2f}s")
 
+    def _process_engine_available(self):
+        """
+        Check if blocks can be processed by worker processes; it requires 'fork' start method (workers will inherit
+        current configuration, rules and compiled regex) and every method to support scan/merge
+        :return: True if process engine can be used
+        """
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            write_log(f"{Icons.WARNING} Process engine not available on this platform, using threads...",
+                      level="WARNING")
+            return False
 
+        for each_method in self.get_methods_type():
+            method = self.get_method(each_method)
+            if not hasattr(method, 'scan') or not hasattr(method, 'merge'):
+                write_log(f"{Icons.WARNING} {each_method} can't be processed by process engine, using threads...",
+                          level="WARNING")
+                return False
+
+        return True
+
+    def _parallel_processing_processes(self, tasks, maxworkers):
+        """
+        Process engine; each block is scanned on a worker process (see `scan_block`), results are merged back on
+        this process following block order, so final results are the same as given by thread engine.
+        :param tasks: list of blocks to process
+        :param maxworkers: number of worker processes
+        :return: None
+        """
+        global _process_pool_file
+
+        futures = []
+        _process_pool_file = self
+        context = multiprocessing.get_context('fork')
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=maxworkers, mp_context=context)
+
+        try:
+            for index, each_task in enumerate(tasks):
+                if shutdown_event.is_set():
+                    break
+
+                self.start_stop_watch(f'Process-{index}', start=True)
+                future = pool.submit(_scan_block_worker, each_task)
+                future.process_index = index
+                future.info = each_task[1]
+                futures.append(future)
+
+            for future in futures:
+                if shutdown_event.is_set():
+                    break
+
+                try:
+                    block_records = future.result()
+                except Exception as e:
+                    start, size, start_line, end_line = tasks[future.process_index]
+                    write_log(f"Error Processing block {start_line}-{end_line}: {str(e)}", level="ERROR")
+                    continue
+
+                self.merge_block(block_records)
+
+                if self.debug:
+                    completed_percent = (future.process_index + 1) * 100 // len(tasks)
+                    if completed_percent != 100:
+                        schedule_ui_update('TTkLabel_analysis_stat', 'setText', f"{Icons.CLOCK}...{completed_percent}%")
+                    else:
+                        schedule_ui_update('TTkLabel_analysis_stat', "setText", '✅ Done...')
+        finally:
+            pool.shutdown(wait=True, cancel_futures=shutdown_event.is_set())
+            _process_pool_file = None
+
+        if not shutdown_event.is_set() and self.debug:
+            total_time = 0
+            total_data = 0
+
+            for future in futures:
+                if future.done() and not future.cancelled():
+                    process_index = future.process_index
+                    time_msg = self.start_stop_watch(f'Process-{process_index}', start=False)
+                    data = future.info / (1024 * 1024)
+
+                    total_time += float(time_msg.split()[0])
+                    total_data += data
+
+                    write_log(f"Process {process_index} completed in {time_msg}, "
+                              f"Processed {data:.2f} MB")
+
+            write_log(f"{Icons.SUCCESS} Analysis complete. "
+                      f"Total: {total_data:.2f} MB en {total_time:.2f}s")
 
     def set_file_format(self, file_format):
         """
@@ -1769,6 +2439,7 @@ class FileManagement:
         :return:
         """
         self.logfile_format = file_format
+        self.file_header_parsers = None
 
     def get_file_format(self):
         """
@@ -1781,43 +2452,166 @@ class FileManagement:
         else:
             return "UNKNOWN"
 
+    def get_header_parser(self, log_format=None):
+        """
+        Return compiled parser for log line header of a log format (VERSION.IDENTITY_FORMAT.<format>)
+        :param log_format: log format, by default actual log format of the file
+        :return: HeaderParser, None if log format is unknown
+        """
+        log_format = log_format or self.logfile_format
+        if not log_format:
+            return None
+
+        if log_format not in self.header_parsers:
+            format_definition = Configs.get_config_for(f"VERSION.IDENTITY_FORMAT.{log_format}")
+            self.header_parsers[log_format] = HeaderParser(log_format, format_definition, RegexLib.cache.compile) \
+                if format_definition and format_definition.get("EXPECT") else None
+
+        return self.header_parsers[log_format]
+
+    def get_header_regex(self):
+        """
+        Return compiled regex for log line header of actual log format (VERSION.IDENTITY_FORMAT.<format>.EXPECT)
+        :return: compiled regex, None if log format is unknown
+        """
+        header_parser = self.get_header_parser()
+
+        return header_parser.regex if header_parser else None
+
+    def get_header_fields(self):
+        """
+        :return: list of fields of log line header for actual log format (VERSION.IDENTITY_FORMAT.<format>.FIELDS)
+        """
+        header_parser = self.get_header_parser()
+
+        return header_parser.fields if header_parser else None
+
     def discover_file_format(self):
         """
-        Analyse first self.scan_lines ( 25 by default) lines from given file to determine which Corda log format is
-        This is done to be able to separate key components from lines like Time stamp, severity level, and log
-        message
+        Sample several regions of the file (each file of a log set) to determine which Corda log formats it has
+        (see FormatDetector); regions are sampled in parallel. This is done to be able to separate key components
+        from lines like Time stamp, severity level, and log message. Format of first line recognized is the file
+        format; when a file mixes formats, each block is parsed with the formats found on it (see
+        get_header_parsers)
         :return:
         """
-        versions = Configs.get_config_for("VERSION.IDENTITY_FORMAT")
+        versions = Configs.get_config_for("VERSION.IDENTITY_FORMAT") or {}
+        detection_setup = Configs.get_config_for("FILE_SETUP.SCAN_SETUP.FORMAT_DETECTION") or {}
         write_log(f'Please wait, reading file {self.filename} and searching for its structure.')
+        parsers = {}
+        for each_version in versions:
+            header_parser = self.get_header_parser(each_version)
+            if header_parser:
+                parsers[each_version] = header_parser
+
+        log_files = [member.log_file for member in self.log_set.members] if self.log_set else [self.log_file]
+        self.format_detectors = {}
+        self.file_header_parsers = None
         try:
-            with open(self.filename, "r") as hfile:
-                for line, each_line in enumerate(hfile):
-                    if not self.logfile_format and line <= self.scan_lines:
-                        for each_version in versions:
-                            try_version = versions[each_version]
-                            check_version = re.search(try_version["EXPECT"], each_line)
-                            if check_version:
-                                self.logfile_format = each_version
-                                self.log_line_regex = re.compile(try_version["EXPECT"])
-                                self.log_line_fields = try_version['FIELDS']
-                                write_log("Log file format recognized as: %s" % self.logfile_format)
-                                break
+            tasks = []
+            for each_file in log_files:
+                detector = FormatDetector(each_file, parsers, regions=detection_setup.get('REGIONS'),
+                                          region_lines=detection_setup.get('REGION_LINES'),
+                                          first_region_lines=self.scan_lines,
+                                          max_switches=detection_setup.get('MAX_SWITCHES'),
+                                          concurrent=RegexLib.concurrent)
+                self.format_detectors[each_file.filename] = detector
+                tasks.extend((detector, each_region) for each_region in detector.get_regions())
+
+            with ThreadPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1) or 1) as pool:
+                sampled = list(pool.map(lambda task: task[0].sample_region(task[1]), tasks))
         except IOError as io:
             write_log(f'Unable to open {self.filename} due to {io}')
+            return
         except UnicodeDecodeError as ue:
             write_log(f'Unable to read this file due to: {ue}', level="ERROR")
             return
 
-class Party:
+        for detector in self.format_detectors.values():
+            detector_tasks = [(region, result) for (task_detector, region), result in zip(tasks, sampled)
+                              if task_detector is detector]
+            detector.build_runs([region for region, _ in detector_tasks], [result for _, result in detector_tasks])
+            if not self.logfile_format and detector.first_format:
+                self.logfile_format = detector.first_format
+            if detector.is_mixed():
+                runs = ', '.join(f"{each_run['start']}: {'/'.join(each_run['formats'])}"
+                                 for each_run in detector.get_runs())
+                write_log(f'{Icons.WARNING} {detector.log_file.filename} mixes log formats, format runs (byte '
+                          f'offset: formats) {runs}', level='WARN')
+
+        if self.logfile_format:
+            header_parser = self.get_header_parser()
+            self.log_line_regex = header_parser.regex
+            self.log_line_fields = header_parser.fields
+            write_log("Log file format recognized as: %s" % self.logfile_format)
+
+    def get_header_parsers(self, start=None, size=None):
+        """
+        Return header parsers for log formats found on a block (see discover_file_format)
+        :param start: byte offset (global offset for a log set), by default whole file
+        :param size: number of bytes
+        :return: list of HeaderParser, to be tried in order; empty if log format is unknown
+        """
+        if start is None and self.file_header_parsers is not None:
+            return self.file_header_parsers
+
+        formats = set()
+        if Configs.get_config("DETECT_LOG_VERSION_EACH_LINE") or start is None:
+            # Each line is checked against all formats found on the file
+            for detector in self.format_detectors.values():
+                formats.update(detector.get_formats())
+        else:
+            detector_start = start
+            detector = self.format_detectors.get(self.filename)
+            if self.log_set:
+                member = self.log_set.get_member(offset=start)
+                detector = self.format_detectors.get(member.filename)
+                detector_start = start - member.base_offset
+            if detector:
+                formats.update(detector.get_formats(detector_start, size))
+        if self.logfile_format:
+            formats.add(self.logfile_format)
+
+        # Formats are tried in order of definition, as they were when format was detected
+        header_parsers = [self.get_header_parser(each_format)
+                          for each_format in Configs.get_config_for("VERSION.IDENTITY_FORMAT") or {}
+                          if each_format in formats]
+        header_parsers = [header_parser for header_parser in header_parsers if header_parser]
+        if start is None:
+            self.file_header_parsers = header_parsers
+
+        return header_parsers
+
+# FileManagement object being processed by process engine; worker processes inherit it (fork)
+_process_pool_file = None
+
+
+def _scan_block_worker(args):
+    """
+    Worker process entry point for process engine
+    :param args: block definition (start, size, start_line, end_line)
+    :return: block records (see FileManagement.scan_block)
+    """
+    return _process_pool_file.scan_block(args)
+
+
+class Party(CompactModel):
     """
     A class to represent parties on a log
     """
+    __slots__ = ('name', 'reference_id', 'role', 'type', 'corda_role', 'default_endpoint', 'alternate_names',
+                 'original_string', 'attributes')
+    FIELDS = __slots__
+
     party_list = []
+    # Parties on party_list by name
+    party_names = {}
     party_expected_role_list = {
         'notary': 'optional',
         'log_owner': 'mandatory'
     }
+    # x500 name attributes, same regex for all parties
+    regex = re.compile(r"([CNSTLOU]{1,2}=[^\[\]^,]*)")
 
     def __init__(self, x500name=None):
         self.name = x500name
@@ -1828,7 +2622,6 @@ class Party:
         self.default_endpoint = None
         self.alternate_names = []
         self.original_string = x500name
-        self.regex = re.compile(r"([CNSTLOU]{1,2}=[^\[\]^,]*)")
         self.attributes = self.extract_attributes()
 
     @staticmethod
@@ -2011,11 +2804,11 @@ class Party:
         # else:
         #     uml_list = [incoming_uml_object]
 
-        for pty in Party.party_list:
-            if self.name == pty.name:
-                return False
+        if self.name in Party.party_names:
+            return False
 
         Party.party_list.append(self)
+        Party.party_names[self.name] = self
         return True
 
     def extract_attributes(self, name=None):
@@ -2041,12 +2834,22 @@ class Party:
         :return: true if it is same, false otherwise
         """
 
-        other_attributes = self.extract_attributes(name_to_compare)
+        return Party.get_x500_fingerprint(self.extract_attributes(name_to_compare)) == self.get_fingerprint()
 
-        if set(other_attributes) == set(self.attributes):
-            return True
+    @staticmethod
+    def get_x500_fingerprint(attributes):
+        """
+        Canonical key of a x500 name, same for all names with same attributes regardless to their order
+        :param attributes: list of attributes (like 'O=Bank'), as given by extract_attributes
+        :return: frozenset of (key, value)
+        """
+        return frozenset(tuple(each_attribute.split('=', 1)) for each_attribute in attributes)
 
-        return False
+    def get_fingerprint(self):
+        """
+        :return: fingerprint of this party name (see get_x500_fingerprint)
+        """
+        return Party.get_x500_fingerprint(self.attributes)
 
     def add_alternate_name(self, other_x500_name):
         """
@@ -2100,13 +2903,15 @@ class Party:
         :param party_name: x500 name of party to look for
         :return: a party object
         """
-        for each_party in Party.party_list:
-            if each_party.name == party_name:
-                return each_party
-
-        return None
+        return Party.party_names.get(party_name)
 
 class X500NameParser:
+    # Memos of results derived from x500 names (see FILE_SETUP.X500_MEMO): x500 names found for a list of attributes
+    # (parsed and validated), normalised names and name fingerprints, by raw text
+    names_memo = X500Memo('x500 names by attributes')
+    normalized_memo = X500Memo('normalized x500 names')
+    fingerprint_memo = X500Memo('x500 name fingerprints')
+
     def __init__(self, rules):
         """
         Initialize the parser with rules for attribute validation.
@@ -2116,6 +2921,41 @@ class X500NameParser:
         self.rules = rules['supported-attributes']
         self.mandatory_attributes = [k for k, v in self.rules.items() if v.get('mandatory', False)]
         self.regex = re.compile(r"([CNSTLOU]{1,2}=[^\[\]^,={]*)")
+        # Names parsed with these rules are kept on memo under this key, same rules give same results
+        self.rules_key = tuple((key, str(rule.get('expect')), bool(rule.get('mandatory', False)))
+                               for key, rule in self.rules.items())
+
+    @staticmethod
+    def setup_memo(config=None):
+        """
+        Setup memos of x500 names, all results kept so far are discarded (they depend on configuration)
+        :param config: FILE_SETUP.X500_MEMO settings
+        :return: None
+        """
+        config = config or {}
+        for each_memo in X500NameParser.get_memos():
+            each_memo.setup(config.get('MAX_SIZE'))
+
+    @staticmethod
+    def get_memos():
+        """
+        :return: list of memos of x500 names (X500Memo)
+        """
+        return [X500NameParser.names_memo, X500NameParser.normalized_memo, X500NameParser.fingerprint_memo]
+
+    @staticmethod
+    def memo_report():
+        """
+        Statistics of memos of x500 names, as text lines ready to print or to send to log
+        :return: list of lines
+        """
+        lines = [f'{"x500 memo":<26} {"size":>7} {"hits":>9} {"misses":>8} {"hit rate":>8} {"evicted":>8}']
+        for each_memo in X500NameParser.get_memos():
+            statistics = each_memo.get_statistics()
+            lines.append(f'{statistics["name"]:<26} {statistics["size"]:>7} {statistics["hits"]:>9} '
+                         f'{statistics["misses"]:>8} {statistics["hit_rate"]:>8.1%} {statistics["evictions"]:>8}')
+
+        return lines
 
     def extract_attributes(self, line):
         """
@@ -2123,7 +2963,14 @@ class X500NameParser:
         :param line: String containing potential X500 names.
         :return: List of tuples representing key-value pairs.
         """
-        matches = self.regex.findall(line)
+        return self.parse_attributes(self.regex.findall(line, concurrent=RegexLib.concurrent))
+
+    def parse_attributes(self, matches):
+        """
+        Split and validate attributes found on a line
+        :param matches: list of attributes as found on the line (like 'O=Bank')
+        :return: List of tuples representing key-value pairs.
+        """
         attributes = []
         for each_match in matches:
             key, value = each_match.split('=')
@@ -2163,6 +3010,10 @@ class X500NameParser:
         #  normalizacion no sea bueno usarla al construir los atributos, sera mejor usarla antes de agregar el
         #  nuevo nombre a la lista
 
+        normalized = X500NameParser.normalized_memo.get(x500namestr)
+        if normalized is not X500Memo.MISSING:
+            return normalized
+
         # I'm Assuming all x500namestr are wellformed x500 names
         attributes = x500namestr.split(',')
 
@@ -2178,7 +3029,22 @@ class X500NameParser:
             if each_att in x5002normalize:
                 normalized_attributes.append(f'{each_att}={x5002normalize[each_att]}')
 
-        return ', '.join(f"{k}" for k in normalized_attributes).strip()
+        return X500NameParser.normalized_memo.store(x500namestr,
+                                                    ', '.join(f"{k}" for k in normalized_attributes).strip())
+
+    @staticmethod
+    def get_fingerprint(x500namestr):
+        """
+        Fingerprint of a raw x500 name (see Party.get_x500_fingerprint)
+        :param x500namestr: x500 name
+        :return: frozenset of (key, value)
+        """
+        fingerprint = X500NameParser.fingerprint_memo.get(x500namestr)
+        if fingerprint is not X500Memo.MISSING:
+            return fingerprint
+
+        return X500NameParser.fingerprint_memo.store(x500namestr,
+                                                     Party.get_x500_fingerprint(Party.regex.findall(x500namestr)))
 
 
     def validate_x500_name(self, attributes):
@@ -2201,7 +3067,31 @@ class X500NameParser:
         :list for all x500 names found, this is required to prevent "static" variables.
         :return: List of valid X500 names.
         """
-        attributes = self.extract_attributes(line)
+
+        return self.add_x500_names(self.extract_x500_names(line), x500_list)
+
+    def extract_x500_names(self, line):
+        """
+        Extract and validate X500 names from given line, without touching any list of parties already found; this
+        is the expensive (regex) side of `parse_line` and it is safe to run it on a separate process.
+        :param line: String containing potential X500 names.
+        :return: list of raw x500 names (strings) found on this line, in order of appearance
+        """
+        # Same attributes give same names: repeated names are taken from memo, without splitting or validating them
+        matches = tuple(self.regex.findall(line, concurrent=RegexLib.concurrent))
+        rx500_names = X500NameParser.names_memo.get((self.rules_key, matches))
+        if rx500_names is X500Memo.MISSING:
+            rx500_names = X500NameParser.names_memo.store((self.rules_key, matches),
+                                                          tuple(self.get_x500_names(self.parse_attributes(matches))))
+
+        return list(rx500_names)
+
+    def get_x500_names(self, attributes):
+        """
+        Group attributes into x500 names, only valid names are kept
+        :param attributes: list of (key, value), as given by parse_attributes
+        :return: list of raw x500 names (strings), in order of appearance
+        """
         x500_names = []
         rx500_names = []
         current_name = []
@@ -2225,30 +3115,55 @@ class X500NameParser:
                 rx500_names.append(rname)
             x500_names.append(current_name)
 
+        return rx500_names
+
+    @staticmethod
+    def add_x500_names(rx500_names, x500_list):
+        """
+        Convert raw x500 names into Party objects and add them into given list, if name is already in the list (even
+        with its attributes shifted) it will be registered as an alternate name
+        :param rx500_names: list of raw x500 names, as returned by `extract_x500_names`
+        :param x500_list: list that holds all parties found so far (a PartyRegistry finds names already in the list
+        without going through all of them)
+        :return: x500_list
+        """
+
+        X500NameParser.register_x500_names(rx500_names, x500_list)
+
+        # return rx500_names
+        return x500_list
+
+    @staticmethod
+    def register_x500_names(rx500_names, x500_list):
+        """
+        Same as `add_x500_names`, but it returns only parties given names belong to
+        :param rx500_names: list of raw x500 names, as returned by `extract_x500_names`
+        :param x500_list: list that holds all parties found so far (list or PartyRegistry)
+        :return: list of parties for given names (new ones, or already in the list)
+        """
 
         # Process all names found and convert them into a proper x500 name object
+        parties = []
+        for rname in rx500_names or []:
+            fingerprint = X500NameParser.get_fingerprint(rname)
+            if isinstance(x500_list, PartyRegistry):
+                same_parties = x500_list.get_parties(fingerprint)
+            else:
+                same_parties = [each_xname for each_xname in x500_list if each_xname.get_fingerprint() == fingerprint]
 
-        if rx500_names:
+            for each_xname in same_parties:
+                each_xname.add_alternate_name(rname)
 
-            for rname in rx500_names:
-                alternate_name_found = False
-                # if name not in x500_name_list:
+            if not same_parties:
                 # Before creating a proper party, first normalize x500 name to make sure it is standard in whole
                 # analysis
                 #
-                norm_rname = X500NameParser.normalize_x500(rname)
-                x500name = Party(norm_rname)
-                if x500_list:
-                    for each_xname in x500_list:
-                        if each_xname.is_same_name(rname):
-                            each_xname.add_alternate_name(rname)
-                            alternate_name_found = True
+                same_parties = [Party(X500NameParser.normalize_x500(rname))]
+                x500_list.append(same_parties[0])
 
-                if not alternate_name_found:
-                    x500_list.append(x500name)
+            parties.extend(party for party in same_parties if party not in parties)
 
-        # return rx500_names
-        return x500_list
+        return parties
 
     def identify_party_role(self, line, line_no=None):
         """
@@ -2286,8 +3201,11 @@ class X500NameParser:
 class Configs:
     config = {}
     count = 0
-    compiled_regex = {}
     config_access_cache = {}
+    # Hash of each configuration file loaded
+    config_hashes = {}
+    # Literal prefilter for rule patterns, see build_prefilter()
+    prefilter = None
 
     config_variables = {
         "VERSION": {
@@ -2774,11 +3692,15 @@ class Configs:
         try:
             with open(file, "r") as fconfig:
                 # Configs.config = json.load(fconfig)["CONFIG"]
-                Configs.config = json.load(fconfig)
+                content = fconfig.read()
+                Configs.config = json.loads(content)
+                Configs.config_hashes['support.json'] = hashlib.sha256(content.encode()).hexdigest()
             write_log("Configuration loaded...")
 
             with open(rule_file, "r") as fconfig:
-                rule_file =  json.load(fconfig)
+                content = fconfig.read()
+                rule_file =  json.loads(content)
+                Configs.config_hashes['logwatcher_rules.json'] = hashlib.sha256(content.encode()).hexdigest()
 
             for each_process in rule_file["WATCH_FOR"]:
                 for each_rule in rule_file["WATCH_FOR"][each_process]:
@@ -2802,6 +3724,20 @@ class Configs:
                     Configs.set_config(config_value=rule_file["FILE_SETUP"], section="FILE_SETUP")
                     Configs.set_config(config_value=rule_file['WATCH_FOR'], section='WATCH_FOR')
             write_log("Object definition and rules loaded")
+            cache_setup = Configs.get_config_for('FILE_SETUP.REGEX_CACHE') or {}
+            # Cache is set up before rules are compiled, so they get its instrumentation; profiling mode (see
+            # RegexProfiler) and regex report need compiled patterns to be instrumented. Settings only turn
+            # instrumentation on, it may have been requested already (like logtracer --regex-profile)
+            instrument = cache_setup.get('INSTRUMENT') or cache_setup.get('PROFILE') or cache_setup.get('LOG_REPORT')
+            RegexLib.cache.setup(cache_setup.get('MAX_SIZE'), True if instrument else None,
+                                 True if cache_setup.get('PROFILE') else None)
+            RegexLib.compile_macros(Configs.config)
+            RuleSet.build_all(Configs.config)
+            Configs.build_prefilter()
+            concurrent_setup = Configs.get_config_for('FILE_SETUP.SCAN_SETUP.CONCURRENT_REGEX') or {}
+            RegexLib.concurrent = True if concurrent_setup.get('ENABLED', False) else None
+            RegexBudget.setup(Configs.get_config_for('FILE_SETUP.SCAN_SETUP.REGEX_BUDGET'))
+            X500NameParser.setup_memo(Configs.get_config_for('FILE_SETUP.X500_MEMO'))
 
         except IOError as io:
             write_log("ERROR loading config file: %s" % io)
@@ -2812,6 +3748,58 @@ class Configs:
 
             exit(1)
 
+    @staticmethod
+    def build_prefilter():
+        """
+        Build literal prefilter (see LiteralPrefilter) with all patterns from CORDA_OBJECTS, WATCH_FOR,
+        UML_DEFINITIONS and UML_ENTITY; it can be disabled at FILE_SETUP.SCAN_SETUP.PREFILTER.ENABLED
+        :return: None
+        """
+        Configs.prefilter = None
+        prefilter_setup = Configs.get_config_for('FILE_SETUP.SCAN_SETUP.PREFILTER')
+        if not prefilter_setup or not prefilter_setup.get('ENABLED', False):
+            return
+
+        prefilter = LiteralPrefilter(prefilter_setup.get('MIN_LITERAL_LENGTH'))
+
+        def expand(regex_list):
+            return [RegexLib.build_regex(each_regex, nogroup_name=True) for each_regex in regex_list]
+
+        for each_type, definition in (Configs.get_config(section='CORDA_OBJECTS') or {}).items():
+            if 'EXPECT' in definition:
+                prefilter.add(LiteralPrefilter.Family.CORDA_OBJECTS, each_type, expand(definition['EXPECT']))
+
+        for each_category, errors in (Configs.get_config_for('WATCH_FOR') or {}).items():
+            for each_error, definition in errors.items():
+                prefilter.add(LiteralPrefilter.Family.WATCH_FOR, (each_category, each_error),
+                              definition.get('error_strings') or [])
+
+        for each_command, definition in (Configs.get_config_for('UML_DEFINITIONS') or {}).items():
+            if isinstance(definition, dict) and 'EXPECT' in definition:
+                prefilter.add(LiteralPrefilter.Family.UML_DEFINITIONS, each_command, expand(definition['EXPECT']))
+
+        for each_role, definition in (Configs.get_config_for('UML_ENTITY.OBJECTS') or {}).items():
+            if definition.get('EXPECT'):
+                prefilter.add(LiteralPrefilter.Family.UML_ENTITY, each_role, expand(definition['EXPECT']))
+
+        prefilter.compile()
+        Configs.prefilter = prefilter
+        write_log(f"Literal prefilter ready, {len(prefilter.literal_rules)} literals")
+
+    @staticmethod
+    def applies(line, family, key=None):
+        """
+        Check with literal prefilter if a rule could match given line
+        :param line: log line
+        :param family: LiteralPrefilter.Family
+        :param key: rule identifier, by default any rule of the family
+        :return: False only if no rule can match given line, True if it could (or if prefilter is not enabled)
+        """
+        if not Configs.prefilter:
+            return True
+
+        return Configs.prefilter.applies(line, family, key)
+
     @staticmethod
     def regex_expression(regex):
         """
@@ -2821,16 +3809,7 @@ class Configs:
         :return: compiled regex expression
         """
 
-        regex_code = generate_hash(regex)
-
-        if regex_code in Configs.compiled_regex:
-            return Configs.compiled_regex[regex_code]
-
-        compile_regex = re.compile(regex)
-
-        Configs.compiled_regex[regex_code] = compile_regex
-
-        return compile_regex
+        return RegexLib.use(regex)
 
     @staticmethod
     def __init__(config_loaded, section="CONFIG"):
@@ -3127,9 +4106,14 @@ class RegexLib:
     Keep a cache of compiled regex, to be able to re-use them.
     """
 
-    compiled_regex_cache = {}
+    # Compiled regex, and values derived from them (see FILE_SETUP.REGEX_CACHE)
+    cache = RegexCache()
     check_variable = re.compile(r"__([a-zA-Z0-9-_]+)__")
-    most_used_regex = {}
+    # Macro variables resolved for current configuration (see build_regex)
+    macro_compiler = None
+    # 'regex' module concurrent mode: GIL is released while matching, so blocks scanned by threads run in parallel
+    # (see FILE_SETUP.SCAN_SETUP.CONCURRENT_REGEX); None keeps module default
+    concurrent = None
 
 
     @staticmethod
@@ -3141,88 +4125,141 @@ class RegexLib:
         :return: compiled version of given regex
         """
 
-        signature = generate_hash(rx_expression)
+        return RegexLib.cache.compile(rx_expression)
 
-        if signature not in RegexLib.compiled_regex_cache:
-            RegexLib.compiled_regex_cache[signature] = re.compile(rx_expression)
-            return RegexLib.compiled_regex_cache[signature]
+    @staticmethod
+    def match_batch(lines, rule_set, anchored=False, separator='\n', line_numbers=None):
+        """
+        Match each regex of a rule set against a whole block of lines at once: lines are joined and each regex runs a
+        single (multiline) finditer over the block, match offsets are mapped back to their lines with a binary search
+        (numpy searchsorted) over line start offsets. Lines touched by a match that goes beyond its line (like '\\s*'
+        taking the new line) are matched again on their own, and regex that could look past their line (look arounds,
+        string anchors, see RuleSet.LINE_ONLY_SYNTAX) are matched line by line, so result is the same as matching
+        line by line. Block matching is limited by line budget (see RegexBudget), when it runs out all lines are
+        matched on their own, each one with its line budget.
+        :param lines: list of lines
+        :param rule_set: RuleSet
+        :param anchored: only matches at start of each line (like regex.match), otherwise all matches on each line
+        (like regex.finditer)
+        :param separator: text used to join lines; lines that keep their own line terminator must be joined with ''
+        :param line_numbers: line number of each line, for degraded lines report (see RegexBudget)
+        :return: sparse hit matrix, a list of (line index, rule index, [(start, end), ...]) for each line and regex
+        with a match, ordered by line and regex; match spans are relative to their line
+        """
+        hits = {}
+        if not lines:
+            return []
+
+        text = separator.join(lines)
+        line_starts = np.fromiter(itertools.accumulate((len(each_line) + len(separator) for each_line in lines[:-1]),
+                                                       initial=0), dtype=np.int64, count=len(lines))
+        line_ends = line_starts + np.fromiter((len(each_line) for each_line in lines), dtype=np.int64,
+                                              count=len(lines))
+
+        for rule_index in range(len(rule_set.expanded)):
+            block_regex = rule_set.get_block_compiled(rule_index, anchored)
+            matches = None
+            if block_regex is not None:
+                matches = RegexLib.block_finditer(block_regex, text)
+            if matches is None:
+                line_by_line = range(len(lines))
+            else:
+                if not matches:
+                    continue
+                spans = np.array([match.span() for match in matches], dtype=np.int64)
+                match_lines = np.searchsorted(line_starts, spans[:, 0], side='right') - 1
+                crossing = spans[:, 1] > line_ends[match_lines]
+                line_by_line = set()
+                for line_index, (start, end), crossed in zip(match_lines.tolist(), spans.tolist(),
+                                                             crossing.tolist()):
+                    if crossed:
+                        # Match taken from several lines, all of them are checked again on their own
+                        last_line = int(np.searchsorted(line_starts, end - 1, side='right')) - 1
+                        line_by_line.update(range(line_index, last_line + 1))
+                        continue
+                    line_start = int(line_starts[line_index])
+                    if anchored and start != line_start:
+                        # Empty match at the very end of a block ending with a line terminator
+                        continue
+                    hits.setdefault((line_index, rule_index), []).append((start - line_start, end - line_start))
+
+                for line_index in line_by_line:
+                    hits.pop((line_index, rule_index), None)
+
+            line_regex = rule_set.get_compiled(rule_index)
+            literals = rule_set.get_literals(rule_index)
+            for line_index in line_by_line:
+                line_no = line_numbers[line_index] if line_numbers else None
+                if anchored:
+                    match = RegexBudget.run('match', line_regex, lines[line_index], literals, line_no,
+                                            rule_set.regex_list[rule_index], concurrent=RegexLib.concurrent)
+                    spans = [match.span()] if match else []
+                else:
+                    spans = [match.span() for match in RegexBudget.run('finditer', line_regex, lines[line_index],
+                                                                       literals, line_no,
+                                                                       rule_set.regex_list[rule_index],
+                                                                       concurrent=RegexLib.concurrent)]
+                if spans:
+                    hits[(line_index, rule_index)] = spans
 
-        return RegexLib.compiled_regex_cache[signature]
+        return [(line_index, rule_index, spans) for (line_index, rule_index), spans in sorted(hits.items())]
 
     @staticmethod
-    def regex_to_use(regex_list, message_line, force_groups=False,line_no=None, timeout=25000):
+    def block_finditer(block_regex, text):
         """
-        Given a regex_list, which will contain all regex; and the line to find out which regex
-        can be applied into it
-        :param regex_list: a regex list with all possible regex to try
-        :param message_line: the actual message that need to be parsed
-        :param force_groups: if given list of regex has no groups on it, this method will fail as it depends on
-        groups defined withing regex expression
-        :return: regex index to be used or None if there're no possible regex matches.
+        All matches of a regex over a block of lines, limited by line budget (see RegexBudget): a batch of lines
+        is matched faster than a single line is allowed to take, unless some line is pathological
+        :param block_regex: compiled regex
+        :param text: lines joined
+        :return: list of matches, None if budget ran out (lines must be matched on their own)
         """
+        timeout = RegexBudget.get_timeout()
+        if timeout == 0:
+            return None
 
-        if force_groups:
-            rgx_list = []
-            for item in regex_list:
-                rgx_list.append(f'({item})')
-            regex_list = rgx_list
-
-        #
-        # In order to join all regex into one, I need to remove any group names as it can make conflicts
-        no_group_names = clear_groupnames(regex_list)
-        #
-        # I need to get actual group references for the concatenated regex. this will help to
-        # identify correct regex to use
-        concatenated_idx_groups = RegexLib.set_concatenated_index_groups(no_group_names)
-        # Join all regex into one
-
-        all_expects = '|'.join(no_group_names)
-
-        group_idx_match = None
-        start_time = time.time()
+        start = time.perf_counter()
         try:
-            # Check if given line has a valid regex to be applied
-            expression = RegexLib.use(all_expects)
-
-            # with TimeoutError.Timeout(second=0.5):
             if timeout:
-                check_match = expression.findall(message_line, timeout=timeout)
-            else:
-                check_match = expression.findall(message_line)
-            elapsed = time.time() - start_time
-            if elapsed*1000 > 10000:  # Más de 500ms
-                if line_no:
-                    write_log(f"⚠️ Line:{line_no:<6} -- Slow regex ({elapsed*1000:.2f}ms) line contains {len(message_line)} chars",
-                              level="WARN")
-                else:
-                    write_log(f"⚠️ Slow regex ({elapsed*1000:.2f}ms) line contains {len(message_line)} chars",
-                              level="WARN")
-            # check_match = re.findall(all_expects, message_line)
-            #
-            # Using result from findall; search which group was valid
-            #
-            if not check_match:
-                return None
-            match_expression_index = next(a for a, b in enumerate(check_match[0]) if b)
-            # I've found a good group save it for reference
-            group_idx_match = match_expression_index
-
-        except BaseException as be:
-            # No regex has a match with given line
+                return list(block_regex.finditer(text, timeout=timeout, concurrent=RegexLib.concurrent))
+            return list(block_regex.finditer(text, concurrent=RegexLib.concurrent))
+        except builtins.TimeoutError:
+            # 'regex' module timeout (TimeoutError name is taken on this module)
             return None
-        except TimeoutError:
-            pass
+        finally:
+            RegexBudget.spend(time.perf_counter() - start)
 
+    @staticmethod
+    def regex_report(top=None):
+        """
+        Report of most expensive regex, by time spent matching (see RegexCache.report); when process engine is used,
+        matching done by worker processes is not accounted.
+        :param top: number of patterns to include, by default FILE_SETUP.REGEX_CACHE.REPORT_TOP
+        :return: list of text lines
+        """
+        if not top:
+            top = Configs.get_config_for('FILE_SETUP.REGEX_CACHE.REPORT_TOP') or 20
 
-        # If we don't match any regex for this line, then doesn't make sense to continue with it... return None
-        if group_idx_match is None:
-            return None
+        return RegexLib.cache.format_report(top)
 
-        expect_to_use = concatenated_idx_groups[group_idx_match]
+    @staticmethod
+    def regex_to_use(regex_list, message_line, force_groups=False, line_no=None, timeout=None, max_line_size=None):
+        """
+        Given a regex_list, which will contain all regex; and the line to find out which regex
+        can be applied into it
+        :param regex_list: a regex list with all possible regex to try
+        :param message_line: the actual message that need to be parsed
+        :param force_groups: if given list of regex has no groups on it, this method will fail as it depends on
+        groups defined withing regex expression
+        :param line_no: line number, for degraded lines report (see RegexBudget)
+        :param timeout: max time (seconds) for this line, by default line budget is used
+        :param max_line_size: longer lines are only matched in degraded mode
+        :return: regex index to be used or None if there're no possible regex matches.
+        """
 
-        # A matching regex was found, return actual index that will work:
+        # All regex are joined into a single expression, prepared once for each list (see RuleSet)
+        rule_set = RuleSet.get(regex_list, force_groups)
 
-        return expect_to_use
+        return rule_set.match(message_line, timeout, line_no, max_line_size)
 
     @staticmethod
     def set_concatenated_index_groups(regex_list):
@@ -3263,82 +4300,39 @@ class RegexLib:
     def build_regex(regex, nogroup_name=False):
         """
         This method will scan given regex to check if a "macro"(regex inside a regex) was included, if so will look for that
-        and replace it with its value; then will return complete regex expression
+        and replace it with its value; then will return complete regex expression. Macros are resolved when
+        configuration is loaded (see MacroCompiler), so this is a lookup for any regex from configuration.
         :param regex: regex to examine
         :param nogroup_name: this will cause returning pattern to avoid setting up group name within regex pattern
         :return: complete regex expression if a variable needs to be replaced, original regex expression otherwise
         """
-        return_regex = regex
-
-        if regex in RegexLib.most_used_regex:
-            return RegexLib.most_used_regex[regex]
+        return RegexLib.get_macro_compiler().expand(regex, nogroup_name)
 
-        if not Configs.get_config(section="CORDA_OBJECT_DEFINITIONS", param="OBJECTS"):
-            return return_regex
-
-        check_variable = RegexLib.check_variable.findall(regex)
+    @staticmethod
+    def get_macro_compiler():
+        """
+        Return macro compiler for current CORDA_OBJECT_DEFINITIONS, it is built again if definitions were replaced
+        :return: MacroCompiler
+        """
+        objects = Configs.get_config(section="CORDA_OBJECT_DEFINITIONS", param="OBJECTS")
+        compiler = RegexLib.macro_compiler
+        if compiler is None or compiler.objects is not (objects or compiler.objects):
+            compiler = MacroCompiler(objects)
+            RegexLib.macro_compiler = compiler
 
-        if check_variable:
-            org_regex = regex
-            for each_variable in check_variable:
-                # Search where this variable could be applicable to then extract the proper regex replacement for such
-                # variable
-                #
-                for each_object in Configs.get_config_for("CORDA_OBJECT_DEFINITIONS.OBJECTS").keys():
-                # for each_object in Configs.get_config(section="CORDA_OBJECT_DEFINITIONS", param="OBJECTS").keys():
-                    apply_to = None
-                    # cfg_setup = Configs.get_config_for(f"CORDA_OBJECT_DEFINITIONS.OBJECTS.{each_object}")
-                    # if "APPLY_TO" in cfg_setup:
-                    #     apply_to = cfg_setup["APPLY_TO"]
-                    if "APPLY_TO" in Configs.get_config(section="CORDA_OBJECT_DEFINITIONS",
-                                                        param="OBJECTS", sub_param=each_object):
-                        apply_to = Configs.get_config(section="CORDA_OBJECT_DEFINITIONS",
-                                                      param="OBJECTS",
-                                                      sub_param=each_object)["APPLY_TO"]
-                    else:
-                        write_log("Warning: %s has no 'APPLY_TO' parameter,"
-                              " so I'm not able to identify the match for this label..." %
-                              (each_object,))
-                    #
-                    # if apply_to list has a content, and check_variable appear in such list, then proceed to do replacement
-                    if apply_to and each_variable in apply_to:
-                        list_expects = "|".join(Configs.get_config(
-                            section="CORDA_OBJECT_DEFINITIONS",
-                            param="OBJECTS",
-                            sub_param=each_object
-                        )["EXPECT"])
-
-                        if nogroup_name:
-                            regex_replace = "(%s)" % (list_expects,)
-                        else:
-                            regex_replace = "(?P<%s>%s)" % (
-                                each_variable,
-                                list_expects
-                            )
-                        return_regex = regex.replace("__%s__" % each_variable, regex_replace)
-
-                        # if more than one variable is being found make sure to keep previous change before replacing
-                        # following variable
-
-                        regex = return_regex
-            # Store this regex combination it is possible will be used later
-            RegexLib.most_used_regex[org_regex] = return_regex
-        else:
-            # If I do not find the macro variable in the form of "__macro-variable__" then I will need to do a reverse
-            # search, to find the actual object... because what I'm sending then is probably a raw Object  definition
-            object_definition = Configs.get_config(section="CORDA_OBJECT_DEFINITIONS", param="OBJECTS")
-            for each_object in object_definition:
-                if regex in object_definition[each_object]['EXPECT']:
-                    if nogroup_name:
-                        regex_replace = "(%s)" % (regex,)
-                    else:
-                        regex_replace = "(?P<%s>%s)" % (
-                            each_object,
-                            regex
-                        )
-                    return_regex = regex_replace
+        return compiler
 
-        return return_regex
+    @staticmethod
+    def compile_macros(config):
+        """
+        Resolve all macro variables and expand all regex from given configuration ahead of time
+        :param config: configuration (dictionary)
+        :return: None
+        """
+        RegexLib.macro_compiler = None
+        compiler = RegexLib.get_macro_compiler()
+        expanded = compiler.compile_all(config)
+        write_log(f"{len(compiler.bodies)} macro variables resolved, {expanded} regex expanded")
 
 ############################
 
@@ -3579,10 +4573,193 @@ class RegexLib:
 
             return ltr
 
-class BlockItems:
+class RuleSet:
+    """
+    A list of regex (an EXPECT list from configuration) prepared to find out which one of them matches a line: all
+    regex are expanded (macro variables), joined into a single compiled expression, and each group of that expression
+    is mapped to the regex it belongs to. Rule sets for all EXPECT lists are built when configuration is loaded (see
+    Configs.load_config), so finding the regex to use for a line is a single lookup plus one match.
+    """
+
+    # All rule sets prepared, by (list of regex, force_groups)
+    rule_sets = {}
+    # Syntax that could look at text of other lines when lines are matched as a block: look arounds (a look ahead at
+    # the end of a line sees the new line and next line) and string anchors
+    LINE_ONLY_SYNTAX = re.compile(r'\(\?<?[=!]|\\[AZzG]')
+    # Global inline flags at the beginning of a regex, like (?i)
+    GLOBAL_FLAGS = re.compile(r'^\(\?[a-zA-Z]+\)')
+
+    def __init__(self, regex_list, force_groups=False):
+        """
+        :param regex_list: list of regex, in order of preference
+        :param force_groups: each regex will be enclosed in a group, for regex without groups
+        """
+        self.regex_list = list(regex_list)
+        if force_groups:
+            regex_list = [f'({item})' for item in regex_list]
+
+        # Group names are removed, as same names could be used by several regex
+        self.expanded = [CordaObject.remove_group_names(RegexLib.build_regex(each_regex, nogroup_name=True))
+                         for each_regex in regex_list]
+        self.compiled = [None] * len(self.expanded)
+        # Literals needed by each regex, see get_literals
+        self.literals = {}
+        # Compiled versions to match blocks of lines, see get_block_compiled
+        self.block_compiled = {}
+        # Regex index for each group of the joined expression
+        self.group_rule = RegexLib.set_concatenated_index_groups(self.expanded)
+        try:
+            self.pattern = RegexLib.use('|'.join(self.expanded))
+        except re.error as ree:
+            write_log(f"ERROR: Unable to join regex list {self.regex_list}: {ree}")
+            self.pattern = None
+
+    @staticmethod
+    def get(regex_list, force_groups=False):
+        """
+        Return rule set for given list, it will be prepared if it was not done before
+        :param regex_list: list of regex
+        :param force_groups: see RuleSet
+        :return: RuleSet
+        """
+        key = (tuple(regex_list), force_groups)
+        rule_set = RuleSet.rule_sets.get(key)
+        if rule_set is None:
+            rule_set = RuleSet(regex_list, force_groups)
+            RuleSet.rule_sets[key] = rule_set
+
+        return rule_set
+
+    @staticmethod
+    def build_all(config):
+        """
+        Prepare a rule set for each EXPECT list found on given configuration
+        :param config: configuration (dictionary)
+        :return: None
+        """
+        RuleSet.rule_sets = {}
+
+        def walk(section):
+            if isinstance(section, dict):
+                for key, value in section.items():
+                    if key == 'EXPECT' and isinstance(value, list) and value and \
+                            all(isinstance(each_regex, str) for each_regex in value):
+                        RuleSet.get(value)
+                    else:
+                        walk(value)
+
+        walk(config)
+        write_log(f"{len(RuleSet.rule_sets)} rule sets prepared")
+
+    def match(self, line, timeout=None, line_no=None, max_line_size=None):
+        """
+        Find out which regex matches given line, within regex time budget (see RegexBudget)
+        :param line: line to check
+        :param timeout: max time for matching (seconds), by default line budget is used
+        :param line_no: line number, for degraded lines report
+        :param max_line_size: longer lines are only matched in degraded mode
+        :return: index of the regex matching, None if no regex matches
+        """
+        if not self.pattern:
+            return None
+
+        match = RegexBudget.run('search', self.pattern, line, self.get_literals(), line_no, '|'.join(self.regex_list),
+                                timeout, max_line_size, concurrent=RegexLib.concurrent)
+
+        if not match:
+            return None
+
+        group_idx_match = next((index for index, value in enumerate(match.groups()) if value), None)
+        if group_idx_match is None or group_idx_match >= len(self.group_rule):
+            return None
+
+        return self.group_rule[group_idx_match]
+
+    def get_compiled(self, index):
+        """
+        :param index: regex index
+        :return: compiled version of expanded regex (without group names)
+        """
+        if self.compiled[index] is None:
+            self.compiled[index] = RegexLib.use(self.expanded[index])
+
+        return self.compiled[index]
+
+    def get_literals(self, index=None):
+        """
+        Literal texts that any match needs, used to choose which parts of a line are matched in degraded mode (see
+        RegexBudget)
+        :param index: regex index, all regex of the set by default
+        :return: set of literals, None if there's no usable literal
+        """
+        if index not in self.literals:
+            # Regex without literals are only matched at line start in degraded mode
+            literals = set()
+            for each_regex in self.expanded if index is None else [self.expanded[index]]:
+                literals.update(LiteralPrefilter.required_literals(each_regex) or [])
+            self.literals[index] = literals or None
+
+        return self.literals[index]
+
+    def get_block_compiled(self, index, anchored=False):
+        """
+        Compiled version of a regex to match a block of lines at once (see RegexLib.match_batch)
+        :param index: regex index
+        :param anchored: regex must only match at line start
+        :return: compiled regex (multiline), None if regex can only be matched line by line: it looks ahead or behind
+        (or uses string anchors) so it could see text from other lines, or it can't be compiled that way
+        """
+        key = (index, anchored)
+        if key not in self.block_compiled:
+            pattern = self.expanded[index]
+            block_regex = None
+            if not RuleSet.LINE_ONLY_SYNTAX.search(pattern):
+                if anchored:
+                    # Global flags must stay at the beginning
+                    flags = RuleSet.GLOBAL_FLAGS.match(pattern)
+                    prefix = flags.group() if flags else ''
+                    pattern = f'{prefix}^(?:{pattern[len(prefix):]})'
+                try:
+                    block_regex = RegexLib.cache.compile(pattern, re.MULTILINE)
+                except re.error:
+                    block_regex = None
+            self.block_compiled[key] = block_regex
+
+        return self.block_compiled[key]
+
+    def match_lines(self, lines, line_numbers=None):
+        """
+        Batch version of match(): find out which regex matches each line of a block (see RegexLib.match_batch)
+        :param lines: list of lines
+        :param line_numbers: line number of each line, for degraded lines report
+        :return: list with, for each line, index of the regex matching it, None if no regex matches
+        """
+        first_rule = [None] * len(lines)
+        if not self.pattern:
+            return first_rule
+
+        # Leftmost match of any regex, first regex on a tie (same as joined regex)
+        first_hit = {}
+        for line_index, rule_index, spans in RegexLib.match_batch(lines, self, line_numbers=line_numbers):
+            hit = (spans[0][0], rule_index)
+            if line_index not in first_hit or hit < first_hit[line_index]:
+                first_hit[line_index] = hit
+
+        for line_index, (start, rule_index) in first_hit.items():
+            # Like match(), regex must have captured something
+            match = self.get_compiled(rule_index).match(lines[line_index], start, concurrent=RegexLib.concurrent)
+            if match and any(match.groups()):
+                first_rule[line_index] = rule_index
+
+        return first_rule
+
+
+class BlockItems(CompactModel):
     """
     Items that conform a block of useful collected data
     """
+    __slots__ = ('timestamp', 'line_number', 'reference', 'content', 'type')
+    FIELDS = __slots__
 
     def __init__(self):
         """
@@ -3616,17 +4793,23 @@ class BlockExtractor:
     """
     def __init__(self, file_mgm: FileManagement, config: Dict):
         self.file_path = file_mgm.filename
+        self.file_mgm = file_mgm
         self.config = config
         # self.collected_blocks: Dict[str, List[BlockItems]] = {}
         self.collected_blocks = {}
+        # Blocks state, kept between calls to extract() so a block can continue on data appended later (follow mode)
+        self.current_blocks: Dict[str, BlockItems] = {}
+        self.in_block: Dict[str, bool] = {}
+        self.line_check = 0
         self.log_line_start_regex = file_mgm.log_line_regex
 
-        # Parse and compile block patterns from config
+        # Block patterns from config, as rule sets so each batch of lines is matched at once (see
+        # RegexLib.match_batch)
         self.block_types = config.get("BLOCK_COLLECTION", {}).get("COLLECT", {})
-        self.compiled_patterns = {
+        self.block_rules = {
             block_name: {
-                "start": [re.compile(RegexLib.build_regex(p)) for p in block_def["START"]["EXPECT"]],
-                "end": [re.compile(RegexLib.build_regex(p)) for p in block_def.get("END", {}).get("EXPECT", [])]
+                "start": RuleSet.get(block_def["START"]["EXPECT"]),
+                "end": RuleSet.get(block_def.get("END", {}).get("EXPECT", []))
             }
             for block_name, block_def in self.block_types.items()
         }
@@ -3637,7 +4820,7 @@ class BlockExtractor:
             if "REFERENCE_ID" in self.block_types[each_type]:
                 rreference = []
                 for each_reference in self.block_types[each_type]['REFERENCE_ID']:
-                    rreference.append(re.compile(RegexLib.build_regex(each_reference)))
+                    rreference.append(RegexLib.use(RegexLib.build_regex(each_reference)))
 
                 self.references[each_type] = rreference
 
@@ -3646,24 +4829,47 @@ class BlockExtractor:
             return bool(self.log_line_start_regex.match(line))
         return line.startswith("[")
 
-    def extract(self):
+    def extract(self, start_offset=0, start_line=1, end_line=None):
         """
         Parses the file and extracts blocks based on the configured patterns.
+        :param start_offset: byte offset where to start; if it is not 0, blocks still open from previous call will be
+        continued (follow mode)
+        :param start_line: line number of the line at start_offset
+        :param end_line: last line to check, by default up to the end of the file
         """
         write_log("Analysis of blocks...")
-        current_blocks: Dict[str, BlockItems] = {}
-        in_block: Dict[str, bool] = {key: False for key in self.block_types}
-        line_check = 0 # check how many lines were taking in account after a block indentification...
+        if not start_offset:
+            self.current_blocks = {}
+            self.in_block = {key: False for key in self.block_types}
+            self.line_check = 0
+        current_blocks = self.current_blocks
+        in_block = self.in_block
+        line_check = self.line_check # check how many lines were taking in account after a block indentification...
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-
-                for line_number, line in enumerate(f, 1):
-                    for block_name, patterns in self.compiled_patterns.items():
-                        # Start match with access to match object
-
-                        for p in patterns["start"]:
-                            match = p.match(line)
-                            if match:
+            with self.file_mgm.open_text(start_offset) as f, RegexBudget.block_scope():
+                batch_lines = Configs.get_config_for('FILE_SETUP.SCAN_SETUP.CONCURRENT_REGEX.BATCH_LINES') or 1
+                first_line = start_line
+                while True:
+                    batch = list(itertools.islice(f, batch_lines))
+                    if end_line:
+                        batch = batch[:max(0, end_line - first_line + 1)]
+                    if not batch:
+                        break
+                    # Lines of this batch (line index) where each type of block starts or ends
+                    block_hits = {
+                        block_name: {
+                            edge: {line_index for line_index, _, _ in RegexLib.match_batch(
+                                batch, rule_set, anchored=True, separator='',
+                                line_numbers=range(first_line, first_line + len(batch)))}
+                            for edge, rule_set in rules.items()
+                        }
+                        for block_name, rules in self.block_rules.items()
+                    }
+                    for line_index, line in enumerate(batch):
+                        line_number = first_line + line_index
+                        for block_name in self.block_rules:
+                            # Start match
+                            if line_index in block_hits[block_name]["start"]:
                                 reference_key = self.references.get(block_name)
                                 blk = BlockItems()
                                 blk.line_number = line_number
@@ -3689,39 +4895,38 @@ class BlockExtractor:
 
                                 current_blocks[block_name] = blk
                                 in_block[block_name] = True
-                                break  # Stop checking further patterns for this line
 
-                        # End match (optional)
-                        if in_block.get(block_name) and patterns["end"]:
-                            if any(p.match(line) for p in patterns["end"]):
+                            # End match (optional)
+                            if in_block.get(block_name) and line_index in block_hits[block_name]["end"]:
                                 current_blocks[block_name].content.append(line)
                                 self._store_block(block_name, current_blocks[block_name])
                                 in_block[block_name] = False
                                 continue
 
-                        # Inside block logic
-                        if in_block.get(block_name):
-                            if not self._is_log_line_start(line):
-                                if line not in current_blocks[block_name].content:
-                                    current_blocks[block_name].content.append(line)
-                                continue
-                            else:
-                                # Force collection, actual block contents has not stacktrace, or any other
-                                # information, so get next line...
-                                if len(current_blocks[block_name].content) < 2 and line_check == 0:
-                                    line_check += 1
+                            # Inside block logic
+                            if in_block.get(block_name):
+                                if not self._is_log_line_start(line):
+                                    if line not in current_blocks[block_name].content:
+                                        current_blocks[block_name].content.append(line)
                                     continue
+                                else:
+                                    # Force collection, actual block contents has not stacktrace, or any other
+                                    # information, so get next line...
+                                    if len(current_blocks[block_name].content) < 2 and line_check == 0:
+                                        line_check += 1
+                                        continue
+
+                                    # Found a new log line while in a block: close current block first
+                                    self._store_block(block_name, current_blocks[block_name])
+                                    in_block[block_name] = False
+                                    line_check = 0
+                                    # Do NOT continue: this line may start another block
 
-                                # Found a new log line while in a block: close current block first
+                            # Implicit end of block
+                            if in_block.get(block_name):
                                 self._store_block(block_name, current_blocks[block_name])
                                 in_block[block_name] = False
-                                line_check = 0
-                                # Do NOT continue: this line may start another block
-
-                        # Implicit end of block
-                        if in_block.get(block_name):
-                            self._store_block(block_name, current_blocks[block_name])
-                            in_block[block_name] = False
+                    first_line += len(batch)
         except IOError as io:
             write_log(f'Sorry unable to open {self.file_path} due to: {io}')
             return
@@ -3729,6 +4934,7 @@ class BlockExtractor:
             write_log(f'Sorry unable to open {self.file_path} due to: {ue}')
             return
 
+        self.line_check = line_check
         # Store remaining open blocks
         for block_name, blk in current_blocks.items():
             if in_block.get(block_name) and blk.content:
@@ -3745,7 +4951,7 @@ class BlockExtractor:
         """
 
         for each_reference in self.references[block_type]:
-            match = each_reference.search(line)
+            match = each_reference.search(line, concurrent=RegexLib.concurrent)
             if match:
                 return match.group(1)
 
@@ -3769,6 +4975,10 @@ class BlockExtractor:
         if blk.reference not in self.collected_blocks[block_type]:
             self.collected_blocks[block_type][blk.reference] = []
 
+        if any(blk is each_block for each_block in self.collected_blocks[block_type][blk.reference]):
+            # Block was stored while still open (end of analysed data), and it has been continued afterward
+            return
+
         self.collected_blocks[block_type][blk.reference].append(blk)
 
 
@@ -3890,10 +5100,12 @@ class BlockExtractor:
 
         return return_content
 
-class Error:
+class Error(CompactModel):
     """
     A class that represents an error
     """
+    __slots__ = ('reference_id', 'timestamp', 'log_line', 'line_number', 'type', 'category', 'level')
+    FIELDS = __slots__
 
     def __init__(self):
         """
@@ -3978,7 +5190,7 @@ class KnownErrors:
                 known_error.type = each_error
                 known_error.compiled_rgx = []
                 for each_regex in cls.configs.get_config_for(f'WATCH_FOR.{each_category}.{each_error}.error_strings'):
-                    compiled = re.compile(each_regex)
+                    compiled = RegexLib.use(each_regex)
                     known_error.compiled_rgx.append(compiled)
 
                 known_error.alert_type = cls.configs.get_config_for(f'WATCH_FOR.{each_category}.{each_error}.alert_types')
@@ -3999,6 +5211,147 @@ class KnownErrors:
 
         KnownErrors.errors[self.category][self.type] = self
 
+class LineContext:
+    """
+    Data about a log line shared by all collectors processing it (see FileManagement.process_block); each item is
+    only calculated the first time it is requested, so the log header is parsed once per line and the literal
+    prefilter is checked once per line.
+    """
+
+    def __init__(self, file: FileManagement, line, line_no=None, candidates=None, header_parsers=None, offset=None):
+        """
+        :param file: FileManagement being processed
+        :param line: log line
+        :param line_no: line number
+        :param candidates: prefilter candidates for this line when already known (see
+        LiteralPrefilter.candidates_batch)
+        :param header_parsers: header parsers for log formats of its block (see FileManagement.get_header_parsers),
+        by default all formats found on the file
+        :param offset: byte offset of the line on the file (global offset for a log set)
+        """
+        self.file = file
+        self.line = line
+        self.line_no = line_no
+        self.offset = offset
+        self.header_parsers = header_parsers
+        # Parser of the log format this line matched, and span of each log line header field (see
+        # HeaderParser.parse)
+        self.header_parser = None
+        self.header_spans = None
+        self.header_parsed = False
+        self.candidates = candidates
+        # Reference ids on this line [(id, type), ...], when they were found for its whole batch (see
+        # GetRefIds.prepare_batch)
+        self.ref_ids = None
+        # Rules matching this line, when they were matched for its whole batch (see RegexLib.match_batch), by
+        # LiteralPrefilter.Family
+        self.batch_hits = {}
+
+    def get_header_parsers(self):
+        """
+        :return: header parsers that could apply to this line, to be tried in order
+        """
+        if self.header_parsers is None:
+            self.header_parsers = self.file.get_header_parsers() if self.file else []
+
+        return self.header_parsers
+
+    def get_header_parser(self):
+        """
+        :return: HeaderParser of the log format this line matched (first candidate when line has no header), None
+        if log format is unknown
+        """
+        self.get_header_spans()
+        if self.header_parser is None and self.get_header_parsers():
+            return self.header_parsers[0]
+
+        return self.header_parser
+
+    def get_header_spans(self):
+        """
+        Parse log line header using log formats of its block (VERSION.IDENTITY_FORMAT), first one matching is used
+        :return: parsed header, with span of each field (see HeaderParser.parse), None if line doesn't
+        match log format
+        """
+        if not self.header_parsed:
+            for header_parser in self.get_header_parsers():
+                self.header_spans = header_parser.parse(self.line, concurrent=RegexLib.concurrent)
+                if self.header_spans is not None:
+                    self.header_parser = header_parser
+                    break
+            self.header_parsed = True
+
+        return self.header_spans
+
+    def get_header(self):
+        """
+        Parse log line header using log format of the file (VERSION.IDENTITY_FORMAT)
+        :return: groups matched (as given by match.groups()), None if line doesn't match log format
+        """
+        header_spans = self.get_header_spans()
+        if header_spans is None:
+            return None
+
+        return self.header_parser.get_groups(self.line, header_spans)
+
+    def get_field(self, field):
+        """
+        Return a field from log line header
+        :param field: field name, as defined at VERSION.IDENTITY_FORMAT.<format>.FIELDS (like timestamp)
+        :return: field value, None if line has no header or field is not defined
+        """
+        header_spans = self.get_header_spans()
+        if header_spans is None:
+            return None
+
+        return self.header_parser.get(self.line, header_spans, field)
+
+    @staticmethod
+    def parse_headers(contexts):
+        """
+        Parse log line headers of a block of lines at once (see HeaderParser.parse_block); lines already parsed
+        are kept. When several log formats apply, lines not matching first format are parsed with next one, and so on
+        :param contexts: list of LineContext, all of them from same block
+        :return: None
+        """
+        pending = [context for context in contexts if not context.header_parsed]
+        for header_parser in pending[0].get_header_parsers() if pending else []:
+            headers = header_parser.parse_block([context.line for context in pending],
+                                                concurrent=RegexLib.concurrent)
+            remaining = []
+            for context, header_spans in zip(pending, headers):
+                if header_spans is None:
+                    remaining.append(context)
+                else:
+                    context.header_parser = header_parser
+                    context.header_spans = header_spans
+            pending = remaining
+            if not pending:
+                break
+
+        for context in contexts:
+            context.header_parsed = True
+
+    def applies(self, family, key=None):
+        """
+        Check with literal prefilter if a rule could match this line (see Configs.applies)
+        :param family: LiteralPrefilter.Family
+        :param key: rule identifier, by default any rule of the family
+        :return: False only if no rule can match this line
+        """
+        if not Configs.prefilter:
+            return True
+
+        if self.candidates is None:
+            self.candidates = Configs.prefilter.candidates(self.line)
+
+        family_candidates = self.candidates.get(family)
+        if not family_candidates:
+            return False
+
+        return key is None or key in family_candidates
+
+
 class LogAnalysis:
     """
     A class that analyse log to search for known errors
@@ -4016,46 +5369,52 @@ class LogAnalysis:
         self.category_list = {}
 
 
-    def parse(self, line, current_line):
+    def parse(self, line, current_line, context=None):
         """
         Parsing line searching for known errors
         :param line: log line to parse
+        :param context: LineContext shared with other collectors for this line
         :return:
         """
         found_errors = []
+        if context is None:
+            context = LineContext(self.file, line, current_line)
+        if not context.applies(LiteralPrefilter.Family.WATCH_FOR):
+            return found_errors
+        # Errors already matched for whole batch (see prepare_batch)
+        batch_hits = context.batch_hits.get(LiteralPrefilter.Family.WATCH_FOR)
+
         for each_category in KnownErrors.get_categories():
             for each_error in KnownErrors.get(category=each_category):
-                for rgx in KnownErrors.get(each_category,each_error).compiled_rgx:
+                if not context.applies(LiteralPrefilter.Family.WATCH_FOR, (each_category, each_error)):
+                    continue
+                for rgx_index, rgx in enumerate(KnownErrors.get(each_category,each_error).compiled_rgx):
 
-                    match = rgx.findall(line)
+                    if batch_hits is not None:
+                        match = (each_category, each_error, rgx_index) in batch_hits
+                    else:
+                        match = rgx.findall(line, concurrent=RegexLib.concurrent)
                     if match:
                         ignore_messages = KnownErrors.get(each_category,each_error).ignore_messages_with
                         if ignore_messages:
                             ignore_regex = "|".join(ignore_messages)
                             rgx_ign = RegexLib.use(ignore_regex)
-                            if rgx_ign.search(line):
+                            if rgx_ign.search(line, concurrent=RegexLib.concurrent):
                                 # need to ignore this line because is an exception
                                 continue
-                        scan_chk = None
-                        try:
-                            scan_line = re.compile(RegexLib.build_regex_with_groupnames(self.file.log_line_regex.pattern,
-                                                                                        self.file.log_line_fields,
-                                                                                        self.file.logfile_format))
-                            scan_chk = scan_line.search(line)
-                        except ValueError as ve:
-                            write_log(f"Error in regex: {ve}")
                         error = Error()
                         error.category = each_category
                         error.type = each_error
                         error.log_line = line
                         error.reference_id = current_line
                         error.line_number = current_line
-                        if scan_chk:
-                           error.timestamp = scan_chk.group("timestamp")
-                           error.level = scan_chk.group("error_level").strip()
-                        else:
+                        error.timestamp = context.get_field("timestamp")
+                        error.level = context.get_field("error_level")
+                        if error.timestamp is None or error.level is None:
                             error.timestamp = None
                             error.level = None
+                        else:
+                            error.level = error.level.strip()
 
                         if each_category not in self.category_list:
                             self.category_list[each_category] = 1
@@ -4070,6 +5429,31 @@ class LogAnalysis:
 
         return found_errors
 
+    def prepare_batch(self, contexts):
+        """
+        Match known errors against a whole batch of lines (see RegexLib.match_batch), each error is only matched
+        against lines the literal prefilter allows; errors found are kept on each line context to be used by parse
+        :param contexts: list of LineContext
+        :return: None
+        """
+        for context in contexts:
+            context.batch_hits[LiteralPrefilter.Family.WATCH_FOR] = set()
+
+        for each_category in KnownErrors.get_categories():
+            for each_error in KnownErrors.get(category=each_category):
+                error_strings = Configs.get_config_for(f'WATCH_FOR.{each_category}.{each_error}.error_strings')
+                selected = [context for context in contexts
+                            if context.applies(LiteralPrefilter.Family.WATCH_FOR, (each_category, each_error))]
+                if not error_strings or not selected:
+                    continue
+
+                for line_index, rgx_index, _ in RegexLib.match_batch([context.line for context in selected],
+                                                                     RuleSet.get(error_strings),
+                                                                     line_numbers=[context.line_no
+                                                                                   for context in selected]):
+                    selected[line_index].batch_hits[LiteralPrefilter.Family.WATCH_FOR].add(
+                        (each_category, each_error, rgx_index))
+
 class TimeoutError(Exception):
     """Excepción personalizada para el timeout."""
     pass
@@ -4115,10 +5499,11 @@ def convert_into_dict(obj):
         return [convert_into_dict(x) for x in obj]
 
     # Aquí aplicamos tu filtro para objetos personalizados
-    if hasattr(obj, "__dict__"):
+    fields = get_fields(obj)
+    if fields is not None:
         return {
             k: convert_into_dict(v)
-            for k, v in vars(obj).items()
+            for k, v in fields.items()
             if not callable(v) and not k.startswith('_')
         }
     return str(obj) # Último recurso
@@ -4188,66 +5573,42 @@ def clear_groupnames(regex_list):
 
     return CordaObject.get_clear_group_list(regex_list)
 
-def saving_tracing_ref_data(data, log_file):
-    """
-    Will save actual collected reference data to be able to load it quickly
-    :param data:
-    :return:
-    """
-
-    logdir = os.path.dirname(log_file)
-    filename = os.path.basename(log_file)
-
-    tracer_cache = f'{logdir}/cache'
-
-    if not os.path.exists(tracer_cache):
-        os.mkdir(tracer_cache)
-    try:
-        with open(f"{tracer_cache}/{filename}_references.json", 'w') as fh_references:
-            json.dump(data, fh_references, indent=4)
-    except IOError as io:
-        write_log(f'Unable to create cache file {tracer_cache}/references.json due to: {io}')
-
-    return
-
 def get_log_format(line, file: FileManagement):
     """
     Will return log format found on the file
-    :param line: log line to check
-    :param recheck: if log_fileformat has been defined already, do not check again return previous
+    :param line: log line to check, when file format is not known yet
+    :param file: FileManagement
     :return:
     """
     if file.logfile_format:
         return file.logfile_format
 
-    file.logfile_format = None
-    check_versions = Configs.get_config(section="VERSION")
-    for each_version in check_versions:
-        check_format = re.search(check_versions[each_version]["EXPECT"], line)
-        if check_format:
-            file.logfile_format = each_version
-            file.log_line_regex = re.compile(check_versions[each_version]["EXPECT"])
+    for each_version in Configs.get_config_for("VERSION.IDENTITY_FORMAT") or {}:
+        header_parser = file.get_header_parser(each_version)
+        if header_parser and header_parser.parse(line):
+            file.set_file_format(each_version)
+            file.log_line_regex = header_parser.regex
             break
 
     return file.logfile_format
 
-def get_fields_from_log(line, log_version, file):
+def get_fields_from_log(line, log_version, file, context=None):
     """
     Will extract fields results from given log_version on given line
     :param line: Line to extract information from
     :param log_version: Version of log format to extract information
+    :param context: LineContext for this line, header already parsed by other collectors will be reused
     :return: A dictionary with fields and values
     """
 
     result = {}
 
-    if Configs.get_config("DETECT_LOG_VERSION_EACH_LINE"):
-        # it will re-check file format for each line regardless what version has been asked to check
-        file.logfile_format = get_log_format(line, recheck=True)
+    # DETECT_LOG_VERSION_EACH_LINE: log format of each line is taken from formats found on the file, see
+    # FileManagement.get_header_parsers
 
     # if not format has been found by default, and it has been explicitly set, will use that
     if log_version and not file.logfile_format:
-        file.logfile_format = log_version
+        file.set_file_format(log_version)
 
     # if there not format at all, stop process
     if not file.logfile_format:
@@ -4255,24 +5616,25 @@ def get_fields_from_log(line, log_version, file):
         write_log("I was unable to find a version template for this file, please create one under VERSION->IDENTITY_FORMAT", level="ERROR")
         return None
 
-    extract_fields = Configs.get_config_for(f"VERSION.IDENTITY_FORMAT.{file.logfile_format}")
+    if context is None:
+        context = LineContext(file, line)
+    header_parser = context.get_header_parser()
 
-    if not extract_fields:
+    if not header_parser:
         write_log("No logfile definitions to check please define at least one (at the section 'VERSION')", level="ERROR")
         return None
 
-    fields = re.search(extract_fields["EXPECT"], line)
-    if not fields:
+    header_spans = context.get_header_spans()
+    if not header_spans:
         write_log(f"I was not able to extract any fields from line:\n{line}", level="WARN")
         write_log(f"Possible error or incomplete EXPECT for {file.logfile_format}", level="WARN")
         return None
 
-    if fields:
-        if len(fields.groups()) == len(extract_fields["FIELDS"]):
-            for each_field in extract_fields["FIELDS"]:
-                result[each_field] = fields.group(extract_fields["FIELDS"].index(each_field) + 1)
-        else:
-            write_log("Unable to parse log file properly using %s, expecting %s fields got %s fields from extraction" %
-                  (file.logfile_format, len(extract_fields["FIELDS"]), len(fields.groups())), level="WARN")
+    if header_parser.valid:
+        for each_field in header_parser.fields:
+            result[each_field] = header_parser.get(context.line, header_spans, each_field)
+    else:
+        write_log("Unable to parse log file properly using %s, expecting %s fields got %s fields from extraction" %
+              (header_parser.log_format, len(header_parser.fields), len(header_spans[1])), level="WARN")
 
     return result
\ No newline at end of file
@@ -0,0 +1,38 @@
+# party_registry.py
+
+
+class PartyRegistry(list):
+    """
+    List of parties (x500 names) found so far, indexed by their fingerprint (see Party.get_x500_fingerprint): a name
+    is the same party as another one when both have same attributes, in any order; so finding the parties a name
+    belongs to is a dictionary lookup, regardless of how many parties are on the list.
+    """
+
+    def __init__(self, parties=()):
+        super().__init__()
+        # {fingerprint: list of parties}
+        self.by_fingerprint = {}
+        self.extend(parties)
+
+    def append(self, party):
+        super().append(party)
+        self.by_fingerprint.setdefault(party.get_fingerprint(), []).append(party)
+
+    def extend(self, parties):
+        for each_party in parties:
+            self.append(each_party)
+
+    def remove(self, party):
+        super().remove(party)
+        self.by_fingerprint[party.get_fingerprint()].remove(party)
+
+    def clear(self):
+        super().clear()
+        self.by_fingerprint = {}
+
+    def get_parties(self, fingerprint):
+        """
+        :param fingerprint: x500 name fingerprint
+        :return: list of parties with given fingerprint, empty if there's none
+        """
+        return self.by_fingerprint.get(fingerprint, [])
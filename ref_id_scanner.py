@@ -0,0 +1,189 @@
+# ref_id_scanner.py
+import bisect
+import re as sre
+
+from object_class import RegexLib
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+class RefIdScanner:
+    """
+    Scanner for reference ids (CORDA_OBJECTS definitions like flow ids or transaction ids), compiled once: each
+    pattern is kept as a rule that knows its object type, so a match gives its type directly.
+    Most patterns start with a fixed text just before the id (like 'tx_id=' or 'flow-id='); when all of them do, that
+    text (anchor) is searched with plain string search and each rule is only tried where its anchor was found, instead
+    of trying all patterns on every position of every line. Result is the same as a search with all patterns joined
+    (leftmost match first, patterns in order of definition, no overlapping matches); if any pattern has no anchor the
+    joined pattern is used instead.
+    """
+
+    # Shortest text accepted as anchor
+    MIN_ANCHOR_LENGTH = 3
+
+    class Rule:
+        """
+        A pattern from CORDA_OBJECTS and the object type it identifies
+        """
+
+        def __init__(self, object_type, pattern):
+            """
+            :param object_type: object type (like FLOW or TRANSACTION)
+            :param pattern: regex with its macro variables already expanded
+            """
+            self.type = object_type
+            self.pattern = pattern
+            self.regex = RegexLib.use(pattern)
+            # Anchor: text that every match has at a fixed offset from its start
+            self.anchor_offset, self.anchor = RefIdScanner.get_anchor(pattern) or (None, None)
+
+    def __init__(self, corda_objects):
+        """
+        :param corda_objects: CORDA_OBJECTS definitions, {object type: {'EXPECT': [regex, ...]}}
+        """
+        self.rules = []
+        for each_type, definition in corda_objects.items():
+            for each_regex in definition.get('EXPECT', []):
+                self.rules.append(RefIdScanner.Rule(each_type,
+                                                    RegexLib.build_regex(each_regex, nogroup_name=True)))
+
+        # Rules to try for each anchor found: {anchor: [(rule index, anchor offset), ...]}
+        self.anchors = {}
+        for rule_index, rule in enumerate(self.rules):
+            if rule.anchor:
+                self.anchors.setdefault(rule.anchor, []).append((rule_index, rule.anchor_offset))
+        self.anchored = bool(self.rules) and all(rule.anchor for rule in self.rules)
+
+        # Joined pattern, and rule for each one of its groups
+        self.joined = None
+        self.group_rule = []
+        if self.rules and not self.anchored:
+            self.joined = RegexLib.use('|'.join(rule.pattern for rule in self.rules))
+            for rule in self.rules:
+                self.group_rule.extend([rule] * rule.regex.groups)
+
+    @staticmethod
+    def get_anchor(pattern, min_length=MIN_ANCHOR_LENGTH):
+        """
+        Find a fixed text that any match of given pattern has at a fixed offset from its start; only single
+        character items (like '.' or '[Ff]') can be before it
+        :param pattern: regex
+        :param min_length: shortest text accepted
+        :return: tuple (offset, text), None if pattern has no anchor (or it can't be parsed)
+        """
+        try:
+            parsed = sre_parse.parse(pattern)
+        except (sre.error, ValueError, TypeError, OverflowError, RecursionError):
+            # Probably a pattern using syntax only supported by 'regex' module
+            return None
+
+        if parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE:
+            return None
+
+        offset = 0
+        run = []
+        for op, av in parsed:
+            if op is sre_constants.LITERAL:
+                run.append(chr(av))
+                continue
+            if len(run) >= min_length:
+                return offset, ''.join(run)
+            offset += len(run)
+            run = []
+            if op in (sre_constants.ANY, sre_constants.IN, sre_constants.NOT_LITERAL):
+                offset += 1
+            elif op is not sre_constants.AT:
+                # Variable width (or not a single character) item
+                return None
+
+        if len(run) >= min_length:
+            return offset, ''.join(run)
+
+        return None
+
+    def scan(self, line):
+        """
+        Find all reference ids on a line
+        :param line: log line
+        :return: list of tuples (id, type), in the order they were found
+        """
+        return [(ref_id, object_type) for _, object_type, ref_id in self.scan_batch([line])]
+
+    def scan_batch(self, lines, first_line=1):
+        """
+        Find all reference ids on a batch of lines; anchors are searched once over the whole batch
+        :param lines: list of lines (without line terminator)
+        :param first_line: line number of first line
+        :return: list of tuples (line number, type, id), in line order and in the order they were found on each line
+        """
+        if not self.anchored:
+            return self._scan_joined(lines, first_line)
+
+        text = '\n'.join(lines)
+        line_starts = []
+        offset = 0
+        for each_line in lines:
+            line_starts.append(offset)
+            offset += len(each_line) + 1
+
+        # Positions where a rule could match: (start, rule index)
+        candidates = []
+        for anchor, anchor_rules in self.anchors.items():
+            position = text.find(anchor)
+            while position != -1:
+                for rule_index, anchor_offset in anchor_rules:
+                    candidates.append((position - anchor_offset, rule_index, position))
+                position = text.find(anchor, position + 1)
+        candidates.sort()
+
+        hits = []
+        line_index = -1
+        # Position where next match can start, within current line
+        next_start = 0
+        for start, rule_index, anchor_position in candidates:
+            index = bisect.bisect_right(line_starts, anchor_position) - 1
+            start -= line_starts[index]
+            if start < 0:
+                # Rule would need text before line start
+                continue
+            if index != line_index:
+                line_index = index
+                next_start = 0
+            if start < next_start:
+                continue
+
+            rule = self.rules[rule_index]
+            match = rule.regex.match(lines[index], start, concurrent=RegexLib.concurrent)
+            if not match:
+                continue
+
+            next_start = match.end() if match.end() > start else start + 1
+            for each_group in match.groups():
+                if each_group:
+                    hits.append((first_line + index, rule.type, each_group))
+
+        return hits
+
+    def _scan_joined(self, lines, first_line):
+        """
+        Find all reference ids using joined pattern, line by line
+        :param lines: list of lines
+        :param first_line: line number of first line
+        :return: see scan_batch
+        """
+        hits = []
+        if not self.joined:
+            return hits
+
+        for index, each_line in enumerate(lines):
+            for match in self.joined.finditer(each_line, concurrent=RegexLib.concurrent):
+                for group_index, each_group in enumerate(match.groups()):
+                    if each_group:
+                        hits.append((first_line + index, self.group_rule[group_index].type, each_group))
+
+        return hits
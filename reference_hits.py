@@ -0,0 +1,177 @@
+# reference_hits.py
+import bisect
+import threading
+from array import array
+from collections.abc import MutableMapping
+
+
+class ReferenceHits(MutableMapping):
+    """
+    Lines where a reference was found, as a mapping {line number: line}. Instead of keeping a copy of each line,
+    hits are kept on columns: line numbers (array 'I') and byte offset of each line on the log (array 'q'); line
+    text is read back from the log (see FileManagement.read_lines_at) only when it is requested, like when a trace is
+    built or results are exported. Lines given without offset (or without a log to read them from) keep their text.
+    Line numbers are kept sorted, so hits are given in line order.
+    Blocks scanned on different threads can add hits to the same reference, so both columns are changed (and read)
+    together holding a lock.
+    """
+
+    __slots__ = ('source', 'line_numbers', 'offsets', 'texts', 'lock')
+
+    # Offset of a line given only by its text
+    NO_OFFSET = -1
+
+    def __init__(self, source=None):
+        """
+        :param source: log where lines are read from, any object with a read_lines_at(offsets) method
+        (FileManagement)
+        """
+        self.source = source
+        self.line_numbers = array('I')
+        self.offsets = array('q')
+        # {line number: line} for lines without offset, created when first one is added
+        self.texts = None
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Lock can't be pickled (hits are sent back by worker processes)
+        return self.source, self.line_numbers, self.offsets, self.texts
+
+    def __setstate__(self, state):
+        self.source, self.line_numbers, self.offsets, self.texts = state
+        self.lock = threading.Lock()
+
+    def _find(self, line_no):
+        """
+        Lock must be held by caller
+        :return: position of given line number, None if it is not on hits
+        """
+        position = bisect.bisect_left(self.line_numbers, line_no)
+        if position < len(self.line_numbers) and self.line_numbers[position] == line_no:
+            return position
+
+        return None
+
+    def add(self, line_no, line=None, offset=None, source=None):
+        """
+        Add a line where reference was found
+        :param line_no: line number
+        :param line: line text, only kept when line can't be read back from the log
+        :param offset: byte offset of the line on the log
+        :param source: log where line can be read from (see __init__), if hits have none yet
+        :return: None
+        """
+        with self.lock:
+            if self.source is None:
+                self.source = source
+            if offset is None or self.source is None:
+                offset = ReferenceHits.NO_OFFSET
+                if self.texts is None:
+                    self.texts = {}
+                self.texts[line_no] = line
+            elif self.texts:
+                self.texts.pop(line_no, None)
+
+            position = bisect.bisect_left(self.line_numbers, line_no)
+            if position < len(self.line_numbers) and self.line_numbers[position] == line_no:
+                self.offsets[position] = offset
+                return
+
+            # Lines are normally found in order, so this is an append most of the time
+            self.line_numbers.insert(position, line_no)
+            self.offsets.insert(position, offset)
+
+    def __setitem__(self, line_no, line):
+        self.add(line_no, line)
+
+    def __getitem__(self, line_no):
+        with self.lock:
+            position = self._find(line_no)
+            if position is None:
+                raise KeyError(line_no)
+            hits = self._get_hits([position])
+
+        return self._read(*hits)[0]
+
+    def __delitem__(self, line_no):
+        with self.lock:
+            position = self._find(line_no)
+            if position is None:
+                raise KeyError(line_no)
+
+            del self.line_numbers[position]
+            del self.offsets[position]
+            if self.texts:
+                self.texts.pop(line_no, None)
+
+    def __contains__(self, line_no):
+        with self.lock:
+            return self._find(line_no) is not None
+
+    def __iter__(self):
+        with self.lock:
+            return iter(self.line_numbers.tolist())
+
+    def __len__(self):
+        return len(self.line_numbers)
+
+    def _get_hits(self, positions=None):
+        """
+        Take line numbers, offsets and texts of hits at given positions; lock must be held by caller
+        :param positions: list of positions, all hits if not given
+        :return: tuple (line numbers, offsets, texts)
+        """
+        texts = dict(self.texts) if self.texts else {}
+        if positions is None:
+            return self.line_numbers.tolist(), self.offsets.tolist(), texts
+
+        return ([self.line_numbers[each_position] for each_position in positions],
+                [self.offsets[each_position] for each_position in positions], texts)
+
+    def _read(self, line_numbers, offsets, texts):
+        """
+        Read lines of given hits (see _get_hits), all lines kept by offset are read at once; log is read without
+        holding the lock
+        :param line_numbers: line number of each hit
+        :param offsets: offset of each hit
+        :param texts: {line number: line} for lines without offset
+        :return: list of lines
+        """
+        lines = [texts.get(each_line_no) for each_line_no in line_numbers]
+        pending = [index for index, each_offset in enumerate(offsets) if each_offset != ReferenceHits.NO_OFFSET]
+        if pending:
+            read = self.source.read_lines_at([offsets[index] for index in pending])
+            for index, line in zip(pending, read):
+                lines[index] = line
+
+        return lines
+
+    def items(self):
+        """
+        :return: list of (line number, line), all lines are read at once
+        """
+        with self.lock:
+            hits = self._get_hits()
+
+        return list(zip(hits[0], self._read(*hits)))
+
+    def values(self):
+        """
+        :return: list of lines, all lines are read at once
+        """
+        with self.lock:
+            hits = self._get_hits()
+
+        return self._read(*hits)
+
+    def get_size(self):
+        """
+        :return: memory used by hits (bytes), lines kept by text included
+        """
+        with self.lock:
+            return (self.line_numbers.itemsize * len(self.line_numbers) +
+                    self.offsets.itemsize * len(self.offsets) +
+                    sum(len(each_line or '') for each_line in (self.texts or {}).values()))
+
+    def __repr__(self):
+        return f'ReferenceHits({len(self)} lines, {len(self.texts or {})} kept as text)'
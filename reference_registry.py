@@ -0,0 +1,119 @@
+# reference_registry.py
+import threading
+from collections import OrderedDict
+
+
+class ReferenceRegistry:
+    """
+    Registry of all reference ids found so far (flows, transactions, etc): each id is kept on a dictionary with its
+    type and its object, so checking if an id is known, or getting its object or type, doesn't depend on the number
+    of ids registered. Objects are also kept by type (see by_type), in order of registration. Writers are serialised
+    by a lock; an object can be created and registered in a single step (see get_or_add), so threads finding the
+    same new id at once get the same object.
+    """
+
+    class Entry:
+        """
+        A reference id, its type and its object
+        """
+
+        __slots__ = ('ref_id', 'type', 'object')
+
+        def __init__(self, ref_id, ref_type, ref_object):
+            self.ref_id = ref_id
+            self.type = ref_type
+            self.object = ref_object
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # {reference id: Entry}
+        self.entries = {}
+        # {type: {reference id: object}}
+        self.by_type = {}
+
+    def __contains__(self, ref_id):
+        return ref_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, ref_id, ref_type, ref_object):
+        """
+        Register an object, lock must be held
+        :return: object registered for this id (a previous one if id was already registered)
+        """
+        type_objects = self.by_type.get(ref_type)
+        if type_objects is None:
+            type_objects = self.by_type[ref_type] = OrderedDict()
+        if ref_id not in type_objects:
+            type_objects[ref_id] = ref_object
+
+        entry = self.entries.get(ref_id)
+        if entry is None:
+            entry = self.entries[ref_id] = ReferenceRegistry.Entry(ref_id, ref_type, ref_object)
+
+        return entry.object
+
+    def add(self, ref_id, ref_type, ref_object):
+        """
+        Register an object; an id keeps its first object and type
+        :param ref_id: reference id
+        :param ref_type: type of reference (like 'flow')
+        :param ref_object: object for this reference (CordaObject)
+        :return: object registered for this id (a previous one if id was already registered)
+        """
+        with self.lock:
+            return self._add(ref_id, ref_type, ref_object)
+
+    def get_or_add(self, ref_id, ref_type, create):
+        """
+        Return object registered for an id, creating and registering it if id is not known yet
+        :param ref_id: reference id
+        :param ref_type: type of reference (like 'flow')
+        :param create: function returning a new object for this id, only called if id is not known
+        :return: tuple (object registered for this id, True if it was created by this call)
+        """
+        entry = self.entries.get(ref_id)
+        if entry is not None:
+            return entry.object, False
+
+        with self.lock:
+            entry = self.entries.get(ref_id)
+            if entry is not None:
+                return entry.object, False
+
+            return self._add(ref_id, ref_type, create()), True
+
+    def get_object(self, ref_id):
+        """
+        :param ref_id: reference id
+        :return: object registered for this id, None if it is not known
+        """
+        entry = self.entries.get(ref_id)
+
+        return entry.object if entry else None
+
+    def get_type(self, ref_id):
+        """
+        :param ref_id: reference id
+        :return: type of this id, None if it is not known
+        """
+        entry = self.entries.get(ref_id)
+
+        return entry.type if entry else None
+
+    def get_ids(self):
+        """
+        :return: list of all reference ids, in order of registration
+        """
+        with self.lock:
+            return list(self.entries)
+
+    def clear(self):
+        """
+        Remove all references
+        :return: None
+        """
+        with self.lock:
+            self.entries = {}
+            self.by_type = {}
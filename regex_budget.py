@@ -0,0 +1,253 @@
+# regex_budget.py
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum
+
+from log_handler import write_log
+
+
+class RegexBudget:
+    """
+    Time budget for regex matching (see FILE_SETUP.SCAN_SETUP.REGEX_BUDGET): each line has a max time to be matched,
+    and each block (of lines scanned by a worker) has a max total time spent matching. When a line runs out of its
+    budget (or its block did, or it is too long to be fully scanned), it is matched again on a cheaper way: only small
+    windows of the line are scanned, around literal texts the regex needs (and at line start); so a pathological line
+    can't stall a worker, and it is not silently dropped either: it is recorded on the degraded lines report.
+    """
+
+    class Reason(Enum):
+        """
+        Why a line was matched in degraded mode
+        """
+        LINE_TIMEOUT = 'line timeout'
+        BLOCK_BUDGET = 'block budget exhausted'
+        LINE_SIZE = 'line too long'
+
+    # Max time (seconds) for each line, and for all lines of a block; None means no limit
+    line_timeout = 1.0
+    block_budget = 120.0
+    # Size of windows scanned in degraded mode (chars at each side of a literal), and max windows for a line
+    window_size = 2048
+    max_windows = 32
+    # Max number of lines kept on report
+    max_report = 1000
+
+    lock = threading.Lock()
+    # Lines matched in degraded mode, and total count (report is bounded by max_report)
+    degraded = []
+    degraded_count = 0
+    # Remaining budget of block being scanned by each thread
+    block = threading.local()
+
+    @staticmethod
+    def setup(config):
+        """
+        Load budget settings
+        :param config: FILE_SETUP.SCAN_SETUP.REGEX_BUDGET settings
+        :return: None
+        """
+        config = config or {}
+        RegexBudget.line_timeout = config['LINE_MS'] / 1000 if config.get('LINE_MS') else None
+        RegexBudget.block_budget = config['BLOCK_MS'] / 1000 if config.get('BLOCK_MS') else None
+        RegexBudget.window_size = config.get('WINDOW_SIZE', RegexBudget.window_size)
+        RegexBudget.max_windows = config.get('MAX_WINDOWS', RegexBudget.max_windows)
+        RegexBudget.max_report = config.get('MAX_REPORT', RegexBudget.max_report)
+
+    @staticmethod
+    @contextmanager
+    def block_scope():
+        """
+        Scan a block on current thread, with a full block budget; previous budget (if any) is restored after it
+        """
+        previous = getattr(RegexBudget.block, 'remaining', None)
+        RegexBudget.block.remaining = RegexBudget.block_budget
+        try:
+            yield
+        finally:
+            RegexBudget.block.remaining = previous
+
+    @staticmethod
+    def get_timeout():
+        """
+        :return: max time (seconds) for next match on current thread; 0 if block budget is exhausted, None if
+        there's no limit
+        """
+        remaining = getattr(RegexBudget.block, 'remaining', None)
+        if remaining is None:
+            return RegexBudget.line_timeout
+        if remaining <= 0:
+            return 0
+        if RegexBudget.line_timeout is None:
+            return remaining
+
+        return min(RegexBudget.line_timeout, remaining)
+
+    @staticmethod
+    def spend(elapsed):
+        """
+        Charge time spent matching to block being scanned by current thread
+        :param elapsed: seconds
+        :return: None
+        """
+        remaining = getattr(RegexBudget.block, 'remaining', None)
+        if remaining is not None:
+            RegexBudget.block.remaining = remaining - elapsed
+
+    @staticmethod
+    def run(method, pattern, line, literals=None, line_no=None, source=None, timeout=None, max_line_size=None,
+            **kwargs):
+        """
+        Match a line within budget
+        :param method: 'search', 'match' or 'finditer'
+        :param pattern: compiled regex ('regex' module)
+        :param line: line to match
+        :param literals: literal texts any match needs (see LiteralPrefilter.required_literals), they tell where to
+        look in degraded mode
+        :param line_no: line number, for report
+        :param source: what was being matched (like the regex), for report
+        :param timeout: max time (seconds) for this line, instead of line budget
+        :param max_line_size: longer lines are matched directly in degraded mode
+        :param kwargs: other arguments for regex method (like concurrent)
+        :return: a match (None if there's no match) for 'search' and 'match', a list of matches for 'finditer'
+        """
+        reason = None
+        if max_line_size and len(line) > max_line_size:
+            reason = RegexBudget.Reason.LINE_SIZE
+        else:
+            line_timeout = timeout or RegexBudget.get_timeout()
+            if line_timeout == 0:
+                reason = RegexBudget.Reason.BLOCK_BUDGET
+            else:
+                start = time.perf_counter()
+                try:
+                    if line_timeout:
+                        kwargs['timeout'] = line_timeout
+                    result = getattr(pattern, method)(line, **kwargs)
+                    return list(result) if method == 'finditer' else result
+                except TimeoutError:
+                    reason = RegexBudget.Reason.LINE_TIMEOUT
+                finally:
+                    RegexBudget.spend(time.perf_counter() - start)
+
+        return RegexBudget.run_degraded(method, pattern, line, literals, line_no, source, reason, **kwargs)
+
+    @staticmethod
+    def get_windows(line, literals=None):
+        """
+        Windows of a line scanned in degraded mode: line start, and around each literal found
+        :param line: line
+        :param literals: literal texts to look for
+        :return: list of (start, end), sorted and not overlapping
+        """
+        size = RegexBudget.window_size
+        windows = [(0, min(len(line), size))]
+        for each_literal in literals or []:
+            position = line.find(each_literal)
+            while position != -1 and len(windows) < RegexBudget.max_windows:
+                windows.append((max(0, position - size), min(len(line), position + len(each_literal) + size)))
+                position = line.find(each_literal, position + len(each_literal) + size)
+
+        merged = []
+        for start, end in sorted(windows):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        return merged
+
+    @staticmethod
+    def run_degraded(method, pattern, line, literals, line_no, source, reason, **kwargs):
+        """
+        Match only windows of a line (see get_windows), each one of them with line budget; line is recorded on
+        degraded lines report
+        :return: see run
+        """
+        kwargs.pop('timeout', None)
+        if RegexBudget.line_timeout:
+            kwargs['timeout'] = RegexBudget.line_timeout
+
+        windows = RegexBudget.get_windows(line, literals) if method != 'match' else \
+            [(0, min(len(line), RegexBudget.window_size))]
+        matches = []
+        for start, end in windows:
+            try:
+                if method == 'finditer':
+                    # Windows don't overlap, neither their matches
+                    matches.extend(pattern.finditer(line, start, end, **kwargs))
+                    continue
+                match = getattr(pattern, method)(line, start, end, **kwargs)
+            except TimeoutError:
+                continue
+            if match:
+                matches.append(match)
+                break
+
+        RegexBudget.record(line_no, line, reason, source, bool(matches))
+        if method == 'finditer':
+            return matches
+
+        return matches[0] if matches else None
+
+    @staticmethod
+    def record(line_no, line, reason, source, found):
+        """
+        Add a line to degraded lines report
+        :param line_no: line number
+        :param line: line
+        :param reason: RegexBudget.Reason
+        :param source: what was being matched
+        :param found: degraded match found something
+        :return: None
+        """
+        with RegexBudget.lock:
+            RegexBudget.degraded_count += 1
+            if len(RegexBudget.degraded) >= RegexBudget.max_report:
+                return
+            RegexBudget.degraded.append({
+                'line': line_no,
+                'length': len(line),
+                'reason': reason.value,
+                'source': source,
+                'found': found
+            })
+
+        write_log(f"Line {line_no if line_no else '?'} ({len(line)} chars) matched in degraded mode: {reason.value}",
+                  level="WARN")
+
+    @staticmethod
+    def clear():
+        """
+        Clear degraded lines report
+        :return: None
+        """
+        with RegexBudget.lock:
+            RegexBudget.degraded = []
+            RegexBudget.degraded_count = 0
+
+    @staticmethod
+    def format_report(source_width=60):
+        """
+        Degraded lines report as text lines, ready to print or to send to log
+        :param source_width: longer sources are truncated
+        :return: list of lines, empty if no line was degraded
+        """
+        with RegexBudget.lock:
+            degraded = list(RegexBudget.degraded)
+            count = RegexBudget.degraded_count
+        if not count:
+            return []
+
+        lines = [f'{count} lines matched in degraded mode (regex budget, see FILE_SETUP.SCAN_SETUP.REGEX_BUDGET):',
+                 f'{"line":>9} {"chars":>9} {"found":>5}  {"reason":<22} source']
+        for each_item in degraded:
+            source = str(each_item['source'] or '')
+            if len(source) > source_width:
+                source = source[:source_width - 3] + '...'
+            lines.append(f'{each_item["line"] or "?":>9} {each_item["length"]:>9} {str(each_item["found"]):>5}  '
+                         f'{each_item["reason"]:<22} {source}')
+        if count > len(degraded):
+            lines.append(f'... {count - len(degraded)} more')
+
+        return lines
@@ -0,0 +1,316 @@
+# regex_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+import regex as re
+
+
+class RegexCache:
+    """
+    Bounded (least recently used items are discarded first) and thread safe cache of compiled regex, keyed by the
+    pattern itself. For each pattern it keeps hits, misses and compile time; when instrumented, compiled patterns
+    also account each match (number of calls and cumulative time), so patterns that dominate scan time can be found
+    (see report).
+    Values derived from a regex (like a list of regex without group names) are kept on the same cache under
+    their own kind (see lookup/store), so a single limit applies to all of them.
+    In profiling mode, each compiled pattern also keeps histograms of match time and input length, and timeouts
+    (see RegexProfiler).
+    Match statistics of each pattern are guarded by a lock of its own, so matching on several threads doesn't go
+    through the cache lock; instrumentation is off by default (see FILE_SETUP.REGEX_CACHE.INSTRUMENT).
+    """
+
+    # Default max number of items kept
+    MAX_SIZE = 1024
+    # Kind of compiled patterns
+    COMPILED = 'compiled'
+
+    class Entry:
+        """
+        A cached item and its statistics
+        """
+
+        def __init__(self, kind, key, profile=False):
+            self.kind = kind
+            self.key = key
+            self.value = None
+            # Guards match statistics only (see add_match), hits and misses are guarded by cache lock
+            self.lock = threading.Lock()
+            self.profile = profile
+            self.hits = 0
+            self.misses = 0
+            self.compile_time = 0.0
+            self.match_count = 0
+            self.match_time = 0.0
+            # Profiling mode: {bucket: calls}, bucket n holds values below 2^n (microseconds or chars)
+            self.time_histogram = {}
+            self.length_histogram = {}
+            self.max_time = 0.0
+            self.max_length = 0
+            self.total_length = 0
+            self.timeouts = 0
+
+        def add_match(self, elapsed, count=1, length=None, timed_out=False):
+            """
+            Account time spent matching
+            :param elapsed: seconds
+            :param count: number of calls
+            :param length: length of text matched (profiling mode)
+            :param timed_out: call was interrupted by its timeout (profiling mode)
+            :return: None
+            """
+            with self.lock:
+                self.match_count += count
+                self.match_time += elapsed
+                if not self.profile:
+                    return
+
+                bucket = int(elapsed * 1000000).bit_length()
+                self.time_histogram[bucket] = self.time_histogram.get(bucket, 0) + count
+                self.max_time = max(self.max_time, elapsed)
+                if timed_out:
+                    self.timeouts += 1
+                if length is not None:
+                    bucket = length.bit_length()
+                    self.length_histogram[bucket] = self.length_histogram.get(bucket, 0) + count
+                    self.max_length = max(self.max_length, length)
+                    self.total_length += length * count
+
+    class TimedPattern:
+        """
+        Compiled regex that accounts time spent on each call into its cache entry; any other attribute is taken from
+        compiled regex
+        """
+
+        __slots__ = ('compiled', 'entry')
+
+        def __init__(self, compiled, entry):
+            self.compiled = compiled
+            self.entry = entry
+
+        def __getattr__(self, name):
+            return getattr(self.compiled, name)
+
+        def _timed(self, method, args, kwargs):
+            timed_out = False
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                self.entry.add_match(time.perf_counter() - start, length=self._length(args, kwargs),
+                                     timed_out=timed_out)
+
+        def _length(self, args, kwargs):
+            """
+            :return: length of text given to a call, only needed on profiling mode
+            """
+            if not self.entry.profile:
+                return None
+            text = args[0] if args else kwargs.get('string')
+
+            return len(text) if isinstance(text, (str, bytes)) else None
+
+        def search(self, *args, **kwargs):
+            return self._timed(self.compiled.search, args, kwargs)
+
+        def match(self, *args, **kwargs):
+            return self._timed(self.compiled.match, args, kwargs)
+
+        def fullmatch(self, *args, **kwargs):
+            return self._timed(self.compiled.fullmatch, args, kwargs)
+
+        def findall(self, *args, **kwargs):
+            return self._timed(self.compiled.findall, args, kwargs)
+
+        def sub(self, *args, **kwargs):
+            return self._timed(self.compiled.sub, args, kwargs)
+
+        def split(self, *args, **kwargs):
+            return self._timed(self.compiled.split, args, kwargs)
+
+        def finditer(self, *args, **kwargs):
+            # Matches are searched while iterating, time is accounted when iteration finishes
+            elapsed = 0.0
+            timed_out = False
+            iterator = self.compiled.finditer(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        match = next(iterator, None)
+                    except TimeoutError:
+                        timed_out = True
+                        raise
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    if match is None:
+                        return
+                    yield match
+            finally:
+                self.entry.add_match(elapsed, length=self._length(args, kwargs), timed_out=timed_out)
+
+    def __init__(self, max_size=None, instrument=False, profile=False):
+        """
+        :param max_size: max number of items kept
+        :param instrument: account time spent by each compiled pattern matching
+        :param profile: profiling mode, keep histograms of match time and input length
+        """
+        self.max_size = max_size or RegexCache.MAX_SIZE
+        self.instrument = instrument
+        self.profile = profile
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def setup(self, max_size=None, instrument=None, profile=None):
+        """
+        Change cache settings, patterns already compiled keep their instrumentation
+        :param max_size: max number of items kept
+        :param instrument: account time spent by each new compiled pattern
+        :param profile: profiling mode (it requires instrumentation)
+        :return: None
+        """
+        with self.lock:
+            if max_size:
+                self.max_size = max_size
+            if instrument is not None:
+                self.instrument = instrument
+            if profile is not None:
+                self.profile = profile
+                for entry in self.entries.values():
+                    entry.profile = profile
+            self._evict()
+
+    def compile(self, pattern, flags=0):
+        """
+        Return compiled version of given regex, compiling it only if it is not in cache
+        :param pattern: regex
+        :param flags: regex flags
+        :return: compiled regex (a RegexCache.TimedPattern when instrumented)
+        """
+        key = (RegexCache.COMPILED, pattern, flags)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                entry.hits += 1
+                return entry.value
+
+        start = time.perf_counter()
+        compiled = re.compile(pattern, flags)
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = RegexCache.Entry(RegexCache.COMPILED, (pattern, flags), self.profile)
+                entry.value = RegexCache.TimedPattern(compiled, entry) if self.instrument else compiled
+                self.entries[key] = entry
+                self._evict()
+            entry.misses += 1
+            entry.compile_time += elapsed
+
+            return entry.value
+
+    def lookup(self, kind, key):
+        """
+        Return a value derived from a regex
+        :param kind: kind of value (like 'clear_group_list')
+        :param key: key of the value within its kind
+        :return: value stored, None if it is not in cache
+        """
+        with self.lock:
+            entry = self.entries.get((kind, key))
+            if entry is None:
+                return None
+            self.entries.move_to_end((kind, key))
+            entry.hits += 1
+
+            return entry.value
+
+    def store(self, kind, key, value):
+        """
+        Store a value derived from a regex
+        :param kind: kind of value
+        :param key: key of the value within its kind
+        :param value: value to store
+        :return: None
+        """
+        with self.lock:
+            entry = self.entries.get((kind, key))
+            if entry is None:
+                entry = RegexCache.Entry(kind, key)
+                self.entries[(kind, key)] = entry
+                self._evict()
+            entry.misses += 1
+            entry.value = value
+
+    def clear(self, kind=None):
+        """
+        Remove items from cache
+        :param kind: only remove items of this kind, by default all of them
+        :return: None
+        """
+        with self.lock:
+            if kind is None:
+                self.entries.clear()
+                return
+
+            for each_key in [each_key for each_key in self.entries if each_key[0] == kind]:
+                del self.entries[each_key]
+
+    def _evict(self):
+        """
+        Discard least recently used items over max size, lock must be held
+        :return: None
+        """
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_compiled_entries(self):
+        """
+        :return: list of entries of compiled patterns (RegexCache.Entry)
+        """
+        with self.lock:
+            return [entry for entry in self.entries.values() if entry.kind == RegexCache.COMPILED]
+
+    def report(self, top=20):
+        """
+        Return statistics of most expensive compiled patterns, by time spent matching plus compile time
+        :param top: number of patterns to return
+        :return: list of dictionaries, most expensive first
+        """
+        entries = self.get_compiled_entries()
+        entries.sort(key=lambda entry: entry.match_time + entry.compile_time, reverse=True)
+
+        return [{
+            'pattern': entry.key[0],
+            'hits': entry.hits,
+            'misses': entry.misses,
+            'compile_ms': entry.compile_time * 1000,
+            'matches': entry.match_count,
+            'match_ms': entry.match_time * 1000,
+            'avg_match_us': entry.match_time * 1000000 / entry.match_count if entry.match_count else 0.0
+        } for entry in entries[:top]]
+
+    def format_report(self, top=20, pattern_width=70):
+        """
+        Report (see report) as text lines, ready to print or to send to log
+        :param top: number of patterns to include
+        :param pattern_width: patterns longer than this are truncated
+        :return: list of lines
+        """
+        lines = [f'Top {top} most expensive regex ({len(self.entries)} cached items, {self.evictions} evicted):',
+                 f'{"match ms":>10} {"matches":>9} {"avg us":>8} {"compile ms":>10} {"hits":>7}  pattern']
+        for each_item in self.report(top):
+            pattern = each_item['pattern']
+            if len(pattern) > pattern_width:
+                pattern = pattern[:pattern_width - 3] + '...'
+            lines.append(f'{each_item["match_ms"]:>10.2f} {each_item["matches"]:>9} {each_item["avg_match_us"]:>8.2f} '
+                         f'{each_item["compile_ms"]:>10.2f} {each_item["hits"]:>7}  {pattern}')
+
+        return lines
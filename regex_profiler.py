@@ -0,0 +1,475 @@
+# regex_profiler.py
+"""
+Regex cost by configuration rule: time spent by each compiled pattern (see RegexCache profiling mode) is tied back to
+the configuration key that defines it (like WATCH_FOR.checkFlowInLog.Exceptions.error_strings[2]), and patterns from
+configuration are checked for catastrophic backtracking with generated adversarial inputs.
+
+usage: python regex_profiler.py [--max-length N] [--timeout seconds]
+(checks all patterns from configuration for catastrophic backtracking)
+"""
+import argparse
+import re as sre
+import time
+
+import regex as re
+
+from object_class import Configs, CordaObject, RegexLib, RuleSet
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+class RegexProfiler:
+    """
+    Profile of regex defined on configuration: each pattern compiled while scanning is mapped to the configuration
+    keys defining it, so its match time histogram, timeouts and length of lines it was given can be reported by rule.
+    Patterns are compiled on several forms (macro variables expanded, without group names, all regex of a list joined,
+    anchored to line start...), all of them are accounted to the rule (or list of rules) they come from.
+    """
+
+    # Configuration keys holding regex (a string or a list of them)
+    PATTERN_KEYS = ('EXPECT', 'error_strings', 'ignore_messages_with', 'IGNORE', 'REFERENCE_ID')
+    # Adversarial check: input sizes tried, and time growth (for each input size doubled) that is flagged;
+    # linear patterns grow x2, quadratic x4, exponential much more
+    ADVERSARIAL_LENGTHS = (512, 1024, 2048, 4096)
+    MAX_GROWTH = 3.0
+    # Time (seconds) on largest input below which a pattern is never flagged by its growth
+    MIN_FLAG_TIME = 0.005
+    # Max time (seconds) for each adversarial match
+    ADVERSARIAL_TIMEOUT = 1.0
+    # Characters tried to build a sample of a character set, and character added to make a match fail
+    SAMPLE_CHARS = 'a0 Z_-.:=/!'
+    FAIL_CHAR = '\x00'
+
+    class Rule:
+        """
+        Cost of a configuration rule (or list of rules), aggregated from all compiled forms of its pattern
+        """
+
+        def __init__(self, path, pattern):
+            """
+            :param path: configuration key path
+            :param pattern: regex as written on configuration (lists are joined with '|')
+            """
+            self.path = path
+            self.pattern = pattern
+            self.calls = 0
+            self.match_time = 0.0
+            self.max_time = 0.0
+            self.timeouts = 0
+            self.time_histogram = {}
+            self.max_length = 0
+            self.total_length = 0
+
+        def add(self, entry):
+            """
+            Add statistics of a compiled pattern
+            :param entry: RegexCache.Entry
+            :return: None
+            """
+            self.calls += entry.match_count
+            self.match_time += entry.match_time
+            self.max_time = max(self.max_time, entry.max_time)
+            self.timeouts += entry.timeouts
+            self.max_length = max(self.max_length, entry.max_length)
+            self.total_length += entry.total_length
+            for bucket, count in entry.time_histogram.items():
+                self.time_histogram[bucket] = self.time_histogram.get(bucket, 0) + count
+
+        def percentile(self, fraction):
+            """
+            :param fraction: percentile wanted (0.5 for median)
+            :return: upper bound (microseconds) of histogram bucket holding that percentile
+            """
+            total = sum(self.time_histogram.values())
+            if not total:
+                return 0
+            accumulated = 0
+            for bucket in sorted(self.time_histogram):
+                accumulated += self.time_histogram[bucket]
+                if accumulated >= fraction * total:
+                    return 1 << bucket
+
+            return 1 << max(self.time_histogram)
+
+    def __init__(self, config, cache=None):
+        """
+        :param config: configuration (dictionary, see Configs.config)
+        :param cache: RegexCache with compiled patterns, RegexLib.cache by default
+        """
+        self.config = config
+        self.cache = cache or RegexLib.cache
+        self.rules = RegexProfiler.find_rules(config)
+
+    @staticmethod
+    def find_rules(config):
+        """
+        Find all regex defined on configuration
+        :param config: configuration (dictionary)
+        :return: list of tuples (key path, regex or list of regex)
+        """
+        rules = []
+
+        def walk(section, path):
+            for key, value in section.items():
+                key_path = f'{path}.{key}' if path else key
+                if isinstance(value, dict):
+                    walk(value, key_path)
+                elif key in RegexProfiler.PATTERN_KEYS:
+                    if isinstance(value, str):
+                        rules.append((key_path, value))
+                    elif isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+                        rules.append((key_path, value))
+
+        walk(config, '')
+
+        return rules
+
+    @staticmethod
+    def get_forms(regex):
+        """
+        Forms a configuration regex takes when it is compiled while scanning
+        :param regex: regex as written on configuration
+        :return: set of regex
+        """
+        forms = {regex}
+        for each_regex in (regex, f'({regex})'):
+            for nogroup_name in (True, False):
+                try:
+                    expanded = RegexLib.build_regex(each_regex, nogroup_name=nogroup_name)
+                except Exception:
+                    continue
+                forms.add(expanded)
+                forms.add(CordaObject.remove_group_names(expanded))
+
+        for each_form in list(forms):
+            # Anchored form used to match blocks of lines (see RuleSet.get_block_compiled)
+            flags = RuleSet.GLOBAL_FLAGS.match(each_form)
+            prefix = flags.group() if flags else ''
+            forms.add(f'{prefix}^(?:{each_form[len(prefix):]})')
+
+        return forms
+
+    def get_path_map(self):
+        """
+        :return: dictionary {regex: [key path, ...]} with all forms of all regex found on configuration
+        """
+        path_map = {}
+
+        def add(pattern, path):
+            paths = path_map.setdefault(pattern, [])
+            if path not in paths:
+                paths.append(path)
+
+        for path, value in self.rules:
+            if isinstance(value, str):
+                for each_form in RegexProfiler.get_forms(value):
+                    add(each_form, path)
+                continue
+
+            for index, each_regex in enumerate(value):
+                for each_form in RegexProfiler.get_forms(each_regex):
+                    add(each_form, f'{path}[{index}]')
+            # Joined forms of whole list
+            add('|'.join(value), path)
+            for force_groups in (False, True):
+                rule_set = RuleSet.rule_sets.get((tuple(value), force_groups))
+                if rule_set is not None:
+                    add('|'.join(rule_set.expanded), path)
+
+        return path_map
+
+    def profile(self):
+        """
+        Aggregate statistics of all compiled patterns by configuration rule; patterns not coming from configuration
+        are kept under their own text
+        :return: list of RegexProfiler.Rule, most expensive first
+        """
+        path_map = self.get_path_map()
+        rules = {}
+        for entry in self.cache.get_compiled_entries():
+            if not entry.match_count:
+                continue
+            pattern = entry.key[0]
+            for each_path in path_map.get(pattern, [None]):
+                key = each_path or pattern
+                if key not in rules:
+                    rules[key] = RegexProfiler.Rule(each_path or '(not in configuration)', pattern)
+                rules[key].add(entry)
+
+        return sorted(rules.values(), key=lambda rule: rule.match_time, reverse=True)
+
+    def format_report(self, top=20, pattern_width=50):
+        """
+        Profile (see profile) as text lines, ready to print or to send to log
+        :param top: number of rules to include
+        :param pattern_width: patterns longer than this are truncated
+        :return: list of lines
+        """
+        rules = self.profile()
+        lines = [f'Regex profile, top {top} most expensive rules ({len(rules)} rules with matches):',
+                 f'{"match ms":>10} {"calls":>9} {"p50 us":>8} {"p99 us":>8} {"max ms":>8} {"timeouts":>8} '
+                 f'{"avg len":>7} {"max len":>7}  rule']
+        if not self.cache.profile:
+            lines.append('(profiling mode is not enabled, see FILE_SETUP.REGEX_CACHE.PROFILE)')
+
+        for rule in rules[:top]:
+            average_length = rule.total_length / rule.calls if rule.calls else 0
+            lines.append(f'{rule.match_time * 1000:>10.2f} {rule.calls:>9} {rule.percentile(0.5):>8} '
+                         f'{rule.percentile(0.99):>8} {rule.max_time * 1000:>8.2f} {rule.timeouts:>8} '
+                         f'{average_length:>7.0f} {rule.max_length:>7}  {rule.path}')
+            if rule.path.startswith('('):
+                pattern = rule.pattern
+                if len(pattern) > pattern_width:
+                    pattern = pattern[:pattern_width - 3] + '...'
+                lines.append(f'{"":>73}{pattern}')
+
+        return lines
+
+    @staticmethod
+    def in_set(items, char):
+        """
+        Check if a character belongs to a parsed character set
+        :param items: items of an IN node (see sre_parse)
+        :param char: character to check
+        :return: True if character belongs to set
+        """
+        negate = False
+        found = False
+        code = ord(char)
+        for op, av in items:
+            if op is sre_constants.NEGATE:
+                negate = True
+            elif op is sre_constants.LITERAL:
+                found = found or code == av
+            elif op is sre_constants.NOT_LITERAL:
+                found = found or code != av
+            elif op is sre_constants.RANGE:
+                found = found or av[0] <= code <= av[1]
+            elif op is sre_constants.CATEGORY:
+                found = found or RegexProfiler.in_category(av, char)
+
+        return found != negate
+
+    @staticmethod
+    def in_category(category, char):
+        """
+        :param category: category (like CATEGORY_DIGIT, see sre_parse)
+        :param char: character to check
+        :return: True if character belongs to category
+        """
+        name = str(category).upper()
+        if 'DIGIT' in name:
+            result = char.isdigit()
+        elif 'SPACE' in name:
+            result = char.isspace()
+        elif 'WORD' in name:
+            result = char.isalnum() or char == '_'
+        elif 'LINEBREAK' in name:
+            result = char == '\n'
+        else:
+            return False
+
+        return not result if '_NOT_' in name else result
+
+    @staticmethod
+    def sample(parsed, minimal=True):
+        """
+        Build a text matched by a parsed regex
+        :param parsed: list of parsed items (see sre_parse)
+        :param minimal: repeats take their minimum, otherwise at least one
+        :return: sample text, None if no sample could be built
+        """
+        text = []
+        for op, av in parsed:
+            if op is sre_constants.LITERAL:
+                text.append(chr(av))
+            elif op is sre_constants.NOT_LITERAL:
+                text.append('a' if av != ord('a') else 'b')
+            elif op is sre_constants.ANY:
+                text.append('a')
+            elif op is sre_constants.IN:
+                char = next((char for char in RegexProfiler.SAMPLE_CHARS if RegexProfiler.in_set(av, char)), None)
+                if char is None:
+                    return None
+                text.append(char)
+            elif op is sre_constants.CATEGORY:
+                char = next((char for char in RegexProfiler.SAMPLE_CHARS
+                             if RegexProfiler.in_category(av, char)), None)
+                if char is None:
+                    return None
+                text.append(char)
+            elif op is sre_constants.BRANCH:
+                branch = RegexProfiler.sample(av[1][0], minimal)
+                if branch is None:
+                    return None
+                text.append(branch)
+            elif op is sre_constants.SUBPATTERN:
+                group = RegexProfiler.sample(av[-1], minimal)
+                if group is None:
+                    return None
+                text.append(group)
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) or \
+                    str(op) == 'POSSESSIVE_REPEAT':
+                times = av[0] if minimal else max(av[0], 1)
+                if times:
+                    item = RegexProfiler.sample(av[2], minimal)
+                    if item is None:
+                        return None
+                    text.append(item * times)
+            elif str(op) == 'ATOMIC_GROUP':
+                group = RegexProfiler.sample(av, minimal)
+                if group is None:
+                    return None
+                text.append(group)
+            # Anchors, assertions and group references are left empty
+
+        return ''.join(text)
+
+    @staticmethod
+    def attack_points(parsed, prefix=''):
+        """
+        Find unbounded repeats of a parsed regex, and the text needed to reach each one of them
+        :param parsed: list of parsed items (see sre_parse)
+        :param prefix: text matched before these items
+        :return: generator of tuples (prefix text, repeated text)
+        """
+        items = list(parsed)
+        for position, (op, av) in enumerate(items):
+            before = RegexProfiler.sample(items[:position])
+            if before is None:
+                return
+            if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[1] == sre_constants.MAXREPEAT:
+                unit = RegexProfiler.sample(av[2], minimal=False)
+                if unit:
+                    yield prefix + before, unit
+                yield from RegexProfiler.attack_points(av[2], prefix + before)
+            elif op is sre_constants.SUBPATTERN:
+                yield from RegexProfiler.attack_points(av[-1], prefix + before)
+            elif op is sre_constants.BRANCH:
+                for each_branch in av[1]:
+                    yield from RegexProfiler.attack_points(each_branch, prefix + before)
+
+    @staticmethod
+    def nested_repeats(parsed, inside=False):
+        """
+        Static check: an unbounded repeat inside another one (like (a+)+) can backtrack exponentially
+        :param parsed: list of parsed items
+        :param inside: items are within an unbounded repeat
+        :return: True if a nested unbounded repeat is found
+        """
+        for op, av in parsed:
+            if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+                unbounded = av[1] == sre_constants.MAXREPEAT
+                if unbounded and inside:
+                    return True
+                if RegexProfiler.nested_repeats(av[2], inside or unbounded):
+                    return True
+            elif op is sre_constants.SUBPATTERN:
+                if RegexProfiler.nested_repeats(av[-1], inside):
+                    return True
+            elif op is sre_constants.BRANCH:
+                if any(RegexProfiler.nested_repeats(each_branch, inside) for each_branch in av[1]):
+                    return True
+
+        return False
+
+    @staticmethod
+    def check_pattern(pattern, lengths=ADVERSARIAL_LENGTHS, timeout=ADVERSARIAL_TIMEOUT):
+        """
+        Check a regex for catastrophic backtracking: for each unbounded repeat, an input that reaches it, repeats
+        what it matches and then fails is searched with increasing sizes, and time growth is measured
+        :param pattern: regex (macro variables already expanded)
+        :param lengths: input sizes (number of repetitions) to try, increasing
+        :param timeout: max time (seconds) for each search
+        :return: None if pattern looks safe, otherwise dictionary with 'reason', 'input' (sample of input used),
+        'growth' (worst time growth for each size doubled) and 'seconds' (time on largest input)
+        """
+        try:
+            parsed = sre_parse.parse(pattern)
+            compiled = re.compile(pattern)
+        except (sre.error, re.error, ValueError, TypeError, OverflowError, RecursionError):
+            # Syntax only supported by 'regex' module
+            return None
+
+        worst = None
+        for prefix, unit in set(RegexProfiler.attack_points(parsed)):
+            times = []
+            for each_length in lengths:
+                text = prefix + unit * (each_length // len(unit) or 1) + RegexProfiler.FAIL_CHAR
+                start = time.perf_counter()
+                try:
+                    compiled.search(text, timeout=timeout)
+                except TimeoutError:
+                    return {'reason': 'timeout', 'input': f'{prefix}({unit})*{len(text)}', 'growth': None,
+                            'seconds': time.perf_counter() - start}
+                times.append(max(time.perf_counter() - start, 1e-7))
+
+            growth = max(later / earlier for earlier, later in zip(times, times[1:]))
+            if times[-1] >= RegexProfiler.MIN_FLAG_TIME and growth > RegexProfiler.MAX_GROWTH and \
+                    (worst is None or growth > worst['growth']):
+                worst = {'reason': 'super-linear', 'input': f'{prefix}({unit})*{lengths[-1]}', 'growth': growth,
+                         'seconds': times[-1]}
+
+        if worst is None and RegexProfiler.nested_repeats(parsed):
+            worst = {'reason': 'nested repeat', 'input': None, 'growth': None, 'seconds': None}
+
+        return worst
+
+    def find_pathological(self, lengths=ADVERSARIAL_LENGTHS, timeout=ADVERSARIAL_TIMEOUT):
+        """
+        Check all regex from configuration for catastrophic backtracking (see check_pattern)
+        :param lengths: input sizes to try
+        :param timeout: max time (seconds) for each search
+        :return: list of tuples (key path, expanded regex, result of check_pattern)
+        """
+        found = []
+        for path, value in self.rules:
+            regex_list = [(path, value)] if isinstance(value, str) else \
+                [(f'{path}[{index}]', each_regex) for index, each_regex in enumerate(value)]
+            for each_path, each_regex in regex_list:
+                expanded = CordaObject.remove_group_names(RegexLib.build_regex(each_regex, nogroup_name=True))
+                result = RegexProfiler.check_pattern(expanded, lengths, timeout)
+                if result:
+                    found.append((each_path, expanded, result))
+
+        return found
+
+    def format_pathological(self, lengths=ADVERSARIAL_LENGTHS, timeout=ADVERSARIAL_TIMEOUT, pattern_width=100):
+        """
+        Patterns found by find_pathological as text lines
+        :return: list of lines
+        """
+        found = self.find_pathological(lengths, timeout)
+        lines = [f'{len(found)} catastrophic backtracking candidates found on configuration:']
+        for path, pattern, result in found:
+            details = result['reason']
+            if result['growth']:
+                details += f' x{result["growth"]:.1f} growth'
+            if result['seconds']:
+                details += f', {result["seconds"] * 1000:.1f}ms'
+            if result['input']:
+                details += f', input {result["input"]!r}'
+            if len(pattern) > pattern_width:
+                pattern = pattern[:pattern_width - 3] + '...'
+            lines.append(f'{path}: {details}')
+            lines.append(f'    {pattern}')
+
+        return lines
+
+
+if __name__ == '__main__':
+    parserargs = argparse.ArgumentParser(description='Check configuration regex for catastrophic backtracking')
+    parserargs.add_argument('--max-length', type=int, default=RegexProfiler.ADVERSARIAL_LENGTHS[-1],
+                            help='Size of largest adversarial input')
+    parserargs.add_argument('--timeout', type=float, default=RegexProfiler.ADVERSARIAL_TIMEOUT,
+                            help='Max time (seconds) for each match')
+    args = parserargs.parse_args()
+
+    Configs.load_config()
+    sizes = tuple(args.max_length >> shift for shift in (3, 2, 1, 0))
+    print('\n'.join(RegexProfiler(Configs.config).format_pathological(sizes, args.timeout)))
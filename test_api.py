@@ -103,7 +103,7 @@ if __name__ == "__main__":
     # result = analyze_corda_log("/home/larry/IdeaProjects/logtracer/c4-logs/tests-logs/insuree.log",
     # result = analyze_corda_log("/home/larry/IdeaProjects/logtracer/c4-logs/client-logs/ChainThat/CS-4002/mnp-dev-party005-cordanode-7.log",
     result = analyze_corda_log("/home/larry/IdeaProjects/logtracer/c4-logs/client-logs/HQLAx/CS-4163/hqlx.log",
-                               datainfo=datainfo)
+                               datainfo=datainfo, payload_only=True)
     #result = analyze_corda_log("client-logs/ChainThat/CS-4002/party005-dev-corda-logs.txt")
     #save_analysis(result, CordaObject.Type.ERROR_ANALYSIS)
     save_analysis(result)
@@ -0,0 +1,59 @@
+# tests/test_analysis_cache.py
+import os
+
+from analysis_cache import AnalysisCache
+
+
+def new_logs(path, count):
+    logs = []
+    for index in range(count):
+        log = path / f'log{index}.log'
+        log.write_text(f'line {index}\n')
+        logs.append(str(log))
+
+    return logs
+
+
+def test_key(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    log = new_logs(tmp_path, 1)[0]
+    key = cache.get_key(log)
+    assert key == cache.get_key(log)
+    assert key != cache.get_key(log, ['FLOW'])
+
+    with open(log, 'a') as flog:
+        flog.write('more\n')
+    assert key != cache.get_key(log)
+
+
+def test_fingerprints_saved_only_when_new(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    log = new_logs(tmp_path, 1)[0]
+    cache.get_key(log)
+    memo_file = os.path.join(cache.cache_dir, AnalysisCache.FINGERPRINTS)
+    os.utime(memo_file, ns=(0, 0))
+
+    cache.get_key(log)
+    assert os.stat(memo_file).st_mtime_ns == 0
+
+
+def test_fingerprints_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(AnalysisCache, 'MAX_FINGERPRINTS', 3)
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    logs = new_logs(tmp_path, 5)
+    for each_log in logs:
+        cache.get_key(each_log)
+
+    # Oldest ones are discarded
+    assert list(cache._load_fingerprints()) == [os.path.abspath(each_log) for each_log in logs[2:]]
+
+
+def test_evict_prunes_missing_files(tmp_path):
+    cache = AnalysisCache(str(tmp_path / 'cache'))
+    logs = new_logs(tmp_path, 3)
+    for each_log in logs:
+        cache.get_key(each_log)
+    os.remove(logs[1])
+
+    cache.save(cache.get_key(logs[0]), {'summary': {}})
+    assert list(cache._load_fingerprints()) == [os.path.abspath(logs[0]), os.path.abspath(logs[2])]
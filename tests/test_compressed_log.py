@@ -0,0 +1,112 @@
+# tests/test_compressed_log.py
+import bz2
+import gzip
+import struct
+import zlib
+
+import pytest
+
+from compressed_log import CompressedLog
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CONTENT = ''.join(f'[INFO ] 2024-01-01T00:00:{line % 60:02d},000Z [main] Flow {line:08x} started\n'
+                  for line in range(20000)).encode()
+# Stored (not deflated) data holding a gzip member header, so it also shows up on compressed file
+FALSE_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\x03'
+
+
+def chunks(data, size=64 * 1024):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def bgzf_block(data):
+    """
+    :return: BGZF block (gzip member with 'BC' extra subfield holding its size) for given data
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    extra = b'BC' + struct.pack('<HH', 2, 18 + len(deflated) + 8 - 1)
+    header = b'\x1f\x8b\x08\x04' + struct.pack('<IBB', 0, 0, 255) + struct.pack('<H', len(extra)) + extra
+
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def zstd_seekable(data):
+    """
+    :return: zstd seekable format (independent frames and a seek table) for given data
+    """
+    compressor = zstandard.ZstdCompressor()
+    frames = [compressor.compress(each_chunk) for each_chunk in chunks(data)]
+    table = b''.join(struct.pack('<II', len(each_frame), len(each_chunk))
+                     for each_frame, each_chunk in zip(frames, chunks(data)))
+    table += struct.pack('<IBI', len(frames), 0, CompressedLog.ZSTD_SEEKABLE_MAGIC)
+
+    return b''.join(frames) + struct.pack('<II', CompressedLog.ZSTD_SKIPPABLE_SEEK_TABLE, len(table)) + table
+
+
+def decompress(path, compressed):
+    path.write_bytes(compressed)
+    log = CompressedLog(str(path), max_workers=2)
+    buffer = log.get_buffer()
+    try:
+        return bytes(buffer[:log.size])
+    finally:
+        log.close()
+
+
+@pytest.mark.parametrize('name,compress', [
+    ('single.gz', gzip.compress),
+    ('multi.gz', lambda data: b''.join(gzip.compress(each_chunk) for each_chunk in chunks(data))),
+    ('bgzf.gz', lambda data: b''.join(bgzf_block(each_chunk) for each_chunk in chunks(data))),
+    ('single.bz2', bz2.compress),
+    ('multi.bz2', lambda data: b''.join(bz2.compress(each_chunk) for each_chunk in chunks(data))),
+])
+def test_round_trip(tmp_path, name, compress):
+    assert decompress(tmp_path / name, compress(CONTENT)) == CONTENT
+
+
+@pytest.mark.skipif(zstandard is None, reason='zstandard module is not installed')
+@pytest.mark.parametrize('name,compress', [
+    ('single.zst', lambda data: zstandard.ZstdCompressor().compress(data)),
+    ('seekable.zst', zstd_seekable),
+])
+def test_round_trip_zstd(tmp_path, name, compress):
+    assert decompress(tmp_path / name, compress(CONTENT)) == CONTENT
+
+
+def test_members_found():
+    multi = b''.join(gzip.compress(each_chunk) for each_chunk in chunks(CONTENT))
+    assert len(CompressedLog.bgzf_members(b''.join(bgzf_block(each_chunk) for each_chunk in chunks(CONTENT)))) == \
+        len(chunks(CONTENT))
+    assert CompressedLog.bgzf_members(multi) is None
+    log = CompressedLog.__new__(CompressedLog)
+    log.format = CompressedLog.Format.GZIP
+    assert len(log._find_members(multi)) == len(chunks(CONTENT))
+    assert log._find_members(gzip.compress(CONTENT)) is None
+
+
+def test_false_member_header(tmp_path):
+    content = CONTENT[:1000] + FALSE_HEADER + CONTENT[1000:]
+    single = gzip.compress(content, compresslevel=0)
+    log = CompressedLog.__new__(CompressedLog)
+    log.format = CompressedLog.Format.GZIP
+    # Header is found inside compressed data, but member is not complete: whole file is read in a single pass
+    assert log._find_members(single)
+    assert decompress(tmp_path / 'false.gz', single) == content
+
+
+def test_gzip_header():
+    assert CompressedLog.is_gzip_header(FALSE_HEADER, 0)
+    # Reserved flag bits, unknown XFL or OS
+    assert not CompressedLog.is_gzip_header(b'\x1f\x8b\x08\x20' + FALSE_HEADER[4:], 0)
+    assert not CompressedLog.is_gzip_header(FALSE_HEADER[:8] + b'\x07\x03', 0)
+    assert not CompressedLog.is_gzip_header(FALSE_HEADER[:9] + b'\x80', 0)
+    assert not CompressedLog.is_gzip_header(FALSE_HEADER[:9], 0)
+
+
+def test_empty(tmp_path):
+    assert decompress(tmp_path / 'empty.gz', gzip.compress(b'')) == b''
@@ -0,0 +1,60 @@
+# tests/test_follow.py
+import time
+
+import pytest
+
+import core
+import log_handler
+from object_class import CordaObject
+
+
+def log_lines(first, last, flow_prefix):
+    """
+    :return: log lines, a flow id and a transaction id for each index
+    """
+    lines = [f'[INFO ] 2024-12-02T10:00:00,000Z [main] internal.Node.run - Node ready, info '
+             f'legalIdentitiesAndCerts=[O=PartyA, L=London, C=GB]\n'] if first == 0 else []
+    for index in range(first, last):
+        lines.append(f'[INFO ] 2024-12-02T10:00:{index % 60:02d},{index % 1000:03d}Z [flow-worker] flow.Foo - '
+                     f'Starting flow {{flow-id={flow_prefix}{index:04x}-e023-033d-364e-433ff7c882f4}}\n')
+        lines.append(f'[INFO ] 2024-12-02T10:00:{index % 60:02d},{index % 1000:03d}Z [flow-worker] flow.Foo - '
+                     f'Sending transaction to notary: O=Notary Service, L=Zurich, C=CH {{tx_id={index:064X}}}\n')
+
+    return ''.join(lines)
+
+
+@pytest.fixture(autouse=True)
+def no_log_wait(monkeypatch):
+    # Each log message waits for main thread, nothing to wait for here
+    monkeypatch.setattr(log_handler, 'time', type('Time', (), {'sleep': staticmethod(lambda seconds: None),
+                                                          'time': staticmethod(time.time)}))
+    core.followed_logs.clear()
+    yield
+    core.followed_logs.clear()
+
+
+def totals(payload):
+    return payload['summary'].get('total_flows'), payload['summary'].get('total_transactions')
+
+
+def test_follow_after_other_analysis(tmp_path):
+    followed = tmp_path / 'followed.log'
+    other = tmp_path / 'other.log'
+    followed.write_text(log_lines(0, 100, '0c25'))
+    other.write_text(log_lines(0, 80, 'ea19'))
+
+    assert totals(core.analyze_corda_log(str(followed), follow=True)) == (100, 100)
+    # Any other analysis has its own results
+    assert totals(core.analyze_corda_log(str(other))) == (80, 80)
+
+    with open(followed, 'a') as flog:
+        flog.write(log_lines(100, 150, '0c25'))
+    payload = core.analyze_corda_log(str(followed), follow=True)
+    assert totals(payload) == (150, 150)
+    assert all(each_id.startswith('0c25') or len(each_id) == 64
+               for each_id in payload['results'][CordaObject.Type.FLOW_AND_TRANSACTIONS.value])
+
+    # Same results as a log analysed at once
+    complete = tmp_path / 'complete.log'
+    complete.write_text(followed.read_text())
+    assert totals(core.analyze_corda_log(str(complete))) == (150, 150)
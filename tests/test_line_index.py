@@ -0,0 +1,120 @@
+# tests/test_line_index.py
+import mmap
+
+import pytest
+
+from line_index import LineIndex
+
+
+def write_lines(path, lines, mode='w'):
+    with open(path, mode) as file:
+        file.write(''.join(f'{each_line}\n' for each_line in lines))
+
+
+def line_starts(path):
+    """
+    :return: offset where each line starts, read without the index
+    """
+    starts = [0]
+    with open(path, 'rb') as file:
+        for each_line in file:
+            starts.append(starts[-1] + len(each_line))
+
+    return starts[:-1]
+
+
+@pytest.fixture(autouse=True)
+def clear_indexes():
+    LineIndex.indexes.clear()
+    yield
+    LineIndex.indexes.clear()
+
+
+def check_index(index, path):
+    starts = line_starts(path)
+    assert index.total_lines == len(starts)
+    for line_no in (1, 2, 99, 100, 101, 250, len(starts)):
+        assert index.offset_of(line_no) == starts[line_no - 1]
+
+
+def test_build(tmp_path):
+    path = str(tmp_path / 'node.log')
+    write_lines(path, [f'line {each_line}' for each_line in range(1000)])
+
+    index = LineIndex.get(path, step=100, save=False)
+
+    check_index(index, path)
+    assert index.read_lines(500, 2) == ['line 499', 'line 500']
+
+
+def test_build_without_final_new_line(tmp_path):
+    path = tmp_path / 'node.log'
+    path.write_bytes(b'a\nb\nc')
+
+    index = LineIndex.get(str(path), step=2, save=False)
+
+    assert index.total_lines == 3
+    assert index.read_lines(3) == ['c']
+
+
+def test_extend_growing_file(tmp_path):
+    path = str(tmp_path / 'node.log')
+    write_lines(path, [f'line {each_line}' for each_line in range(1000)])
+    LineIndex.get(path, step=100)
+    write_lines(path, [f'more {each_line}' for each_line in range(555)], mode='a')
+
+    index = LineIndex.get(path, step=100, append=True)
+
+    check_index(index, path)
+    assert index.is_valid()
+
+
+def test_load_extends_sidecar(tmp_path):
+    path = str(tmp_path / 'node.log')
+    write_lines(path, [f'line {each_line}' for each_line in range(1000)])
+    LineIndex.get(path, step=100)
+    LineIndex.indexes.clear()
+    write_lines(path, [f'more {each_line}' for each_line in range(321)], mode='a')
+
+    index = LineIndex(path, step=100)
+    assert index.load(append=True)
+    index.extend()
+
+    check_index(index, path)
+
+
+def test_file_grows_after_it_was_mapped(tmp_path):
+    path = str(tmp_path / 'node.log')
+    write_lines(path, [f'line {each_line}' for each_line in range(1000)])
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ) as buffer:
+            mapped_size = len(buffer)
+            write_lines(path, [f'more {each_line}' for each_line in range(1000)], mode='a')
+
+            index = LineIndex.get(path, step=100, buffer=buffer, save=False)
+
+            assert index.file_size == mapped_size
+            assert index.total_lines == 1000
+            assert not index.is_valid()
+
+            # Outdated index is extended up to mapped data only
+            index = LineIndex.get(path, step=100, buffer=buffer, save=False, append=True)
+            assert index.file_size == mapped_size
+
+    index = LineIndex.get(path, step=100, save=False, append=True)
+    check_index(index, path)
+
+
+def test_truncated_and_regrown_file_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'node.log')
+    write_lines(path, [f'line {each_line}' for each_line in range(1000)])
+    LineIndex.get(path, step=100)
+    LineIndex.indexes.clear()
+    # Same inode, new content, bigger than indexed one
+    write_lines(path, [f'rotated line {each_line}' for each_line in range(1500)])
+
+    index = LineIndex(path, step=100)
+    assert not index.load(append=True)
+
+    index = LineIndex.get(path, step=100, append=True)
+    check_index(index, path)
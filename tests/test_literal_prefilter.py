@@ -0,0 +1,93 @@
+# tests/test_literal_prefilter.py
+import re
+
+import pytest
+
+from literal_prefilter import LiteralPrefilter
+
+PATTERNS = [
+    r'tx_id=([A-F0-9]{64})',
+    r'flow (started|finished)',
+    r'(?:abc)+xyz',
+    r'(abc)?xyz',
+    r'(foo|ba)r',
+    r'Flow (?:with|without) id',
+    r'a{2}bcd',
+    r'(?:Flow|flow) \[',
+    r'^\[(INFO|WARN) \] .* - (?P<message>Recorded .*)$',
+    r'(?>atomic)group',
+    r'.*',
+    r'ab\d+',
+]
+
+LINES = [
+    'tx_id=40008E261722EBBE451E07EA8646422CBC937D7E064D7A2F723280C4A3E8F1D2',
+    'tx_id=1234', 'flow started', 'flow finishe', 'abcabcxyz', 'xyz', 'abxyz', 'foor', 'bar', 'baz',
+    'Flow without id', 'Flow with id', 'Flow wit id', 'aabcd', 'bcd', 'flow [', 'Flow [', 'FLOW [',
+    '[INFO ] 2024 - Recorded transaction', '[WARN ] x - Recorded', '[ERROR] x - Recorded', 'atomicgroup', 'group',
+    'ab12', '',
+]
+
+
+@pytest.mark.parametrize('pattern,literals', [
+    (r'tx_id=([A-F0-9]{64})', {'tx_id='}),
+    (r'flow (started|finished)', {'started', 'finished'}),
+    (r'(?:abc)+xyz', {'abc'}),
+    (r'(abc)?xyz', {'xyz'}),
+    (r'a{2}bcd', {'bcd'}),
+    (r'(?:Flow|flow) \[', {'Flow', 'flow'}),
+    # Shorter than minimum length
+    (r'(foo|ba)r', None),
+    (r'ab\d+', None),
+    # Nothing required, case insensitive or syntax of 'regex' module only
+    (r'.*', None),
+    (r'x*', None),
+    (r'(?i)flow', None),
+    (r'\p{L}+ flow', None),
+])
+def test_required_literals(pattern, literals):
+    assert LiteralPrefilter.required_literals(pattern) == literals
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_required_literals_found_on_matches(pattern):
+    # Any line matched must contain at least one of the literals
+    literals = LiteralPrefilter.required_literals(pattern)
+    for each_line in LINES:
+        if literals and re.search(pattern, each_line):
+            assert any(each_literal in each_line for each_literal in literals), each_line
+
+
+def test_min_literal_length():
+    assert LiteralPrefilter.required_literals(r'(foo|ba)r', 2) == {'foo', 'ba'}
+    assert LiteralPrefilter.required_literals(r'tx_id=(\w+)', 7) is None
+
+
+def build_prefilter():
+    prefilter = LiteralPrefilter()
+    for index, each_pattern in enumerate(PATTERNS):
+        prefilter.add(LiteralPrefilter.Family.WATCH_FOR, index, [each_pattern])
+    # Rule with several patterns, it is a candidate if any of them could match
+    prefilter.add(LiteralPrefilter.Family.CORDA_OBJECTS, 'TRANSACTION', [PATTERNS[0], PATTERNS[1]])
+    prefilter.compile()
+
+    return prefilter
+
+
+def test_candidates():
+    prefilter = build_prefilter()
+    for each_line in LINES:
+        candidates = prefilter.candidates(each_line)
+        for index, each_pattern in enumerate(PATTERNS):
+            if re.search(each_pattern, each_line):
+                assert prefilter.applies(each_line, LiteralPrefilter.Family.WATCH_FOR, index), each_line
+        if re.search(PATTERNS[0], each_line) or re.search(PATTERNS[1], each_line):
+            assert 'TRANSACTION' in candidates[LiteralPrefilter.Family.CORDA_OBJECTS]
+
+    assert not prefilter.applies('bar', LiteralPrefilter.Family.CORDA_OBJECTS)
+    assert prefilter.applies('bar', LiteralPrefilter.Family.WATCH_FOR, PATTERNS.index(r'.*'))
+
+
+def test_candidates_batch():
+    prefilter = build_prefilter()
+    assert prefilter.candidates_batch(LINES) == [prefilter.candidates(each_line) for each_line in LINES]
@@ -0,0 +1,78 @@
+# tests/test_match_batch.py
+import pytest
+
+from object_class import Configs, RegexLib, RuleSet
+
+LINES = ['foo', 'bar', 'foo bar', 'xbar', 'foo', '123 ', '', 'o', 'b foo', 'foofoo', 'bar foo ', 'foo']
+
+PATTERNS = [
+    # Look ahead at line end sees new line and next line on a joined block
+    r'(foo)(?!\s)',
+    r'(foo)(?=\s*bar)',
+    r'(foo)(?=$)',
+    # Look behind at line start sees previous line
+    r'(?<=o)(bar)',
+    r'(?<!x)(bar)',
+    r'(?<=\n)(bar)',
+    # Anchors
+    r'(foo)$',
+    r'(foo)\Z',
+    r'\A(foo)',
+    r'^(\w+)',
+    # Matches that could take the new line
+    r'(\d+)\s*',
+    r'(o\s*b)',
+    r'(foo)',
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def configs():
+    Configs.load_config()
+
+
+def match_line_by_line(lines, rule_set, anchored):
+    """
+    :return: sparse hit matrix (see RegexLib.match_batch) built matching each line on its own
+    """
+    hits = []
+    for line_index, each_line in enumerate(lines):
+        for rule_index in range(len(rule_set.expanded)):
+            line_regex = rule_set.get_compiled(rule_index)
+            if anchored:
+                match = line_regex.match(each_line)
+                spans = [match.span()] if match else []
+            else:
+                spans = [match.span() for match in line_regex.finditer(each_line)]
+            if spans:
+                hits.append((line_index, rule_index, spans))
+
+    return hits
+
+
+@pytest.mark.parametrize('anchored', [False, True])
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_match_batch_same_as_line_by_line(pattern, anchored):
+    rule_set = RuleSet([pattern])
+
+    assert RegexLib.match_batch(LINES, rule_set, anchored) == match_line_by_line(LINES, rule_set, anchored)
+
+
+@pytest.mark.parametrize('anchored', [False, True])
+def test_match_batch_all_rules(anchored):
+    rule_set = RuleSet(PATTERNS)
+
+    assert RegexLib.match_batch(LINES, rule_set, anchored) == match_line_by_line(LINES, rule_set, anchored)
+
+
+def test_lookahead_is_matched_line_by_line():
+    rule_set = RuleSet([r'(foo)(?!\s)'])
+
+    assert rule_set.get_block_compiled(0) is None
+    assert RegexLib.match_batch(['foo', 'bar'], rule_set) == [(0, 0, [(0, 3)])]
+
+
+def test_match_lines_same_as_match():
+    rule_set = RuleSet(PATTERNS)
+
+    assert rule_set.match_lines(LINES) == [rule_set.match(each_line) for each_line in LINES]
@@ -0,0 +1,97 @@
+# tests/test_ref_id_scanner.py
+import pytest
+
+from object_class import Configs, RegexLib
+from ref_id_scanner import RefIdScanner
+
+TX_ID = '40008E261722EBBE451E07EA8646422CBC937D7E064D7A2F723280C4A3E8F1D2'
+OTHER_TX_ID = 'EAF5C033A5CD95E71CF3D1797E0750EA92484194AEF4259CBB2B92C3D5E6F7A8'
+FLOW_ID = '0c250a03-e023-033d-364e-433ff7c882f4'
+OTHER_FLOW_ID = 'ea190b2a-5806-8a9d-8c31-406deea3d685'
+
+LINES = [
+    f'[INFO ] 2024-12-02T10:00:00,001Z [flow-worker] flow.Foo - Sending transaction {{flow-id={FLOW_ID}, '
+    f'tx_id={TX_ID}}}',
+    f'[INFO ] 2024-12-02T10:00:00,014Z [flow-worker] Recorded transaction locally {{flow-id={OTHER_FLOW_ID}}}',
+    '',
+    f'Flow [{FLOW_ID}] started, flow [{OTHER_FLOW_ID}] waiting',
+    # Anchor one character after line start: rule needs text before it
+    f'low [{FLOW_ID}]',
+    f'"tx_id":"{TX_ID}" and tx_id: {OTHER_TX_ID} tx_id={OTHER_TX_ID}',
+    f'refTxns=[{TX_ID}] inputTxns=[{OTHER_TX_ID}, unspentOutputs=[{TX_ID},]',
+    f'Transaction [{TX_ID}] Tx [{OTHER_TX_ID}]',
+    # Anchors without a valid id
+    'tx_id=1234 flow-id=XYZ Flow [ ] txId=',
+    f'The duplicate key value is  ({TX_ID}) messageId=ABC-123 messageId=',
+    f'Detail: Key (peer_party_id, x) ({TX_ID}) already exists.',
+    f'flowId=[{FLOW_ID}] flowId={OTHER_FLOW_ID} \'flow_id\': \'{FLOW_ID}\' flow_id: {OTHER_FLOW_ID}',
+    f'NotaryException: Unable to notarise transaction {TX_ID} : conflict',
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def configs():
+    Configs.load_config()
+
+
+def scan_joined(scanner, lines, first_line=1):
+    """
+    :return: reference ids found with all patterns joined, line by line (see RefIdScanner.scan_batch)
+    """
+    joined = RegexLib.use('|'.join(rule.pattern for rule in scanner.rules))
+    group_rule = []
+    for rule in scanner.rules:
+        group_rule.extend([rule] * rule.regex.groups)
+
+    hits = []
+    for index, each_line in enumerate(lines):
+        for match in joined.finditer(each_line):
+            for group_index, each_group in enumerate(match.groups()):
+                if each_group:
+                    hits.append((first_line + index, group_rule[group_index].type, each_group))
+
+    return hits
+
+
+def test_configured_patterns():
+    scanner = RefIdScanner(Configs.get_config(section='CORDA_OBJECTS'))
+    assert scanner.anchored
+    hits = scanner.scan_batch(LINES, first_line=10)
+    assert hits == scan_joined(scanner, LINES, first_line=10)
+    assert (10, 'FLOW', FLOW_ID) in hits
+    assert (10, 'TRANSACTION', TX_ID) in hits
+
+
+def test_scan_by_line():
+    scanner = RefIdScanner(Configs.get_config(section='CORDA_OBJECTS'))
+    for line_no, each_line in enumerate(LINES, start=1):
+        assert scanner.scan(each_line) == [(ref_id, object_type)
+                                           for _, object_type, ref_id in scan_joined(scanner, [each_line], line_no)]
+
+
+def test_overlapping_anchors():
+    # 'id=' is also found inside 'xid='; leftmost match wins, as with the joined pattern
+    scanner = RefIdScanner({'A': {'EXPECT': [r'id=([0-9]+)']}, 'B': {'EXPECT': [r'xid=([0-9]+)']}})
+    lines = ['xid=12 id=34', 'id=56xid=78', 'xid=', 'xxid=9']
+    assert scanner.anchored
+    assert scanner.scan_batch(lines) == scan_joined(scanner, lines)
+
+
+def test_not_anchored():
+    scanner = RefIdScanner({'A': {'EXPECT': [r'\d+ ([a-f]{4})']}, 'B': {'EXPECT': [r'id=([a-f]{4})']}})
+    lines = ['12 abcd id=beef', 'id=cafe 3 dead', 'none']
+    assert not scanner.anchored
+    assert scanner.scan_batch(lines) == scan_joined(scanner, lines)
+
+
+@pytest.mark.parametrize('pattern,anchor', [
+    (r'tx_id=([A-F0-9]{64})', (0, 'tx_id=')),
+    (r'.tx_id.:.([A-F0-9]{64})', (1, 'tx_id')),
+    (r'[Ff]low \[([a-z0-9-]+)\]', (1, 'low [')),
+    (r'\d+ ([a-f]{4})', None),
+    (r'(?i)tx_id=(\w+)', None),
+    (r'id=(\w+)', (0, 'id=')),
+    (r'ab(\w+)', None),
+])
+def test_get_anchor(pattern, anchor):
+    assert RefIdScanner.get_anchor(pattern) == anchor
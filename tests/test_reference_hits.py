@@ -0,0 +1,67 @@
+# tests/test_reference_hits.py
+import pickle
+import random
+import sys
+import threading
+
+from reference_hits import ReferenceHits
+
+
+class Source:
+    """
+    Log where each line is at offset line number * 100
+    """
+
+    def read_lines_at(self, offsets):
+        return [f'line {each_offset // 100}' for each_offset in offsets]
+
+
+def test_add_and_read():
+    hits = ReferenceHits(Source())
+    hits.add(30, offset=3000)
+    hits.add(10, offset=1000)
+    hits.add(20, line='kept as text')
+    hits.add(10, offset=1000)
+
+    assert list(hits) == [10, 20, 30]
+    assert hits.items() == [(10, 'line 10'), (20, 'kept as text'), (30, 'line 30')]
+    assert hits[30] == 'line 30'
+    assert 20 in hits and 15 not in hits
+    del hits[20]
+    assert hits.values() == ['line 10', 'line 30']
+
+
+def test_concurrent_add():
+    hits = ReferenceHits(Source())
+    line_numbers = list(range(1, 20001))
+    random.Random(1).shuffle(line_numbers)
+    chunks = [line_numbers[start::8] for start in range(8)]
+
+    def add(chunk):
+        for each_line_no in chunk:
+            hits.add(each_line_no, offset=each_line_no * 100)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=add, args=(each_chunk,)) for each_chunk in chunks]
+        for each_thread in threads:
+            each_thread.start()
+        for each_thread in threads:
+            each_thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    # Both columns sorted and aligned
+    assert hits.line_numbers.tolist() == list(range(1, 20001))
+    assert hits.offsets.tolist() == [each_line_no * 100 for each_line_no in range(1, 20001)]
+
+
+def test_pickle():
+    hits = ReferenceHits()
+    hits.add(5, line='text')
+    copy = pickle.loads(pickle.dumps(hits))
+
+    assert copy.items() == [(5, 'text')]
+    copy.add(6, line='other')
+    assert list(copy) == [5, 6]
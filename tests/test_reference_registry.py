@@ -0,0 +1,44 @@
+# tests/test_reference_registry.py
+import threading
+import time
+
+from reference_registry import ReferenceRegistry
+
+
+def test_get_or_add():
+    registry = ReferenceRegistry()
+    first, created = registry.get_or_add('id1', 'flow', lambda: 'first')
+    assert (first, created) == ('first', True)
+    assert registry.get_or_add('id1', 'flow', lambda: 'second') == ('first', False)
+    assert registry.get_object('id1') == 'first'
+    assert registry.get_type('id1') == 'flow'
+    assert list(registry.by_type['flow'].values()) == ['first']
+
+
+def test_get_or_add_concurrent():
+    registry = ReferenceRegistry()
+    ids = [f'id{index}' for index in range(50)]
+    returned = []
+    created = []
+
+    def create(ref_id):
+        # Give other threads a chance to look for same id while it is being created
+        time.sleep(0.0001)
+        new_object = object()
+        created.append((ref_id, new_object))
+        return new_object
+
+    def register():
+        for ref_id in ids:
+            returned.append((ref_id, registry.get_or_add(ref_id, 'flow', lambda: create(ref_id))[0]))
+
+    threads = [threading.Thread(target=register) for _ in range(8)]
+    for each_thread in threads:
+        each_thread.start()
+    for each_thread in threads:
+        each_thread.join()
+
+    # A single object is created for each id, and every caller got that one
+    assert len(created) == len(ids)
+    assert all(registry.get_object(ref_id) is each_object for ref_id, each_object in returned)
+    assert len(returned) == 8 * len(ids)
@@ -9,8 +9,12 @@ import time
 from dateutil.parser import isoparse
 from dateutil import parser
 from queue import Queue
+from literal_prefilter import LiteralPrefilter
 from log_handler import write_log
-from object_class import Configs, generate_internal_access, CordaObject, RegexLib, get_fields_from_log, X500NameParser
+from regex_budget import RegexBudget
+from compact_model import CompactModel
+from object_class import Configs, generate_internal_access, CordaObject, RegexLib, X500NameParser, \
+    LineContext
 import threading
 from typing import List, Callable, Any, Dict
 
@@ -56,10 +60,12 @@ class UMLCommand:
 
         return None
 
-class UMLStep:
+class UMLStep(CompactModel):
     """
     Class representing actual uml step found
     """
+    __slots__ = ('attribute', 'reference_id')
+    FIELDS = __slots__
 
     uml_steps = {}
 
@@ -344,15 +350,19 @@ class UMLStepSetup:
             UMLStepSetup.ignore_lines = re.compile(r"|".join(UMLStepSetup.Configs.get_config_for("FILE_SETUP.SCAN_SETUP.IGNORE_LINES.EXPECT")))
 
 
-    def check_for_uml_step(self, original_line, current_line_no):
+    def check_for_uml_step(self, original_line, current_line_no, context=None):
         """
         Pre-load all required regex to speed up searches.
+        :param context: LineContext for this line, when its header was already parsed (see process_uml_chunk)
         :return:
         """
 
         umlsteps_list = []
         otype = self.cordaobject.get_type()
         orefid = self.cordaobject.get_reference_id()
+        # Line header and prefilter results are shared by all UML definitions
+        if context is None:
+            context = LineContext(self.file, original_line, current_line_no)
         for each_uml_definition in UMLStepSetup.uml_definitions:
             # now for each uml definition, try to see if we have a match
             #
@@ -360,15 +370,18 @@ class UMLStepSetup:
             # created as "meta-definitions" I need below line to extract actual regex that need to be used...
             # In this section, i will loop over all defined UML commands, and find out if this line match any of them
 
+            if not context.applies(LiteralPrefilter.Family.UML_DEFINITIONS, each_uml_definition):
+                # None of the patterns for this UML command can match this line
+                continue
+
             list_of_expects_to_try = UMLStepSetup.uml_definitions[each_uml_definition]["EXPECT"]
-            expect_to_use = RegexLib.regex_to_use(list_of_expects_to_try, original_line, line_no=current_line_no, timeout=25000)
+            expect_to_use = RegexLib.regex_to_use(list_of_expects_to_try, original_line, line_no=current_line_no,
+                                                  max_line_size=UMLStepSetup.max_line_size)
 
-            # Extract timestamp from current line where this step was found:
-            log_fields = get_fields_from_log(original_line,self.file.logfile_format, self.file)
+            # Extract timestamp from current line where this step was found (header is parsed once per line):
+            timestamp = context.get_field('timestamp')
 
-            if log_fields and 'timestamp' in log_fields:
-                timestamp = log_fields['timestamp']
-            else:
+            if timestamp is None:
                 timestamp = self.cordaobject.timestamp
                 # write_log(f'File line {current_line_no}: Unable to extract a proper timestamp from this line:\n{original_line}', level='WARN')
 
@@ -470,19 +483,17 @@ class UMLStepSetup:
         write_log(f"[{threading.current_thread().name}]: {len(chunk)} "
               f"Checking for valid UML steps, lines processed: {list(chunk.keys())[0]} - {list(chunk.keys())[len(chunk)-1]}" )
 
-        for i, (line_num, line) in enumerate(chunk.items()):
-
-            if line and len(line)>self.Configs.get_config_for("FILE_SETUP.SCAN_SETUP.IGNORE_LINES.MAX_LINE_SIZE"):
-                # Para líneas gigantes, procesamiento inteligente
-                write_log(f"🔍 Huge line ({len(line)} chars) detected at line number {line_num}", level="WARN")
-                # Should not scan this line for sure doesn't have anything useful to extract!
-                continue
-
-            self.check_for_uml_step(line, line_num)
+        # Log line headers of whole chunk are parsed at once
+        contexts = [LineContext(self.file, line, line_num) for line_num, line in chunk.items()]
+        LineContext.parse_headers(contexts)
+        with RegexBudget.block_scope():
+            for i, context in enumerate(contexts):
+                # Huge lines (over MAX_LINE_SIZE) are only matched in degraded mode, see RegexBudget
+                self.check_for_uml_step(context.line, context.line_no, context)
 
-            # ✅ Yield cooperativo cada 10 líneas
-            if i % 10 == 0:
-                time.sleep(0.001)  # Cede control a otros hilos
+                # ✅ Yield cooperativo cada 10 líneas
+                if i % 10 == 0:
+                    time.sleep(0.001)  # Cede control a otros hilos
 
 
     @staticmethod
@@ -501,7 +512,8 @@ class UMLStepSetup:
             write_log(f'Sorry {corda_object.reference_id} has no references to generate a UML diagram, please select another reference...', level='WARN')
             return
         log_dict = {corda_object.get_line(): corda_object.get_data('Original line')}
-        log_dict.update(corda_object.get_references())
+        # All reference lines are read at once
+        log_dict.update(corda_object.get_references().items())
         chunks = UMLStepSetup.chunked_dict(log_dict, chunk_size)
 
         # Crear una cola y llenarla con todos los bloques
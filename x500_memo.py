@@ -0,0 +1,95 @@
+# x500_memo.py
+import threading
+from collections import OrderedDict
+
+
+class X500Memo:
+    """
+    Bounded (least recently used items are discarded first) and thread safe memo of results derived from x500 names
+    (like parsed and validated names, normalised names or fingerprints), keyed by the raw text they come from. Same
+    few party names show up again and again on a log, so most of them are taken from here without any regex or
+    split work; hits and misses are counted to know how well it works (see get_statistics).
+    """
+
+    # Default max number of items kept
+    MAX_SIZE = 4096
+    # Returned by get when key is not in memo (None is a valid result)
+    MISSING = object()
+
+    def __init__(self, name, max_size=None):
+        """
+        :param name: what this memo keeps, for report
+        :param max_size: max number of items kept
+        """
+        self.name = name
+        self.max_size = max_size or X500Memo.MAX_SIZE
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        :param key: raw text (or any hashable) result was derived from
+        :return: result stored, X500Memo.MISSING if it is not in memo
+        """
+        with self.lock:
+            value = self.items.get(key, X500Memo.MISSING)
+            if value is X500Memo.MISSING:
+                self.misses += 1
+            else:
+                self.items.move_to_end(key)
+                self.hits += 1
+
+            return value
+
+    def store(self, key, value):
+        """
+        :param key: raw text (or any hashable) result was derived from
+        :param value: result to keep
+        :return: value
+        """
+        with self.lock:
+            self.items[key] = value
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def setup(self, max_size=None):
+        """
+        Change max number of items kept, all items and statistics are cleared
+        :param max_size: max number of items kept
+        :return: None
+        """
+        with self.lock:
+            self.max_size = max_size or X500Memo.MAX_SIZE
+        self.clear()
+
+    def clear(self):
+        """
+        Remove all items and statistics
+        :return: None
+        """
+        with self.lock:
+            self.items = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_statistics(self):
+        """
+        :return: dictionary with size, hits, misses, hit rate (0 to 1) and evictions
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self.items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }